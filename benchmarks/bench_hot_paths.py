@@ -0,0 +1,101 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Time the user processing hot paths on synthetic payloads of several sizes,
+reporting the throughput and the peak memory of each.
+
+    python benchmarks/bench_hot_paths.py [number_of_users ...] [-f fields]
+"""
+
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+from payload import (
+    USERS_URL, payload_bridge, use_test_settings, user_page, user_pages)
+
+
+def measure(func, repeat=3):
+    """
+    Return the best seconds of repeat runs and the peak bytes of one run
+    """
+    func()   # warm up
+    best = None
+    for i in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    gc.collect()
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def get_cases(count, fields):
+    from uw_bridge.page_decoder import PageDecoder
+    from uw_bridge.util import parse_date, _parse_date_str
+
+    pages = user_pages(count, fields=fields)
+    bridge = payload_bridge(pages, fields=fields)
+    page = user_page(min(count, 1000), fields=fields)
+    page_count = len(page["users"])
+    users = bridge._process_apage(page, [])
+    linked = page["linked"]
+    timestamps = [user_data[key] for user_data in page["users"]
+                  for key in ("hire_date", "deleted_at", "loggedInAt",
+                              "updated_at", "next_due_date")]
+
+    def parse_dates():
+        _parse_date_str.cache_clear()
+        for value in timestamps:
+            parse_date(value)
+
+    def new_users():
+        # the user by user construction of the stream mode
+        decoder = PageDecoder(bridge.custom_fields, bridge.user_roles,
+                              linked)
+        return [decoder.decode_user(user_data)
+                for user_data in page["users"]]
+
+    return [
+        ("_process_json_resp_data", count,
+         lambda: bridge._process_json_resp_data(pages[USERS_URL])),
+        ("_process_apage", page_count,
+         lambda: bridge._process_apage(page, [])),
+        ("decode_user (per user)", page_count, new_users),
+        ("to_json_post", page_count,
+         lambda: [json.dumps(u.to_json_post()) for u in users]),
+        ("to_json_patch", page_count,
+         lambda: [json.dumps(u.to_json_patch()) for u in users]),
+        ("parse_date (cold cache)", page_count, parse_dates),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("counts", nargs="*", type=int,
+                        default=[1000, 10000, 50000])
+    parser.add_argument("-f", "--fields", type=int, default=8,
+                        help="custom field values per user")
+    args = parser.parse_args()
+    use_test_settings()
+
+    print("{0:<26} {1:>7} {2:>12} {3:>12} {4:>10}".format(
+        "", "users", "usec/user", "users/sec", "peak MB"))
+    for count in args.counts:
+        for name, users, func in get_cases(count, args.fields):
+            seconds, peak = measure(func)
+            print("{0:<26} {1:7d} {2:12.2f} {3:12.0f} {4:10.1f}".format(
+                name, users, seconds / users * 1e6, users / seconds,
+                peak / 1e6))
+        print("")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Compare the JSON codecs decoding a users page (str and bytes) and
+encoding the PATCH bodies, and check that they build the same users.
+
+    python benchmarks/bench_json_codec.py [number_of_users] [-f fields]
+"""
+
+import argparse
+import json
+from timeit import timeit
+from payload import payload_bridge, use_test_settings, user_page
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("count", nargs="?", type=int, default=1000)
+    parser.add_argument("-f", "--fields", type=int, default=8)
+    args = parser.parse_args()
+    use_test_settings()
+    from uw_bridge import codec
+    from uw_bridge.codec import OrjsonCodec, StdlibCodec, orjson
+
+    codecs = [StdlibCodec()]
+    if orjson is not None:
+        codecs.append(OrjsonCodec())
+    else:
+        print("orjson is not installed")
+
+    bridge = payload_bridge(fields=args.fields)
+    text = json.dumps(user_page(args.count, fields=args.fields))
+    data = text.encode()
+    users = bridge._process_json_resp_data(text)
+    expected = [str(u) for u in users]
+
+    base = {}
+    for cd in codecs:
+        previous = codec.set_codec(cd)
+        try:
+            if [str(u) for u in bridge._process_json_resp_data(data)] != \
+                    expected:
+                print("{0}: the users differ!".format(cd.name))
+            results = [
+                ("loads str", lambda: cd.loads(text)),
+                ("loads bytes", lambda: cd.loads(data)),
+                ("dumps to_json_patch",
+                 lambda: [cd.dumps(u.to_json_patch()) for u in users]),
+                ("decode + build page",
+                 lambda: bridge._process_json_resp_data(data)),
+            ]
+            for name, func in results:
+                seconds = timeit(func, number=5) / 5
+                usec = seconds / args.count * 1e6
+                base.setdefault(name, usec)
+                print("{0:<7} {1:<20} {2:8.2f} usec/user  {3:5.1f}x".format(
+                    cd.name, name, usec, base[name] / usec))
+        finally:
+            codec.set_codec(previous)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Compare the parse_date per user (_process_apage parses five timestamps
+of each user) against the plain dateutil parser.
+
+    python benchmarks/bench_parse_date.py [number_of_users]
+"""
+
+import random
+import sys
+from timeit import timeit
+from dateutil.parser import parse
+from uw_bridge.util import parse_date, _parse_date_str
+
+
+def user_timestamps(count):
+    # hire_date, deleted_at, loggedInAt, updated_at, next_due_date
+    rand = random.Random(0)
+    users = []
+    for i in range(count):
+        users.append([
+            "20{0:02d}-0{1:d}-1{2:d}T00:00:00.000-07:00".format(
+                rand.randint(0, 23), rand.randint(1, 9), rand.randint(0, 9)),
+            None,
+            "2024-05-{0:02d}T{1:02d}:{2:02d}:{3:02d}.{4:03d}-07:00".format(
+                rand.randint(1, 28), rand.randint(0, 23), rand.randint(0, 59),
+                rand.randint(0, 59), rand.randint(0, 999)),
+            "2024-06-{0:02d}T{1:02d}:{2:02d}:{3:02d}.{4:03d}-07:00".format(
+                rand.randint(1, 28), rand.randint(0, 23), rand.randint(0, 59),
+                rand.randint(0, 59), rand.randint(0, 999)),
+            None if i % 3 else "2024-12-31T00:00:00.000-08:00"])
+    return users
+
+
+def dateutil_parse_date(date_str):
+    # parse_date before the fast path
+    if date_str is not None:
+        return parse(date_str)
+    return None
+
+
+def run(parser, users):
+    for timestamps in users:
+        for value in timestamps:
+            parser(value)
+
+
+def main(count=10000):
+    users = user_timestamps(count)
+    results = [
+        ("dateutil.parser.parse",
+         lambda: run(dateutil_parse_date, users)),
+        ("parse_date (cold cache)",
+         lambda: (_parse_date_str.cache_clear(), run(parse_date, users))),
+        ("parse_date (warm cache)", lambda: run(parse_date, users)),
+    ]
+    base = None
+    for name, func in results:
+        func()   # warm up
+        seconds = timeit(func, number=3) / 3
+        usec = seconds / count * 1e6
+        base = base or usec
+        print("{0:<26} {1:8.2f} usec/user  {2:6.1f}x".format(
+            name, usec, base / usec))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,75 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Compare the peak memory and the time of crawling the users page by page
+(decoding each whole page) and in the stream mode (decoding the users
+one at a time), the users being consumed one by one.
+The pages are given as str and as bytes (as the live DAO returns them),
+with "linked" before and after "users".
+
+    python benchmarks/bench_stream_memory.py [number_of_users] [-f fields]
+"""
+
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+from payload import payload_bridge, use_test_settings, user_pages
+
+
+def crawl(bridge, stream):
+    count = 0
+    for user in bridge.iter_all_users(
+            includes=['custom_fields'], records=True, stream=stream):
+        count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("count", nargs="?", type=int, default=5000)
+    parser.add_argument("-f", "--fields", type=int, default=8)
+    args = parser.parse_args()
+    use_test_settings()
+
+    pages = user_pages(args.count, fields=args.fields)
+    page_size = sum(len(page) for page in pages.values()) / len(pages)
+    print("{0:d} pages of {1:.1f} MB".format(len(pages), page_size / 1e6))
+
+    for linked_last in (False, True):
+        for as_bytes in (False, True):
+            body = {url: get_body(page, as_bytes, linked_last)
+                    for url, page in pages.items()}
+            bridge = payload_bridge(body, fields=args.fields)
+            print("{0}, linked {1} users".format(
+                "bytes" if as_bytes else "str",
+                "after" if linked_last else "before"))
+            for name, stream in (("whole page", False), ("stream", True)):
+                run(bridge, name, stream)
+
+
+def get_body(page, as_bytes, linked_last):
+    if linked_last:
+        data = json.loads(page)
+        data["linked"] = data.pop("linked")
+        page = json.dumps(data)
+    return page.encode() if as_bytes else page
+
+
+def run(bridge, name, stream):
+    crawl(bridge, stream)   # warm up
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = crawl(bridge, stream)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print("  {0:<12} {1:7d} users  peak {2:7.1f} MB  {3:6.2f} s".format(
+        name, count, peak / 1e6, seconds))
+
+
+if __name__ == '__main__':
+    main()
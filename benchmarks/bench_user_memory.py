@@ -0,0 +1,54 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Compare the memory kept by the users of a bulk read
+as BridgeUser objects and as BridgeUserRecord objects,
+with and without interning (iter_all_users(intern=True)).
+The page is decoded and released within the measure, as in a bulk read.
+
+    python benchmarks/bench_user_memory.py [number_of_users]
+"""
+
+import gc
+import json
+import sys
+import tracemalloc
+from payload import payload_bridge, use_test_settings, user_page
+from uw_bridge import codec
+from uw_bridge.page_decoder import Interner
+
+
+def measure(bridge, text, records, intern):
+    gc.collect()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    resp_data = codec.loads(text)
+    interner = Interner() if intern else None
+    users = bridge._process_apage(resp_data, [], records=records,
+                                  interner=interner)
+    resp_data = None
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return size / len(users)
+
+
+def main(count=10000):
+    use_test_settings()
+    bridge = payload_bridge()
+    text = json.dumps(user_page(count))
+    bridge.load_metadata()
+    full = measure(bridge, text, False, False)
+    for name, records, intern in (
+            ("BridgeUser", False, False),
+            ("BridgeUser interned", False, True),
+            ("BridgeUserRecord", True, False),
+            ("BridgeUserRecord interned", True, True)):
+        size = measure(bridge, text, records, intern)
+        print("{0:26} {1:8.0f} bytes/user  ({2:.1f}x smaller)".format(
+            name, size, full / size))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,149 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Synthetic Bridge payloads for the benchmarks:
+the users pages (users, linked.custom_field_values, meta.next)
+and the custom_fields and roles responses they refer to.
+"""
+
+import json
+from os.path import abspath, dirname
+import os
+from commonconf.backends import use_configparser_backend
+
+FIELDS = [("5", "regid"), ("6", "employee_id"), ("7", "student_id"),
+          ("11", "pos1_budget_code"), ("12", "pos1_job_code"),
+          ("13", "pos1_job_class"), ("14", "pos1_org_code"),
+          ("15", "pos1_org_name"), ("16", "pos1_unit_code"),
+          ("17", "pos1_location"), ("21", "pos2_budget_code"),
+          ("22", "pos2_job_code"), ("23", "pos2_job_class"),
+          ("24", "pos2_org_code"), ("25", "pos2_org_name"),
+          ("26", "pos2_unit_code"), ("27", "pos2_location")]
+ROLES = [("account_admin", "Account Admin"), ("admin", "Admin"),
+         ("author", "Author"), ("fb412e52", "Campus Admin"),
+         ("it_admin", "IT Admin")]
+USERS_URL = "/api/author/users?includes%5B%5D=custom_fields&limit=1000"
+
+
+def use_test_settings():
+    path = abspath(os.path.join(dirname(__file__), "..", "conf", "test.conf"))
+    use_configparser_backend(path, 'Bridge')
+
+
+def get_fields(count):
+    """
+    Return count (field_id, name) pairs, the UW ones first
+    """
+    fields = FIELDS[:count]
+    for i in range(len(fields), count):
+        fields.append((str(100 + i), "field{0:d}".format(i)))
+    return fields
+
+
+def field_value(name, i):
+    if name == "regid":
+        return "{0:032X}".format(i)
+    if name.endswith("_id"):
+        return "{0:09d}".format(i)
+    if name.endswith("_org_code"):
+        return "ORG{0:d}".format(i % 200)
+    if name.endswith("_org_name"):
+        return "Org Name {0:d}".format(i % 200)
+    # the other fields have a few hundred distinct values
+    return "{0} {1:d}".format(name, i % 300)
+
+
+def custom_fields_json(fields=4):
+    return json.dumps({"meta": {}, "custom_fields": [
+        {"id": field_id, "name": name}
+        for field_id, name in get_fields(fields)]})
+
+
+def roles_json():
+    return json.dumps({"roles": [
+        {"id": role_id, "name": name, "is_deprecated": False}
+        for role_id, name in ROLES]})
+
+
+def user_page(count, fields=4, start=0, next_url=None):
+    """
+    Return a decoded users page of count users
+    :param fields: the number of custom field values of each user
+    :param start: the index of the first user
+    :param next_url: the meta.next link
+    """
+    field_defs = get_fields(fields)
+    values = []
+    users = []
+    for i in range(start, start + count):
+        value_ids = []
+        for field_id, name in field_defs:
+            value_id = str(len(values) + 1 + start * fields)
+            values.append({"id": value_id, "value": field_value(name, i),
+                           "links": {"custom_field": {"id": field_id}}})
+            value_ids.append(value_id)
+        users.append({
+            "id": str(i + 1),
+            "uid": "user{0:d}@uw.edu".format(i),
+            "first_name": "First{0:d}".format(i),
+            "last_name": "Last{0:d}".format(i),
+            "full_name": "First{0:d} Last{0:d}".format(i),
+            "email": "user{0:d}@uw.edu".format(i),
+            "locale": "en",
+            "roles": (["author"] if i % 10 == 0 else []) + (
+                ["fb412e52"] if i % 100 == 0 else []),
+            "updated_at": "2024-05-14T15:12:{0:02d}.{1:03d}-07:00".format(
+                i % 60, i % 1000),
+            "deleted_at": None,
+            "loggedInAt": "2024-05-14T10:17:34.757-07:00",
+            "hire_date": "2016-08-12T00:00:00.000-07:00",
+            "is_manager": i % 20 == 0,
+            "job_title": "Job Title {0:d}".format(i % 50),
+            "department": "Department {0:d}".format(i % 100),
+            "next_due_date": None,
+            "completed_courses_count": i % 7,
+            "manager_id": str(i // 20 * 20 + 1),
+            "links": {"custom_field_values": value_ids}})
+    meta = {"next": next_url} if next_url is not None else {}
+    return {"meta": meta, "linked": {"custom_field_values": values},
+            "users": users}
+
+
+def user_pages(count, page_size=1000, fields=4):
+    """
+    Return a dict of {url: JSON users page} holding count users in pages
+    chained by meta.next, starting at USERS_URL
+    """
+    pages = {}
+    url = USERS_URL
+    for start in range(0, max(count, 1), page_size):
+        size = min(page_size, count - start)
+        next_url = None
+        if start + size < count:
+            next_url = "/api/author/users?cursor={0:d}".format(start + size)
+        pages[url] = json.dumps(
+            user_page(size, fields=fields, start=start, next_url=next_url))
+        url = next_url
+    return pages
+
+
+def payload_bridge(pages=None, fields=4):
+    """
+    Return a BridgeAccounts whose GET requests are answered from pages
+    (a dict of {url: response data}) and the synthetic metadata
+    """
+    from uw_bridge.custom_fields import URL as CUSTOM_FIELDS_URL
+    from uw_bridge.user_roles import URL as USER_ROLES_URL
+    from uw_bridge.users import BridgeAccounts
+
+    class PayloadBridgeAccounts(BridgeAccounts):
+        def get_resource(self, url):
+            return self.pages[url]
+
+    bridge = PayloadBridgeAccounts()
+    bridge.pages = dict(pages or {})
+    bridge.pages[CUSTOM_FIELDS_URL] = custom_fields_json(fields)
+    bridge.pages[USER_ROLES_URL] = roles_json()
+    bridge.load_metadata()
+    return bridge
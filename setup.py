@@ -23,9 +23,16 @@ setup(
     author="UW-IT T&LS",
     author_email="aca-it@uw.edu",
     include_package_data=True,
-    install_requires=['UW-RestClients-Core',
+    # uw_bridge.page_decoder and models rely on the Model internals
+    # of these versions, see test_page_decoder.test_compiled
+    install_requires=['UW-RestClients-Core>=1.4.4,<1.5',
                       'python-dateutil',
                      ],
+    extras_require={
+        'async': ['aiohttp'],
+        'frame': ['numpy'],
+        'json': ['orjson'],
+    },
     license='Apache License, Version 2.0',
     description=('A library for connecting to the Bridge API'),
     long_description=README,
@@ -8,8 +8,14 @@ Be sure to set the logging configuration if you use the LiveDao!
 """
 
 import logging
+import time
 from restclients_core.exceptions import DataFailureException
 from uw_bridge.dao import Bridge_DAO
+from uw_bridge.metadata_cache import get_metadata_cache
+from uw_bridge.metrics import get_metrics
+from uw_bridge.rate_limit import get_rate_limiter
+from uw_bridge.retry import get_retry_policy
+from uw_bridge.single_flight import get_single_flight
 
 
 logger = logging.getLogger(__name__)
@@ -27,75 +33,171 @@ class Bridge(object):
 
     def __init__(self):
         self.dao = Bridge_DAO()
-        self.req_url = None
+        self.rate_limiter = get_rate_limiter(self.dao)
+        self.retry_policy = get_retry_policy(self.dao)
+        self.metadata_cache = get_metadata_cache(self.dao)
+        self.metrics = get_metrics(self.dao)
+        self.single_flight = get_single_flight(self.dao)
 
     def delete_resource(self, url):
-        response = self.dao.deleteURL(url, self.DHEADER)
-        req_data = "DELETE {0}".format(url)
-        self._log_resp(req_data, response)
-
-        if response.status != 204:
-            # 204 is a successful deletion
-            self._raise_exception(req_data, url, response)
-
-        return response
+        # 204 is a successful deletion
+        return self._load_resource("DELETE", url, self.DHEADER, None, (204,))
 
     def get_resource(self, url):
-        self.req_url = url
-        response = self.dao.getURL(url, self.GHEADER)
-        req_data = "GET {0}".format(url)
-        self._log_resp(req_data, response)
-
-        if response.status != 200:
-            self._raise_exception(req_data, url, response)
+        return self._load_resource(
+            "GET", url, self.GHEADER, None, (200,)).data
 
-        return response.data
+    def get_metadata_resource(self, url):
+        """
+        GET the metadata (custom fields, user roles) resource,
+        from the shared MetadataCache if it is enabled
+        """
+        if self.metadata_cache is None:
+            return self.get_resource(url)
+        return self.metadata_cache.get(url, lambda: self.get_resource(url))
 
     def patch_resource(self, url, body):
         """
         Patch resource with the given json body
         :returns: http response data
         """
-        self.req_url = url
-        response = self.dao.patchURL(url, self.PHEADER, body)
-        req_data = "PATCH {0}: {1}".format(url, body)
-        self._log_resp(req_data, response)
-
-        if response.status != 200:
-            self._raise_exception(req_data, url, response)
-
-        return response.data
+        return self._load_resource(
+            "PATCH", url, self.PHEADER, body, (200,)).data
 
-    def post_resource(self, url, body):
+    def post_resource(self, url, body, idempotent=False):
         """
         Post resource with the given json body
+        :param idempotent: True if the request can be retried safely
         :returns: http response data
         """
-        self.req_url = url
-        response = self.dao.postURL(url, self.PHEADER, body)
-        req_data = "POST {0}: {1}".format(url, body)
-        self._log_resp(req_data, response)
-
-        if response.status != 200 and response.status != 201:
-            self._raise_exception(req_data, url, response)
-
-        return response.data
+        return self._load_resource(
+            "POST", url, self.PHEADER, body, (200, 201),
+            idempotent=idempotent).data
 
     def put_resource(self, url, body):
         """
         Update the entire resource
         Bridge PUT seems to have the same effect as PATCH currently.
         """
-        self.req_url = url
-        response = self.dao.putURL(url, self.PHEADER, body)
-        req_data = "PUT {0}: {1}".format(url, body)
+        return self._load_resource(
+            "PUT", url, self.PHEADER, body, (200,)).data
+
+    def _load_resource(self, method, url, headers, body, ok_status,
+                       idempotent=False):
+        """
+        Make the request and check the response status. The concurrent
+        identical GETs share one request if single-flight is enabled.
+        :returns: http response
+        """
+        # the DAO adds the Authorization header to the dict it is given,
+        # each request gets its own copy of the shared class level headers
+        headers = dict(headers)
+        if method == "GET" and self.single_flight is not None:
+            # a revalidation (conditional GET) has its own ok_status
+            return self.single_flight.do(
+                (method, url, ok_status),
+                lambda: self._send_request(
+                    method, url, headers, body, ok_status, idempotent))
+        return self._send_request(
+            method, url, headers, body, ok_status, idempotent)
+
+    def _send_request(self, method, url, headers, body, ok_status,
+                      idempotent):
+        attempt = 0
+        while True:
+            attempt += 1
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            response = error = None
+            if self.metrics is not None:
+                start = time.perf_counter()
+            try:
+                response = self._get_response(method, url, headers, body)
+            except DataFailureException as ex:
+                error = ex
+            if self.metrics is not None:
+                self._record_request(method, url, body, response, error,
+                                     time.perf_counter() - start)
+            delay = self._retry_delay(
+                method, url, ok_status, idempotent, response, error, attempt)
+            if delay is None:
+                break
+            time.sleep(delay)
+        return self._check_attempts(
+            method, url, body, ok_status, response, error, attempt)
+
+    def _retry_delay(self, method, url, ok_status, idempotent,
+                     response, error, attempt):
+        """
+        Return the seconds to wait before re-sending the request
+        or None if the request is done
+        """
+        if response is not None:
+            if (self.rate_limiter is not None and
+                    self.rate_limiter.update(response) and
+                    attempt <= self.rate_limiter.max_retries):
+                # throttled, the rate limiter delays the next request
+                return 0
+            if response.status in ok_status:
+                return None
+            status = response.status
+        else:
+            status = error.status
+
+        if (self.retry_policy is not None and self.retry_policy.can_retry(
+                method, idempotent, status, attempt)):
+            delay = self.retry_policy.get_delay(attempt)
+            logger.warning(
+                " {0} {1} ===> {2}, retry #{3:d} in {4:.2f}s".format(
+                    method, url, status, attempt, delay))
+            return delay
+        return None
+
+    def _check_attempts(self, method, url, body, ok_status,
+                        response, error, attempt):
+        if self.retry_policy is not None:
+            self.retry_policy.record(
+                attempt, error is None and response.status in ok_status)
+        try:
+            if error is not None:
+                raise error
+            self._check_response(method, url, body, response, ok_status)
+        except DataFailureException as ex:
+            ex.attempts = attempt
+            raise
+        return response
+
+    def _record_request(self, method, url, body, response, error, seconds):
+        if response is not None:
+            status = response.status
+            bytes_in = len(response.data) if response.data else 0
+        else:
+            status = error.status
+            bytes_in = 0
+        self.metrics.record_request(method, url, status, seconds, bytes_in,
+                                    len(body) if body else 0)
+
+    def _get_response(self, method, url, headers, body):
+        if method == "GET":
+            return self.dao.getURL(url, headers)
+        if method == "DELETE":
+            return self.dao.deleteURL(url, headers)
+        if method == "PATCH":
+            return self.dao.patchURL(url, headers, body)
+        if method == "POST":
+            return self.dao.postURL(url, headers, body)
+        return self.dao.putURL(url, headers, body)
+
+    def _check_response(self, method, url, body, response, ok_status):
+        if body is None:
+            req_data = "{0} {1}".format(method, url)
+        else:
+            req_data = "{0} {1}: {2}".format(method, url, body)
         self._log_resp(req_data, response)
 
-        if response.status != 200:
+        if response.status not in ok_status:
             self._raise_exception(req_data, url, response)
 
-        return response.data
-
     def _log_resp(self, req_data, response):
         logger.debug(" {0} ===> STATUS: {1:d}, DATA: {2}".format(
             req_data, response.status, response.data))
@@ -0,0 +1,343 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+The asyncio version of the Bridge client.
+The Live requests are made with aiohttp (pip install aiohttp),
+the Mock requests are loaded from the same file resources as Bridge.
+
+    async with AsyncBridgeAccounts(concurrency=200) as bridge:
+        users = await asyncio.gather(
+            *[bridge.get_user(netid) for netid in netids])
+"""
+
+import asyncio
+import logging
+import ssl
+import time
+from restclients_core.exceptions import DataFailureException
+from restclients_core.models import MockHTTP
+from uw_bridge import codec
+from uw_bridge.custom_fields import (
+    CustomFields, URL as CUSTOM_FIELDS_URL)
+from uw_bridge.response_cache import get_response_cache
+from uw_bridge.user_roles import UserRoles, URL as USER_ROLES_URL
+from uw_bridge.users import (
+    BridgeUsersMixin, admin_id_url, admin_uid_url, author_id_url,
+    author_uid_url, get_all_users_url, get_user_url, get_user_by_id_url,
+    next_page_url, restore_user_url, update_user_url, update_user_roles_url)
+from uw_bridge import Bridge
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncBridge(Bridge):
+    """
+    The request methods are coroutines.
+    Call close() (or use "async with") to release the connections.
+    """
+
+    def __init__(self, concurrency=None):
+        """
+        :param concurrency: the maximum number of requests in flight,
+         default to the RESTCLIENTS_BRIDGE_POOL_SIZE setting.
+        """
+        super(AsyncBridge, self).__init__()
+        if concurrency is None:
+            concurrency = self.dao.get_service_setting(
+                "POOL_SIZE", self.dao.get_setting("DEFAULT_POOL_SIZE", 10))
+        self.concurrency = int(concurrency)
+        self.session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def delete_resource(self, url):
+        return await self._load_resource(
+            "DELETE", url, self.DHEADER, None, (204,))
+
+    async def get_resource(self, url):
+        response = await self._load_resource(
+            "GET", url, self.GHEADER, None, (200,))
+        return response.data
+
+    async def get_metadata_resource(self, url):
+        if self.metadata_cache is None:
+            return await self.get_resource(url)
+        data = self.metadata_cache.get(url)
+        if data is None:
+            data = await self.get_resource(url)
+            self.metadata_cache.put(url, data)
+        return data
+
+    async def patch_resource(self, url, body):
+        response = await self._load_resource(
+            "PATCH", url, self.PHEADER, body, (200,))
+        return response.data
+
+    async def post_resource(self, url, body, idempotent=False):
+        response = await self._load_resource(
+            "POST", url, self.PHEADER, body, (200, 201),
+            idempotent=idempotent)
+        return response.data
+
+    async def put_resource(self, url, body):
+        response = await self._load_resource(
+            "PUT", url, self.PHEADER, body, (200,))
+        return response.data
+
+    async def _load_resource(self, method, url, headers, body, ok_status,
+                             idempotent=False):
+        attempt = 0
+        while True:
+            attempt += 1
+            if self.rate_limiter is not None:
+                await asyncio.sleep(self.rate_limiter.reserve())
+            response = error = None
+            if self.metrics is not None:
+                start = time.perf_counter()
+            try:
+                response = await self._get_response(
+                    method, url, headers, body)
+            except DataFailureException as ex:
+                error = ex
+            if self.metrics is not None:
+                self._record_request(method, url, body, response, error,
+                                     time.perf_counter() - start)
+            delay = self._retry_delay(
+                method, url, ok_status, idempotent, response, error, attempt)
+            if delay is None:
+                break
+            await asyncio.sleep(delay)
+        return self._check_attempts(
+            method, url, body, ok_status, response, error, attempt)
+
+    async def _get_response(self, method, url, headers, body):
+        if self.dao.is_mock():
+            return super(AsyncBridge, self)._get_response(
+                method, url, headers, body)
+
+        headers = self.dao._custom_headers(method, url, dict(headers), body)
+        session = self._get_session()
+        try:
+            async with session.request(method, self._get_host() + url,
+                                       data=body, headers=headers) as resp:
+                response = MockHTTP()
+                response.status = resp.status
+                response.reason = resp.reason
+                response.headers = dict(resp.headers)
+                response.data = await resp.read()
+            return response
+        except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+            raise DataFailureException(url, 0, err)
+
+    def _get_host(self):
+        return self.dao.get_service_setting("HOST").rstrip("/")
+
+    def _get_ssl_context(self):
+        """
+        Return the ssl.SSLContext configured by the same settings as
+        the restclients_core LiveDAO connection pool: the SSL_CONTEXT,
+        or the CA_BUNDLE (unless VERIFY_HTTPS is False) and the client
+        CERT_FILE and KEY_FILE.
+        """
+        dao = self.dao
+        context = dao.get_service_setting("SSL_CONTEXT")
+        if context is not None:
+            return context
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        verify_https = dao.get_service_setting("VERIFY_HTTPS")
+        if verify_https is None or verify_https:
+            context.load_verify_locations(cafile=dao.get_setting(
+                "CA_BUNDLE", "/etc/ssl/certs/ca-bundle.crt"))
+        else:
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+        cert_file = dao.get_service_setting("CERT_FILE", None)
+        key_file = dao.get_service_setting("KEY_FILE", None)
+        if cert_file is not None and key_file is not None:
+            context.load_cert_chain(cert_file, key_file)
+        return context
+
+    def _get_session(self):
+        if self.session is None:
+            if aiohttp is None:
+                raise ImportError(
+                    "The Live AsyncBridge requires aiohttp to be installed")
+            connector = aiohttp.TCPConnector(
+                limit=self.concurrency, ssl=self._get_ssl_context())
+            timeout = aiohttp.ClientTimeout(
+                connect=float(self.dao.get_service_setting(
+                    "CONNECT_TIMEOUT",
+                    self.dao.get_setting("DEFAULT_CONNECT_TIMEOUT", 3))),
+                sock_read=float(self.dao.get_service_setting(
+                    "TIMEOUT", self.dao.get_setting("DEFAULT_TIMEOUT", 10))))
+            self.session = aiohttp.ClientSession(
+                connector=connector, timeout=timeout)
+        return self.session
+
+
+class AsyncBridgeAccounts(BridgeUsersMixin, AsyncBridge):
+    """
+    The coroutine version of uw_bridge.users.BridgeAccounts.
+    The custom fields and user roles are loaded on the first request
+    that needs them (or with load_metadata()).
+    The changes made invalidate the responses of the user in the
+    ResponseCache shared with BridgeAccounts.
+    """
+
+    def __init__(self, concurrency=None):
+        super(AsyncBridgeAccounts, self).__init__(concurrency=concurrency)
+        self.custom_fields = None
+        self.user_roles = None
+        self._metadata_lock = None
+        self.response_cache = get_response_cache(self.dao)
+
+    async def load_metadata(self):
+        """
+        Request the custom fields and the user roles concurrently
+        """
+        if self._metadata_lock is None:
+            self._metadata_lock = asyncio.Lock()
+        async with self._metadata_lock:
+            if self.custom_fields is None or self.user_roles is None:
+                cf_resp, roles_resp = await asyncio.gather(
+                    self.get_metadata_resource(CUSTOM_FIELDS_URL),
+                    self.get_metadata_resource(USER_ROLES_URL))
+                self.custom_fields = CustomFields(self, resp=cf_resp)
+                self.user_roles = UserRoles(self, resp=roles_resp)
+
+    async def add_user(self, bridge_user):
+        body = codec.dumps(bridge_user.to_json_post())
+        resp = await self.post_resource(admin_uid_url(None), body)
+        return self._get_obj_from_list(
+            "add_user ({0})".format(bridge_user),
+            await self._process_json_resp_data(resp))
+
+    async def change_uid(self, bridge_id, new_uwnetid):
+        resp = await self.patch_resource(
+            author_id_url(bridge_id), self._upd_uid_req_body(new_uwnetid))
+        self._invalidate_user(bridge_id=bridge_id, uwnetid=new_uwnetid)
+        return self._get_obj_from_list(
+            "change_uid({0})".format(new_uwnetid),
+            await self._process_json_resp_data(resp))
+
+    async def replace_uid(self, old_uwnetid, new_uwnetid):
+        resp = await self.patch_resource(
+            author_uid_url(old_uwnetid), self._upd_uid_req_body(new_uwnetid))
+        self._invalidate_user(uwnetid=old_uwnetid)
+        self._invalidate_user(uwnetid=new_uwnetid)
+        return self._get_obj_from_list(
+            "replace_uid({0}->{1})".format(old_uwnetid, new_uwnetid),
+            await self._process_json_resp_data(resp))
+
+    async def delete_user(self, uwnetid):
+        resp = await self.delete_resource(admin_uid_url(uwnetid))
+        self._invalidate_user(uwnetid=uwnetid)
+        return resp.status == 204
+
+    async def delete_user_by_id(self, bridge_id):
+        resp = await self.delete_resource(admin_id_url(bridge_id))
+        self._invalidate_user(bridge_id=bridge_id)
+        return resp.status == 204
+
+    async def get_user(self, uwnetid, include_deleted=False):
+        resp = await self.get_resource(
+            get_user_url(uwnetid, include_deleted))
+        return self._get_obj_from_list(
+            "get_user by netid('{0}')".format(uwnetid),
+            await self._process_json_resp_data(resp))
+
+    async def get_user_by_id(self, bridge_id, include_deleted=False):
+        resp = await self.get_resource(
+            get_user_by_id_url(bridge_id, include_deleted))
+        return self._get_obj_from_list(
+            "get_user by bridge_id('{0}')".format(bridge_id),
+            await self._process_json_resp_data(resp))
+
+    async def get_all_users(self, includes=None, role_id=None,
+                            records=False):
+        return [user async for user in self.iter_all_users(
+            includes=includes, role_id=role_id, records=records)]
+
+    async def iter_all_users(self, includes=None, role_id=None,
+                             records=False):
+        """
+        An async generator of BridgeUser objects of the active user records
+        :param records: True to get BridgeUserRecord objects
+        """
+        resp = await self.get_resource(get_all_users_url(includes, role_id))
+        async for user in self._iter_json_resp_data(resp, records=records):
+            yield user
+
+    async def restore_user(self, uwnetid):
+        resp = await self.post_resource(
+            restore_user_url(author_uid_url(uwnetid)), '{}', idempotent=True)
+        self._invalidate_user(uwnetid=uwnetid)
+        return self._get_obj_from_list(
+            "restore_user by netid({0})".format(uwnetid),
+            await self._process_json_resp_data(resp))
+
+    async def restore_user_by_id(self, bridge_id):
+        resp = await self.post_resource(
+            restore_user_url(author_id_url(bridge_id)), '{}',
+            idempotent=True)
+        self._invalidate_user(bridge_id=bridge_id)
+        return self._get_obj_from_list(
+            "restore_user by bridge_id({0})".format(bridge_id),
+            await self._process_json_resp_data(resp))
+
+    async def update_user(self, bridge_user, changes_only=False):
+        if changes_only and not bridge_user.has_changes():
+            return bridge_user
+        body = codec.dumps(bridge_user.to_json_patch(
+            changes_only=changes_only))
+        resp = await self.patch_resource(update_user_url(bridge_user), body)
+        self._invalidate_user(bridge_id=bridge_user.bridge_id,
+                              uwnetid=bridge_user.netid)
+        return self._get_obj_from_list(
+            "update_user ({0})".format(bridge_user.to_json()),
+            await self._process_json_resp_data(resp))
+
+    async def update_user_roles(self, bridge_user):
+        body = codec.dumps({"roles": bridge_user.roles_to_json()})
+        resp = await self.put_resource(
+            update_user_roles_url(bridge_user), body)
+        self._invalidate_user(bridge_id=bridge_user.bridge_id,
+                              uwnetid=bridge_user.netid)
+        return self._get_obj_from_list(
+            "update_user_roles {0}, {1}".format(bridge_user.netid, body),
+            await self._process_json_resp_data(resp))
+
+    async def _process_json_resp_data(self, resp):
+        return [user async for user in self._iter_json_resp_data(resp)]
+
+    async def _iter_json_resp_data(self, resp, records=False):
+        if self.custom_fields is None or self.user_roles is None:
+            await self.load_metadata()
+
+        while resp is not None:
+            resp_data = self._decode_page(resp)
+            link_url = next_page_url(resp_data)
+            page_users = self._process_page(resp_data, records=records)
+            resp = resp_data = None
+
+            page_users.reverse()
+            while len(page_users):
+                yield page_users.pop()
+
+            if link_url is not None:
+                resp = await self.get_resource(link_url)
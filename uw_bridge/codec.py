@@ -0,0 +1,76 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+The JSON codec of the Bridge requests and responses.
+orjson is used if it is installed (pip install uw-restclients-bridge[json]),
+otherwise the json module. Both decode the bytes response data directly.
+A different codec can be set with set_codec().
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class StdlibCodec(object):
+    name = "json"
+
+    def loads(self, data):
+        return json.loads(data)
+
+    def dumps(self, obj):
+        return json.dumps(obj, separators=(',', ':'))
+
+
+class OrjsonCodec(StdlibCodec):
+    name = "orjson"
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError("OrjsonCodec requires orjson to be installed")
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+    def dumps(self, obj):
+        data = orjson.dumps(obj).decode()
+        if not data.isascii():
+            # keep the request bodies ASCII (\u escaped), as json.dumps does
+            return super(OrjsonCodec, self).dumps(obj)
+        return data
+
+
+_codec = OrjsonCodec() if orjson is not None else StdlibCodec()
+
+
+def get_codec():
+    return _codec
+
+
+def set_codec(codec):
+    """
+    Use the given codec, an object with the loads and dumps methods
+    :returns: the codec previously used
+    """
+    global _codec
+    previous = _codec
+    _codec = codec
+    return previous
+
+
+def loads(data):
+    """
+    Decode the JSON str or bytes
+    """
+    return _codec.loads(data)
+
+
+def dumps(obj):
+    """
+    Return the compact JSON str of the obj
+    """
+    return _codec.dumps(obj)
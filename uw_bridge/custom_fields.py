@@ -4,10 +4,12 @@
 """
 Interacte with Bridge custom_fields API.
 You only need a single CustomFields object in your app.
+A CustomFields object is not changed once loaded, so it can be shared
+across threads; reload by creating a new one.
 """
 
 import logging
-import json
+from uw_bridge import codec
 from uw_bridge.models import BridgeCustomField
 
 
@@ -17,23 +19,39 @@ URL = "/api/author/custom_fields"
 
 class CustomFields(object):
 
-    def __init__(self, bridge):
+    def __init__(self, bridge, resp=None):
+        """
+        :param resp: the custom_fields response data if it has been
+                     requested already
+        """
         self.bridge = bridge
         self.fields = []
         self.name_id_map = {}
         self.id_name_map = {}
-        self.get_custom_fields()
+        if resp is None:
+            self.get_custom_fields()
+        else:
+            self._load_custom_fields(resp)
 
     def get_custom_fields(self):
-        resp = self.bridge.get_resource(URL)
-        resp_data = json.loads(resp)
+        self._load_custom_fields(self.bridge.get_metadata_resource(URL))
+
+    def _load_custom_fields(self, resp):
+        # build the maps aside, then replace the loaded ones
+        resp_data = codec.loads(resp)
+        fields = []
+        name_id_map = {}
+        id_name_map = {}
         for field in resp_data["custom_fields"]:
             if field.get("id") is not None and field.get("name") is not None:
                 cf = BridgeCustomField(field_id=field["id"],
                                        name=field["name"].lower())
-                self.fields.append(cf)
-                self.name_id_map[cf.name] = cf.field_id
-                self.id_name_map[cf.field_id] = cf.name
+                fields.append(cf)
+                name_id_map[cf.name] = cf.field_id
+                id_name_map[cf.field_id] = cf.name
+        self.fields = fields
+        self.name_id_map = name_id_map
+        self.id_name_map = id_name_map
 
     def get_fields(self):
         """
@@ -0,0 +1,181 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+The manager hierarchy of the Bridge user accounts, built from one roster
+crawl (or the users of a RosterStore/RosterIndex) and traversed in memory:
+
+    hierarchy = ManagerHierarchy.load(bridge)
+    hierarchy.resolve_missing(bridge)
+    chain = hierarchy.get_ancestors(user.bridge_id)
+"""
+
+import logging
+from restclients_core.exceptions import DataFailureException
+
+
+logger = logging.getLogger(__name__)
+LOAD_INCLUDES = ['custom_fields']
+
+
+class ManagerHierarchy(object):
+    """
+    Holds BridgeUser or BridgeUserRecord objects. The manager of a user
+    is its manager_id or else the account of its manager_netid.
+    """
+
+    def __init__(self, users=()):
+        self.users = {}       # {bridge_id: user}
+        self.by_netid = {}    # {netid: bridge_id}
+        self.unresolved = set()
+        # the manager ids not found in Bridge by resolve_missing
+        self._reports = None
+        for user in users:
+            self.add(user)
+
+    @classmethod
+    def load(cls, bridge, includes=LOAD_INCLUDES, records=True, prefetch=1):
+        """
+        Return the ManagerHierarchy of the active users crawled in one pass
+        """
+        return cls(bridge.iter_all_users(includes=includes, records=records,
+                                         prefetch=prefetch))
+
+    def add(self, user):
+        """
+        Add or replace the user of its bridge_id
+        """
+        previous = self.users.get(user.bridge_id)
+        if (previous is not None and
+                self.by_netid.get(previous.netid) == user.bridge_id):
+            del self.by_netid[previous.netid]
+        self.users[user.bridge_id] = user
+        self.by_netid[user.netid] = user.bridge_id
+        self._reports = None
+
+    def __len__(self):
+        return len(self.users)
+
+    def get_user(self, bridge_id):
+        return self.users.get(bridge_id)
+
+    def get_manager_id(self, bridge_id):
+        """
+        Return the bridge_id of the manager of the user or None
+        """
+        user = self.users.get(bridge_id)
+        if user is None:
+            return None
+        if user.manager_id > 0:
+            return user.manager_id
+        if user.manager_netid is not None:
+            return self.by_netid.get(user.manager_netid)
+        return None
+
+    def get_manager(self, bridge_id):
+        return self.users.get(self.get_manager_id(bridge_id))
+
+    def get_ancestors(self, bridge_id):
+        """
+        Return the list of the managers of the user up the chain, the
+        direct manager first. The chain stops at the first manager not
+        in the hierarchy or before a manager already in the chain
+        (a cycle).
+        """
+        ancestors = []
+        seen = {bridge_id}
+        manager_id = self.get_manager_id(bridge_id)
+        while manager_id in self.users and manager_id not in seen:
+            seen.add(manager_id)
+            ancestors.append(self.users[manager_id])
+            manager_id = self.get_manager_id(manager_id)
+        return ancestors
+
+    def get_reports(self, bridge_id):
+        """
+        Return the list of the direct reports of the user
+        """
+        return [self.users[report_id]
+                for report_id in self._get_reports().get(bridge_id, ())]
+
+    def get_subtree_size(self, bridge_id):
+        """
+        Return the number of users reporting to the user,
+        directly or not
+        """
+        reports = self._get_reports()
+        seen = {bridge_id}
+        stack = [bridge_id]
+        while len(stack):
+            for report_id in reports.get(stack.pop(), ()):
+                if report_id not in seen:
+                    seen.add(report_id)
+                    stack.append(report_id)
+        return len(seen) - 1
+
+    def _get_reports(self):
+        # {manager bridge_id: [report bridge_id]}, built on demand
+        if self._reports is None:
+            reports = {}
+            for bridge_id in self.users:
+                manager_id = self.get_manager_id(bridge_id)
+                if manager_id is not None:
+                    reports.setdefault(manager_id, []).append(bridge_id)
+            self._reports = reports
+        return self._reports
+
+    def find_cycles(self):
+        """
+        Return the list of the manager cycles, each a list of bridge_ids
+        in the chain order
+        """
+        cycles = []
+        state = {}   # {bridge_id: the walk it was visited in}
+        for walk, start in enumerate(self.users):
+            bridge_id = start
+            path = []
+            while bridge_id in self.users and bridge_id not in state:
+                state[bridge_id] = walk
+                path.append(bridge_id)
+                bridge_id = self.get_manager_id(bridge_id)
+            if bridge_id in state and state[bridge_id] == walk:
+                cycles.append(path[path.index(bridge_id):])
+        return cycles
+
+    def get_missing_managers(self):
+        """
+        Return the sorted list of the manager_ids not in the hierarchy
+        """
+        return sorted(set(
+            user.manager_id for user in self.users.values()
+            if user.manager_id > 0 and user.manager_id not in self.users))
+
+    def resolve_missing(self, bridge, concurrency=None):
+        """
+        Fetch the missing managers (including the deleted accounts)
+        concurrently, then their missing managers, until the chains are
+        complete or the remaining ones are not found in Bridge.
+        :param concurrency: see BridgeAccounts.bulk_upsert
+        Return the number of managers added
+        """
+        def get_user(bridge_id):
+            return bridge.get_user_by_id(bridge_id, include_deleted=True)
+
+        added = 0
+        while True:
+            missing = [bridge_id for bridge_id in self.get_missing_managers()
+                       if bridge_id not in self.unresolved]
+            if len(missing) == 0:
+                return added
+            for result in bridge.run_bulk(get_user, missing, concurrency):
+                user = result.user
+                if user is not None:
+                    self.add(user)
+                    added += 1
+                if user is None or user.bridge_id != result.item:
+                    self.unresolved.add(result.item)
+                    if (result.error is not None and not (
+                            isinstance(result.error, DataFailureException) and
+                            result.error.status == 404)):
+                        logger.warning("Manager {0}: {1}".format(
+                            result.item, result.error))
@@ -0,0 +1,126 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+A process-wide cache of the Bridge metadata responses (custom fields
+and user roles), shared by all the CustomFields and UserRoles objects,
+so that creating a BridgeAccounts does not request them every time.
+"""
+
+import logging
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_metadata_cache(dao):
+    """
+    Return the MetadataCache shared by the process for the given DAO's
+    service or None if RESTCLIENTS_BRIDGE_METADATA_CACHE_TTL is not set.
+    """
+    ttl = float(dao.get_service_setting("METADATA_CACHE_TTL", 0))
+    if ttl <= 0:
+        return None
+    refresh = dao.get_service_setting("METADATA_CACHE_REFRESH", False)
+    if isinstance(refresh, str):
+        refresh = refresh.lower() in ("true", "yes", "1")
+    key = (dao.service_name(), ttl, bool(refresh))
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = MetadataCache(ttl, refresh=bool(refresh))
+        return _caches[key]
+
+
+class MetadataCache(object):
+
+    def __init__(self, ttl, refresh=False):
+        """
+        :param ttl: the seconds a cached response is fresh
+        :param refresh: if True, an expired response is returned while it
+         is being reloaded on a background thread
+        """
+        self.ttl = float(ttl)
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self._entries = {}      # {url: (data, expires)}
+        self._load_locks = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def get(self, url, loader=None):
+        """
+        Return the cached response data of the url. If it is not fresh,
+        return the one from loader() or None if no loader is given.
+        :param loader: a function requesting the url
+        """
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                if time.monotonic() < entry[1]:
+                    self.hits += 1
+                    return entry[0]
+                if self.refresh and loader is not None:
+                    self.hits += 1
+                    self._start_refresh(url, loader)
+                    return entry[0]
+            self.misses += 1
+            if loader is None:
+                return None
+            load_lock = self._load_locks.setdefault(url, threading.Lock())
+
+        with load_lock:
+            # a concurrent caller may have loaded it meanwhile
+            with self._lock:
+                entry = self._entries.get(url)
+                if entry is not None and time.monotonic() < entry[1]:
+                    return entry[0]
+            data = loader()
+            self.put(url, data)
+            return data
+
+    def put(self, url, data):
+        with self._lock:
+            self._entries[url] = (data, time.monotonic() + self.ttl)
+
+    def invalidate(self, url=None):
+        """
+        Remove the cached response of the url, or all of them if url is None
+        """
+        with self._lock:
+            if url is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(url, None)
+
+    def get_stats(self):
+        return {"hits": self.hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+                "size": len(self._entries)}
+
+    def _start_refresh(self, url, loader):
+        # called with self._lock held
+        if url in self._refreshing:
+            return
+        self._refreshing.add(url)
+        thread = threading.Thread(
+            target=self._refresh, args=(url, loader), daemon=True)
+        thread.start()
+
+    def _refresh(self, url, loader):
+        try:
+            self.put(url, loader())
+            with self._lock:
+                self.refreshes += 1
+        except Exception as ex:
+            # keep the expired response, retry on the next get
+            logger.warning("Refresh {0}: {1}".format(url, ex))
+        finally:
+            with self._lock:
+                self._refreshing.discard(url)
@@ -0,0 +1,220 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+The request metrics of the Bridge clients.
+A metrics sink is any object implementing:
+    record_request(method, url, status, seconds, bytes_in, bytes_out)
+        called once for each request sent (every retry included),
+        seconds is the network time
+    record_phase(phase, seconds, count)
+        called once for each users page: phase "decode" (JSON parsing)
+        or "build" (creating the count BridgeUser objects)
+and is set as the metrics attribute of a Bridge object.
+When the attribute is None (the default) nothing is timed.
+"""
+
+from functools import lru_cache
+import threading
+
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                   5.0, 10.0, 30.0, 60.0)
+
+
+def get_metrics(dao):
+    """
+    Return the BridgeMetrics shared by the process for the given DAO's
+    service or None if RESTCLIENTS_BRIDGE_METRICS is not set.
+    """
+    enabled = dao.get_service_setting("METRICS", False)
+    if isinstance(enabled, str):
+        enabled = enabled.lower() in ("true", "yes", "1")
+    if not enabled:
+        return None
+    key = dao.service_name()
+    with _metrics_lock:
+        if key not in _metrics:
+            _metrics[key] = BridgeMetrics()
+        return _metrics[key]
+
+
+@lru_cache(maxsize=1024)
+def get_endpoint(url):
+    """
+    Return the url path with the ids replaced, i.e.
+    /api/author/users/{id}, /api/admin/users/{uid}/roles/batch
+    """
+    path = url.split("?", 1)[0]
+    segments = []
+    for segment in path.split("/"):
+        if segment.isdigit():
+            segment = "{id}"
+        elif segment.startswith("uid%3A") or segment.startswith("uid:"):
+            segment = "{uid}"
+        segments.append(segment)
+    return "/".join(segments)
+
+
+class Histogram(object):
+
+    def __init__(self, buckets=SECONDS_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def cumulative_counts(self):
+        total = 0
+        for count in self.counts:
+            total += count
+            yield total
+
+    def quantile(self, q):
+        """
+        Return the upper bound of the bucket holding the q quantile
+        """
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        for bound, total in zip(self.buckets, self.cumulative_counts()):
+            if total >= rank:
+                return bound
+        return float("inf")
+
+
+class BridgeMetrics(object):
+    """
+    An in-memory metrics sink of histograms and counters
+    """
+
+    def __init__(self):
+        self.requests = {}      # {(method, endpoint): Histogram}
+        self.statuses = {}      # {(method, endpoint, status): count}
+        self.bytes_in = {}      # {(method, endpoint): bytes}
+        self.bytes_out = {}
+        self.phases = {}        # {phase: Histogram}
+        self.users = {}         # {phase: count}
+        self._lock = threading.Lock()
+
+    def record_request(self, method, url, status, seconds,
+                       bytes_in, bytes_out):
+        key = (method, get_endpoint(url))
+        with self._lock:
+            histogram = self.requests.get(key)
+            if histogram is None:
+                histogram = self.requests[key] = Histogram()
+            histogram.observe(seconds)
+            status_key = key + (status,)
+            self.statuses[status_key] = self.statuses.get(status_key, 0) + 1
+            self.bytes_in[key] = self.bytes_in.get(key, 0) + bytes_in
+            self.bytes_out[key] = self.bytes_out.get(key, 0) + bytes_out
+
+    def record_phase(self, phase, seconds, count=0):
+        with self._lock:
+            histogram = self.phases.get(phase)
+            if histogram is None:
+                histogram = self.phases[phase] = Histogram()
+            histogram.observe(seconds)
+            self.users[phase] = self.users.get(phase, 0) + count
+
+    def get_stats(self):
+        """
+        Return a dict of {"METHOD endpoint": {count, errors, seconds, p50,
+        p99, bytes_in, bytes_out}} and the phases {phase: {count, seconds}}
+        """
+        with self._lock:
+            ret = {}
+            for (method, endpoint), histogram in self.requests.items():
+                errors = sum(
+                    count for (m, e, status), count in self.statuses.items()
+                    if m == method and e == endpoint and
+                    not 200 <= status < 400)
+                ret["{0} {1}".format(method, endpoint)] = {
+                    "count": histogram.count,
+                    "errors": errors,
+                    "seconds": histogram.sum,
+                    "p50": histogram.quantile(0.5),
+                    "p99": histogram.quantile(0.99),
+                    "bytes_in": self.bytes_in[(method, endpoint)],
+                    "bytes_out": self.bytes_out[(method, endpoint)]}
+            for phase, histogram in self.phases.items():
+                ret[phase] = {"count": histogram.count,
+                              "seconds": histogram.sum,
+                              "users": self.users[phase]}
+            return ret
+
+    def reset(self):
+        with self._lock:
+            for stats in (self.requests, self.statuses, self.bytes_in,
+                          self.bytes_out, self.phases, self.users):
+                stats.clear()
+
+    def to_prometheus(self, prefix="bridge"):
+        """
+        Return the metrics in the Prometheus text exposition format
+        """
+        lines = []
+        with self._lock:
+            name = "{0}_request_seconds".format(prefix)
+            lines.append("# TYPE {0} histogram".format(name))
+            for key, histogram in sorted(self.requests.items()):
+                _add_histogram(lines, name, histogram, {
+                    "method": key[0], "endpoint": key[1]})
+
+            name = "{0}_requests_total".format(prefix)
+            lines.append("# TYPE {0} counter".format(name))
+            for key, count in sorted(self.statuses.items()):
+                lines.append("{0}{1} {2}".format(name, _labels({
+                    "method": key[0], "endpoint": key[1],
+                    "status": key[2]}), count))
+
+            for direction, counts in (("received", self.bytes_in),
+                                      ("sent", self.bytes_out)):
+                name = "{0}_bytes_{1}_total".format(prefix, direction)
+                lines.append("# TYPE {0} counter".format(name))
+                for key, count in sorted(counts.items()):
+                    lines.append("{0}{1} {2}".format(name, _labels({
+                        "method": key[0], "endpoint": key[1]}), count))
+
+            name = "{0}_phase_seconds".format(prefix)
+            lines.append("# TYPE {0} histogram".format(name))
+            for phase, histogram in sorted(self.phases.items()):
+                _add_histogram(lines, name, histogram, {"phase": phase})
+
+            name = "{0}_users_total".format(prefix)
+            lines.append("# TYPE {0} counter".format(name))
+            for phase, count in sorted(self.users.items()):
+                lines.append("{0}{1} {2}".format(
+                    name, _labels({"phase": phase}), count))
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    return "{{{0}}}".format(",".join(
+        '{0}="{1}"'.format(key, str(value).replace(
+            "\\", "\\\\").replace('"', '\\"'))
+        for key, value in labels.items()))
+
+
+def _add_histogram(lines, name, histogram, labels):
+    for bound, total in zip(histogram.buckets,
+                            histogram.cumulative_counts()):
+        lines.append("{0}_bucket{1} {2}".format(
+            name, _labels(dict(labels, le=repr(bound))), total))
+    lines.append("{0}_bucket{1} {2}".format(
+        name, _labels(dict(labels, le="+Inf")), histogram.count))
+    lines.append("{0}_sum{1} {2}".format(
+        name, _labels(labels), repr(histogram.sum)))
+    lines.append("{0}_count{1} {2}".format(
+        name, _labels(labels), histogram.count))
@@ -72,6 +72,9 @@ class BridgeUser(models.Model):
     next_due_date = models.DateTimeField(null=True, default=None)
     completed_courses_count = models.IntegerField(default=-1)
 
+    # always in the PATCH body
+    ID_KEYS = ("uid", "id")
+
     def add_role(self, user_role):
         if user_role not in self.roles:
             self.roles.append(user_role)
@@ -112,11 +115,21 @@ class BridgeUser(models.Model):
         # return the corresponding BridgeCustomField object
         return self.custom_fields.get(field_name)
 
+    def get_custom_field_value(self, field_name):
+        cf = self.get_custom_field(field_name)
+        return cf.value if cf is not None else None
+
+    def get_role_ids(self):
+        return [r.role_id for r in self.roles]
+
     def update_custom_field(self, field_name, new_value):
-        # update an existing custom field
+        # update an existing custom field, replacing rather than changing
+        # the BridgeCustomField as it may be shared
         cf = self.get_custom_field(field_name)
         if cf is not None:
-            cf.value = new_value
+            self.custom_fields[field_name] = BridgeCustomField(
+                field_id=cf.field_id, name=cf.name, value_id=cf.value_id,
+                value=new_value)
 
     def has_custom_field(self):
         return len(self.custom_fields.keys()) > 0
@@ -168,12 +181,68 @@ class BridgeUser(models.Model):
         user_data["custom_field_values"] = self.custom_fields_json()
         return {"users": [user_data]}
 
-    def to_json_patch(self):
-        # for PATCH, PUT (update)
+    def to_json_patch(self, changes_only=False):
+        """
+        For PATCH, PUT (update)
+        :param changes_only: True to only include the attributes and
+         the custom field values changed since the user was loaded,
+         along with the uid and id. Ignored if the original state is unknown.
+        """
         user_data = self.to_json()
-        user_data["custom_field_values"] = self.custom_fields_json()
+        custom_fields = self.custom_fields_json()
+        if changes_only and self.original is not None:
+            user_data, custom_fields = self._get_changes(
+                user_data, custom_fields)
+            if len(custom_fields) == 0:
+                return {"user": user_data}
+        user_data["custom_field_values"] = custom_fields
         return {"user": user_data}
 
+    def set_original(self, fields=None, custom_field_values=None):
+        """
+        Keep the state of the user as loaded from Bridge
+        :param fields: a dict of the field values given to BridgeUser,
+         default to the current ones
+        :param custom_field_values: a list of (field_id, value_id, value),
+         default to the current custom fields
+        """
+        if fields is None:
+            fields = {name: getattr(self, name)
+                      for name in BridgeUserRecord.FIELDS}
+        if custom_field_values is None:
+            custom_field_values = [(cf.field_id, cf.value_id, cf.value)
+                                   for cf in self.custom_fields.values()]
+        self.original = (fields, custom_field_values)
+
+    def has_changes(self):
+        """
+        Return True if the user differs from its original state
+        (or the original state is unknown)
+        """
+        if self.original is None:
+            return True
+        # a renamed netid is a change, the uid is sent anyway
+        if self.netid != self.original[0].get("netid"):
+            return True
+        user_data = self.to_json_patch(changes_only=True)["user"]
+        return len(set(user_data) - set(BridgeUser.ID_KEYS)) > 0
+
+    def _get_changes(self, user_data, custom_fields):
+        fields, custom_field_values = self.original
+        original_data = BridgeUser(**fields).to_json()
+        changes = {key: value for key, value in user_data.items()
+                   if key in BridgeUser.ID_KEYS or
+                   key not in original_data or original_data[key] != value}
+
+        original_values = {
+            field_id: (value_id, value)
+            for field_id, value_id, value in custom_field_values}
+        changed_values = [
+            cf for cf in custom_fields
+            if original_values.get(cf["custom_field_id"]) != (
+                cf.get("id"), cf["value"])]
+        return changes, changed_values
+
     def roles_to_json(self):
         return [r.role_id for r in self.roles]
 
@@ -199,6 +268,109 @@ class BridgeUser(models.Model):
         # A user may have a long list of custom fields.
         # For a quick lookup, use a dict of {field_name: BridgeCustomField}
         self.roles = []
+        self.original = None
+        # (fields, custom_field_values) as loaded, see set_original
+
+
+class BridgeUserRecord(object):
+    """
+    A compact read-only user record for the bulk reads.
+    Takes a fraction of the memory of a BridgeUser,
+    use to_bridge_user() to get a BridgeUser to be updated.
+    """
+    FIELDS = ("bridge_id", "netid", "email", "full_name", "first_name",
+              "last_name", "department", "job_title", "hired_at",
+              "is_manager", "locale", "manager_id", "manager_netid",
+              "deleted_at", "logged_in_at", "updated_at", "unsubscribed",
+              "next_due_date", "completed_courses_count")
+    DEFAULTS = {"bridge_id": 0, "email": "", "full_name": "", "locale": "en",
+                "manager_id": 0, "completed_courses_count": -1}
+    __slots__ = FIELDS + ("custom_fields", "roles")
+
+    def __init__(self, custom_fields=(), roles=(), **kwargs):
+        """
+        :param custom_fields: a tuple of
+         (name, field_id, value_id, value) tuples
+        :param roles: a tuple of (role_id, name) tuples
+        """
+        for field in BridgeUserRecord.FIELDS:
+            object.__setattr__(self, field, kwargs.pop(
+                field, BridgeUserRecord.DEFAULTS.get(field)))
+        if len(kwargs):
+            raise TypeError("Unknown fields: {0}".format(list(kwargs)))
+        object.__setattr__(self, "custom_fields", tuple(custom_fields))
+        object.__setattr__(self, "roles", tuple(roles))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("BridgeUserRecord is read-only")
+
+    def __delattr__(self, name):
+        raise AttributeError("BridgeUserRecord is read-only")
+
+    def is_deleted(self):
+        return self.deleted_at is not None
+
+    def get_uid(self):
+        return "{}@uw.edu".format(self.netid)
+
+    def has_course_summary(self):
+        return self.completed_courses_count >= 0
+
+    def has_bridge_id(self):
+        return self.bridge_id > 0
+
+    def has_manager(self):
+        return self.manager_id > 0 or self.manager_netid is not None
+
+    def has_custom_field(self):
+        return len(self.custom_fields) > 0
+
+    def get_custom_field(self, field_name):
+        # return a new BridgeCustomField object or None
+        for name, field_id, value_id, value in self.custom_fields:
+            if name == field_name:
+                return BridgeCustomField(field_id=field_id, name=name,
+                                         value_id=value_id, value=value)
+        return None
+
+    def get_custom_field_value(self, field_name):
+        for field in self.custom_fields:
+            if field[0] == field_name:
+                return field[3]
+        return None
+
+    def get_role_ids(self):
+        return [role[0] for role in self.roles]
+
+    def to_bridge_user(self):
+        """
+        Return a new BridgeUser object with the same values,
+        as loaded (see BridgeUser.set_original)
+        """
+        user = BridgeUser(**{field: getattr(self, field)
+                             for field in BridgeUserRecord.FIELDS})
+        for name, field_id, value_id, value in self.custom_fields:
+            user.custom_fields[name] = BridgeCustomField(
+                field_id=field_id, name=name, value_id=value_id, value=value)
+        for role_id, name in self.roles:
+            user.roles.append(BridgeUserRole(role_id=role_id, name=name))
+        user.set_original()
+        return user
+
+    @staticmethod
+    def from_bridge_user(user):
+        return BridgeUserRecord(
+            custom_fields=[(cf.name, cf.field_id, cf.value_id, cf.value)
+                           for cf in user.custom_fields.values()],
+            roles=[(r.role_id, r.name) for r in user.roles],
+            **{field: getattr(user, field)
+               for field in BridgeUserRecord.FIELDS})
+
+    def to_json(self):
+        return self.to_bridge_user().to_json()
+
+    def __str__(self):
+        return str(self.to_bridge_user())
 
 
 class BridgeUserRole(models.Model):
@@ -239,3 +411,16 @@ class BridgeUserRole(models.Model):
 
     def __str__(self):
         return json.dumps(self.to_json())
+
+
+def _init_field_keys(*model_classes):
+    # restclients_core keys the field values by a timestamp set on the
+    # field on its first use; set them at import so that the threads
+    # using a field for the first time concurrently get the same key
+    for model_class in model_classes:
+        for value in vars(model_class).values():
+            if isinstance(value, models.BaseField):
+                value._key_for_instance(value)
+
+
+_init_field_keys(BridgeCustomField, BridgeUser, BridgeUserRole)
@@ -0,0 +1,386 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+A users page decoder: the mapping of the user data to the model fields is
+worked out once, then each page is processed in a single pass without the
+per-field overhead of the restclients_core Model constructors.
+With an Interner, the users of a bulk read share their repeated strings
+and role objects.
+"""
+
+import logging
+import re
+import threading
+import weakref
+from restclients_core.models.fields import BaseField
+from uw_bridge.models import (
+    BridgeCustomField, BridgeUser, BridgeUserRecord, BridgeUserRole)
+from uw_bridge.util import parse_date
+
+
+logger = logging.getLogger(__name__)
+UW_DOMAIN = "@uw.edu"
+
+# (field name, user data key, default value)
+VALUE_FIELDS = (
+    ("email", "email", ""),
+    ("full_name", "full_name", ""),
+    ("first_name", "first_name", None),
+    ("last_name", "last_name", None),
+    ("department", "department", None),
+    ("job_title", "job_title", None),
+    ("locale", "locale", "en"),
+    ("is_manager", "is_manager", None),
+    ("unsubscribed", "unsubscribed", None),
+    ("completed_courses_count", "completed_courses_count", -1),
+)
+# (field name, user data key)
+DATE_FIELDS = (
+    ("hired_at", "hire_date"),
+    ("deleted_at", "deleted_at"),
+    ("logged_in_at", "loggedInAt"),
+    ("updated_at", "updated_at"),
+    ("next_due_date", "next_due_date"),
+)
+USER_FIELDS = (("bridge_id", "netid") +
+               tuple(name for name, key, default in VALUE_FIELDS) +
+               tuple(name for name, key in DATE_FIELDS))
+# the fields whose few values repeat across the users
+INTERNED_FIELDS = ("department", "job_title", "locale")
+INTERNED_INDEXES = tuple(USER_FIELDS.index(name) for name in INTERNED_FIELDS)
+_factories = {}
+_factories_lock = threading.Lock()
+
+
+def strip_uw_domain(uid):
+    """
+    Return the uid without "@uw.edu", same as re.sub('@uw.edu', '', uid)
+    """
+    if "@uw" not in uid:
+        return uid
+    if uid.endswith(UW_DOMAIN) and uid.count("@uw") == 1:
+        return uid[:-len(UW_DOMAIN)]
+    return re.sub(UW_DOMAIN, '', uid)
+
+
+class ModelFactory(object):
+    """
+    Creates the objects of a restclients_core Model with the given fields
+    set, leaving them in the same state as model(**kwargs) would.
+    The field keys are computed once rather than on every assignment.
+    If the Model internals do not match what is expected, falls back to
+    calling the model class.
+    """
+
+    def __init__(self, model, names, extra=()):
+        """
+        :param names: the names of the fields given to new(), in order
+        :param extra: the attributes set by the model's __init__,
+                      to be set by the caller
+        """
+        self.model = model
+        self.names = tuple(names)
+        fields = [self._get_field(name) for name in self.names]
+        self.keys = tuple(field._key_for_instance(field) for field in fields)
+        self.refs = frozenset(weakref.ref(field) for field in fields)
+        self.compiled = False
+        self.compiled = self._check(extra)
+
+    def _get_field(self, name):
+        for cls in self.model.__mro__:
+            if name in cls.__dict__:
+                field = cls.__dict__[name]
+                if isinstance(field, BaseField):
+                    return field
+        raise AttributeError("{0} has no field {1}".format(
+            self.model.__name__, name))
+
+    def _check(self, extra):
+        values = tuple(range(len(self.names)))
+        try:
+            expected = vars(self.model(**dict(zip(self.names, values))))
+            state = vars(self._new(values))
+        except Exception as ex:
+            logger.warning("{0}: {1}".format(self.model.__name__, ex))
+            return False
+        for key in extra:
+            expected.pop(key, None)
+        if state != expected:
+            logger.warning("{0}: not compiled".format(self.model.__name__))
+            return False
+        return True
+
+    def new(self, values):
+        """
+        Return a new model object given the field values in names order
+        """
+        if not self.compiled:
+            return self.model(**dict(zip(self.names, values)))
+        return self._new(values)
+
+    def _new(self, values):
+        # Model.__getattribute__ is slow, only set the attributes
+        obj = self.model.__new__(self.model)
+        obj.initialized = True
+        obj._dynamic_fields = set(self.refs)
+        obj._field_values = dict(zip(self.keys, values))
+        return obj
+
+
+def get_factory(model, names, extra=()):
+    """
+    Return the process wide ModelFactory of the model and field names,
+    as the field keys do not change.
+    """
+    key = (model, tuple(names))
+    with _factories_lock:
+        if key not in _factories:
+            _factories[key] = ModelFactory(model, names, extra)
+        return _factories[key]
+
+
+class Interner(object):
+    """
+    The flyweights of a bulk read: one str object per distinct value of
+    the INTERNED_FIELDS, of the custom field ids and of the custom field
+    values, one BridgeUserRole (or role tuple) per role. Use one per bulk
+    read so that it is released along with the users.
+    The values of a custom field are no longer interned once it has more
+    than max_field_values distinct ones, i.e. a regid or an employee id
+    unique per user.
+    The shared roles are not to be changed; BridgeUser.add_role and
+    delete_role change the user's own list, update_custom_field replaces
+    the BridgeCustomField rather than changing it.
+    """
+
+    MAX_FIELD_VALUES = 1000
+
+    def __init__(self, max_field_values=MAX_FIELD_VALUES):
+        self.max_field_values = max_field_values
+        self.strings = {}
+        self.field_values = {}   # {field_id: {value: value} or None}
+        self.roles = {}          # {(role_id, name): BridgeUserRole}
+        self.record_roles = {}   # {tuple of (role_id, name): itself}
+
+    def intern(self, value):
+        """
+        Return the shared str equal to the value, other types as is
+        """
+        if type(value) is not str:
+            return value
+        return self.strings.setdefault(value, value)
+
+    def intern_value(self, field_id, value):
+        """
+        Return the shared str equal to the value of the custom field,
+        the value as is if the field has too many distinct values
+        """
+        if type(value) is not str:
+            return value
+        values = self.field_values.get(field_id, {})
+        if values is None:
+            return value
+        shared = values.get(value)
+        if shared is not None:
+            return shared
+        if len(values) >= self.max_field_values:
+            # unique per user, not worth keeping
+            self.field_values[field_id] = None
+            return value
+        if len(values) == 0:
+            self.field_values[field_id] = values
+        values[value] = value
+        return value
+
+    def get_stats(self):
+        return {"strings": len(self.strings) + sum(
+                    len(values) for values in self.field_values.values()
+                    if values is not None),
+                "roles": len(self.roles) + len(self.record_roles),
+                "uninterned_fields": sum(
+                    1 for values in self.field_values.values()
+                    if values is None)}
+
+
+class PageDecoder(object):
+    """
+    Turns the users of a page into BridgeUser (or BridgeUserRecord)
+    objects. Create one per page:
+
+        PageDecoder(custom_fields, user_roles, resp_data.get("linked"))
+    """
+
+    def __init__(self, custom_fields, user_roles, linked_data, records=False,
+                 interner=None, errors=None):
+        """
+        :param interner: the Interner of the bulk read or None
+        :param errors: a list to append the (exception, user data) of the
+         invalid users to, or None
+        :except KeyError: if the linked custom field values are malformed
+        """
+        self.records = records
+        self.interner = interner
+        self.errors = errors
+        self.field_names = custom_fields.id_name_map
+        self.role_names = user_roles.id_name_map
+        self.custom_field_values = self._get_custom_field_values(linked_data)
+        # a dict of {value_id: (field_id, value_id, value)}
+        self.custom_field_cache = {}
+        # a dict of {value_id: (name, BridgeCustomField)}
+        self.user_factory = get_factory(
+            BridgeUser, USER_FIELDS,
+            ("custom_fields", "roles", "original"))
+        self.manager_user_factory = get_factory(
+            BridgeUser, USER_FIELDS + ("manager_id",),
+            ("custom_fields", "roles", "original"))
+        self.field_factory = get_factory(
+            BridgeCustomField, ("field_id", "name", "value_id", "value"))
+        self.role_factory = get_factory(BridgeUserRole, ("role_id", "name"))
+
+    def decode(self, users_data, users):
+        """
+        Append the users created from the list of user data to users
+        """
+        new_user = self.new_record if self.records else self.new_user
+        append = users.append
+        for user_data in users_data:
+            try:
+                append(new_user(user_data))
+            except Exception as err:
+                self._skip(err, user_data)
+        return users
+
+    def decode_user(self, user_data):
+        """
+        Return the user created from the user data, None if it is invalid
+        """
+        try:
+            if self.records:
+                return self.new_record(user_data)
+            return self.new_user(user_data)
+        except Exception as err:
+            self._skip(err, user_data)
+        return None
+
+    def _skip(self, err, user_data):
+        logger.error("{0} in {1}".format(str(err), user_data))
+        if self.errors is not None:
+            self.errors.append((err, user_data))
+
+    def _get_custom_field_values(self, linked_data):
+        values = {}
+        if (len(linked_data) == 0 or
+                linked_data.get("custom_field_values") is None):
+            return values
+        if self.interner is None:
+            for value in linked_data["custom_field_values"]:
+                values[value["id"]] = (
+                    value["links"]["custom_field"]["id"],
+                    value["id"], value["value"])
+            return values
+        intern = self.interner.intern
+        intern_value = self.interner.intern_value
+        for value in linked_data["custom_field_values"]:
+            field_id = intern(value["links"]["custom_field"]["id"])
+            values[value["id"]] = (
+                field_id, value["id"], intern_value(field_id, value["value"]))
+        return values
+
+    def get_field_values(self, user_data):
+        """
+        Return the list of the field values in USER_FIELDS order
+        """
+        get = user_data.get
+        values = [int(user_data["id"]), strip_uw_domain(user_data["uid"])]
+        values.extend([get(key, default)
+                       for name, key, default in VALUE_FIELDS])
+        values.extend([parse_date(get(key)) for name, key in DATE_FIELDS])
+        if self.interner is not None:
+            intern = self.interner.intern
+            for index in INTERNED_INDEXES:
+                values[index] = intern(values[index])
+        return values
+
+    def get_value_ids(self, user_data):
+        links = user_data.get("links")
+        if links and "custom_field_values" in links:
+            values = self.custom_field_values
+            return [value_id for value_id in links["custom_field_values"]
+                    if value_id in values]
+        return ()
+
+    def new_user(self, user_data):
+        values = self.get_field_values(user_data)
+        manager_id = user_data.get("manager_id")
+        if manager_id is None:
+            factory = self.user_factory
+        else:
+            values.append(int(manager_id))
+            factory = self.manager_user_factory
+        user = factory.new(values)
+
+        custom_fields = {}
+        value_ids = self.get_value_ids(user_data)
+        for value_id in value_ids:
+            name, custom_field = self._get_custom_field(value_id)
+            custom_fields[name] = custom_field
+        user.custom_fields = custom_fields
+        user.original = (
+            dict(zip(factory.names, values)),
+            [self.custom_field_values[value_id] for value_id in value_ids])
+
+        roles = []
+        role_ids = user_data.get("roles")
+        if role_ids is not None:
+            new_role = self.role_factory.new
+            role_names = self.role_names
+            if self.interner is not None:
+                new_role = self._get_shared_role
+            for role_id in role_ids:
+                roles.append(new_role((role_id, role_names.get(role_id))))
+        user.roles = roles
+        return user
+
+    def _get_shared_role(self, key):
+        # key: (role_id, name)
+        shared = self.interner.roles
+        role = shared.get(key)
+        if role is None:
+            role = shared.setdefault(key, self.role_factory.new(key))
+        return role
+
+    def _get_custom_field(self, value_id):
+        # the users of a page share the BridgeCustomField of a value
+        # return (name, BridgeCustomField)
+        item = self.custom_field_cache.get(value_id)
+        if item is None:
+            field_id, value_id, value = self.custom_field_values[value_id]
+            name = self.field_names.get(field_id)
+            item = (name, self.field_factory.new(
+                (field_id, name, value_id, value)))
+            self.custom_field_cache[value_id] = item
+        return item
+
+    def new_record(self, user_data):
+        fields = dict(zip(USER_FIELDS, self.get_field_values(user_data)))
+        if user_data.get("manager_id") is not None:
+            fields["manager_id"] = int(user_data["manager_id"])
+        field_names = self.field_names
+        custom_fields = []
+        for value_id in self.get_value_ids(user_data):
+            field_id, value_id, value = self.custom_field_values[value_id]
+            custom_fields.append(
+                (field_names.get(field_id), field_id, value_id, value))
+        return BridgeUserRecord(
+            custom_fields=custom_fields,
+            roles=self._get_record_roles(user_data.get("roles") or ()),
+            **fields)
+
+    def _get_record_roles(self, role_ids):
+        role_names = self.role_names
+        roles = tuple((role_id, role_names.get(role_id))
+                      for role_id in role_ids)
+        if self.interner is None:
+            return roles
+        return self.interner.record_roles.setdefault(roles, roles)
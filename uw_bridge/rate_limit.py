@@ -0,0 +1,142 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+A client side token bucket rate limiter shared by all the Bridge requests.
+The rate adapts to the throttling responses of Bridge:
+it is halved on a 429 (or 503) response and the requests are paused for
+the Retry-After period, then it grows back step by step up to the limit.
+"""
+
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import logging
+import threading
+import time
+from uw_bridge.util import get_header
+
+
+logger = logging.getLogger(__name__)
+THROTTLE_STATUS = (429, 503)
+MAX_RETRY_AFTER = 300   # seconds
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_retry_after(response):
+    """
+    Return the seconds in the Retry-After header of the response or None
+    """
+    value = get_header(response, "Retry-After")
+    if value is None:
+        return None
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        try:
+            seconds = (parsedate_to_datetime(value) -
+                       datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+def get_rate_limiter(dao):
+    """
+    Return the RateLimiter shared by the process for the given DAO's
+    service or None if RESTCLIENTS_BRIDGE_RATE_LIMIT is not set.
+    """
+    max_rate = dao.get_service_setting("RATE_LIMIT", None)
+    if max_rate is None:
+        return None
+    key = (dao.service_name(), float(max_rate))
+    with _limiters_lock:
+        if key not in _limiters:
+            _limiters[key] = RateLimiter(
+                float(max_rate),
+                burst=dao.get_service_setting("RATE_LIMIT_BURST", None),
+                max_retries=int(dao.get_service_setting(
+                    "RATE_LIMIT_RETRIES", 3)))
+        return _limiters[key]
+
+
+class RateLimiter(object):
+
+    def __init__(self, max_rate, burst=None, min_rate=0.1,
+                 increase=None, decrease=0.5, max_retries=3):
+        """
+        :param max_rate: the maximum number of requests per second
+        :param burst: the number of requests allowed at once,
+         default to max_rate
+        :param min_rate: the rate will not be reduced below this
+        :param increase: the rate added after each accepted request,
+         default to 1% of the max_rate
+        :param decrease: the rate is multiplied by it on a throttling
+        :param max_retries: the number of times to re-send
+         a throttled request
+        """
+        self.max_rate = float(max_rate)
+        self.min_rate = min(float(min_rate), self.max_rate)
+        self.burst = float(burst) if burst is not None else max(
+            self.max_rate, 1.0)
+        self.increase = (float(increase) if increase is not None
+                         else self.max_rate / 100)
+        self.decrease = float(decrease)
+        self.max_retries = max_retries
+        self.rate = self.max_rate
+        self.tokens = self.burst
+        self.paused_until = 0.0
+        self.throttled = 0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Take a token
+        :returns: the seconds to wait before sending the request
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.paused_until - now)
+
+    def acquire(self):
+        """
+        Block until a request can be sent
+        """
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def update(self, response):
+        """
+        Adjust the rate to the given response
+        :returns: True if the response is a throttling to be retried
+        """
+        retry_after = get_retry_after(response)
+        if response.status not in THROTTLE_STATUS:
+            with self._lock:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+            return False
+
+        with self._lock:
+            now = time.monotonic()
+            self.throttled += 1
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self.tokens = min(self.tokens, 0.0)
+            pause = retry_after if retry_after is not None else 1 / self.rate
+            self.paused_until = max(self.paused_until, now + pause)
+        logger.warning("Throttled by Bridge ({0}), rate: {1:.2f}/s".format(
+            response.status, self.rate))
+        # a 503 may come from a failed request, only retry it if asked to
+        return response.status == 429 or retry_after is not None
+
+    def get_stats(self):
+        return {"rate": self.rate,
+                "max_rate": self.max_rate,
+                "throttled": self.throttled}
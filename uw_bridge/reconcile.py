@@ -0,0 +1,344 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Reconcile the Bridge user accounts with a desired roster, i.e. an HR
+extract, in bulk:
+
+    reconciler = Reconciler(bridge)
+    plan = reconciler.plan(desired_users)
+    report = reconciler.run(plan)
+    logger.info(report)
+"""
+
+import logging
+import time
+from functools import partial
+from restclients_core.exceptions import DataFailureException
+from uw_bridge.users import BridgeAccounts
+
+
+logger = logging.getLogger(__name__)
+CURRENT_INCLUDES = ['custom_fields']
+
+ADD = "add"
+RESTORE = "restore"
+CHANGE_UID = "change_uid"
+UPDATE = "update"
+DELETE = "delete"
+STEPS = (ADD, RESTORE, CHANGE_UID, UPDATE, DELETE)
+
+
+def get_phase(action):
+    """
+    Return the index of the run phase of the action: 0 deletes,
+    1 restores, uid changes and updates, 2 adds
+    """
+    if DELETE in action.steps:
+        return 0
+    if ADD in action.steps:
+        return 2
+    return 1
+
+
+class ReconcileAction(object):
+    """
+    The steps to bring one account to its desired state, in STEPS order
+    """
+
+    def __init__(self, user, current=None, steps=(), changes=()):
+        self.user = user          # the desired BridgeUser
+        self.current = current    # the BridgeUser in Bridge or None
+        self.steps = list(steps)
+        self.changes = list(changes)  # the keys in the PATCH body
+        self.done = []
+
+    def get_bridge_id(self):
+        if self.current is not None:
+            return self.current.bridge_id
+        return self.user.bridge_id
+
+    def __str__(self):
+        return "{0}({1}): {2} {3}".format(
+            self.user.netid, self.get_bridge_id(), self.steps, self.changes)
+
+
+class ReconcilePlan(object):
+
+    def __init__(self):
+        self.actions = []
+        self.unchanged = 0
+        self.duplicates = []   # the desired users given more than once
+
+    def add(self, action):
+        self.actions.append(action)
+
+    def get_actions(self, step):
+        """
+        Return the actions having the given step, one of STEPS
+        """
+        return [action for action in self.actions if step in action.steps]
+
+    def get_counts(self):
+        counts = {step: len(self.get_actions(step)) for step in STEPS}
+        counts["unchanged"] = self.unchanged
+        counts["duplicate"] = len(self.duplicates)
+        return counts
+
+    def __len__(self):
+        return len(self.actions)
+
+    def __str__(self):
+        return str(self.get_counts())
+
+
+class ReconcileReport(object):
+
+    def __init__(self, plan, results, seconds=0.0):
+        """
+        :param results: the list of BulkResult of the plan actions
+        """
+        self.plan = plan
+        self.results = results
+        self.seconds = seconds
+
+    def get_errors(self):
+        """
+        Return a list of (ReconcileAction, exception) of the failed actions
+        """
+        return [(result.item, result.error) for result in self.results
+                if not result.is_success()]
+
+    def get_summary(self):
+        """
+        Return a dict of {step: {planned, succeeded, failed}} along
+        with the unchanged and the duplicate counts
+        """
+        summary = {step: {"planned": 0, "succeeded": 0, "failed": 0}
+                   for step in STEPS}
+        for result in self.results:
+            action = result.item
+            for step in action.steps:
+                counts = summary[step]
+                counts["planned"] += 1
+                if step in action.done:
+                    counts["succeeded"] += 1
+                elif not result.is_success():
+                    counts["failed"] += 1
+        summary["unchanged"] = self.plan.unchanged
+        summary["duplicate"] = len(self.plan.duplicates)
+        return summary
+
+    def is_success(self):
+        return len(self.get_errors()) == 0
+
+    def __str__(self):
+        summary = self.get_summary()
+        lines = ["{0}: {1:d} planned, {2:d} succeeded, {3:d} failed".format(
+            step, summary[step]["planned"], summary[step]["succeeded"],
+            summary[step]["failed"]) for step in STEPS]
+        lines.append("unchanged: {0:d}, duplicate: {1:d}".format(
+            summary["unchanged"], summary["duplicate"]))
+        lines.extend("{0} failed: {1}".format(action, error)
+                     for action, error in self.get_errors())
+        return "\n".join(lines)
+
+
+class Reconciler(object):
+
+    def __init__(self, bridge=None):
+        """
+        :param bridge: the BridgeAccounts to use, created if not given
+        """
+        self.bridge = bridge if bridge is not None else BridgeAccounts()
+
+    def reconcile(self, desired, current=None, delete_missing=False,
+                  concurrency=None):
+        """
+        Plan and run, return a ReconcileReport
+        """
+        return self.run(self.plan(desired, current=current,
+                                  delete_missing=delete_missing,
+                                  concurrency=concurrency),
+                        concurrency=concurrency)
+
+    def plan(self, desired, current=None, delete_missing=False,
+             concurrency=None):
+        """
+        Match the desired users with the current ones on bridge_id,
+        then netid, and return a ReconcilePlan. The desired users matching
+        none of them are then looked up in Bridge, including the deleted
+        accounts, concurrently, before being planned as an ADD.
+        :param desired: an iterable of BridgeUser, the bridge_id is
+         optional. These objects are updated with the bridge_id, the
+         custom field value ids and the manager_id of the matching
+         accounts and are the ones sent to Bridge.
+        :param current: an iterable of BridgeUser in Bridge (a deleted
+         one is restored if desired), default to the active users
+        :param delete_missing: True to delete the active users
+         not in desired, off by default as a partial desired roster
+         would delete the accounts left out
+        :param concurrency: the number of the unmatched desired users
+         looked up at a time, see run
+        """
+        if current is None:
+            current = self.bridge.iter_all_users(includes=CURRENT_INCLUDES)
+        by_id = {}
+        by_netid = {}
+        for user in current:
+            by_id[user.bridge_id] = user
+            if user.netid not in by_netid or not user.is_deleted():
+                by_netid[user.netid] = user
+
+        plan = ReconcilePlan()
+        seen = set()
+        matches = []     # [desired user, matching user or None]
+        unmatched = []   # the indexes in matches to look up in Bridge
+        for user in desired:
+            if user.netid in seen:
+                plan.duplicates.append(user)
+                continue
+            seen.add(user.netid)
+
+            if user.has_bridge_id():
+                match = by_id.get(user.bridge_id)
+            else:
+                match = by_netid.get(user.netid)
+            if match is None:
+                unmatched.append(len(matches))
+            matches.append([user, match])
+
+        # the deleted accounts, looked up concurrently
+        results = self.bridge.run_bulk(
+            partial(self._find_user, by_netid=by_netid),
+            [matches[i][0] for i in unmatched], concurrency)
+        for i, result in zip(unmatched, results):
+            if result.error is not None:
+                raise result.error
+            matches[i][1] = result.user
+
+        matched = set()
+        for user, match in matches:
+            if match is None or match.bridge_id in matched:
+                plan.add(ReconcileAction(user, steps=[ADD]))
+                continue
+            matched.add(match.bridge_id)
+
+            action = self._diff(user, match, by_netid)
+            if len(action.steps):
+                plan.add(action)
+            else:
+                plan.unchanged += 1
+
+        if delete_missing:
+            for user in by_id.values():
+                if user.bridge_id not in matched and not user.is_deleted():
+                    plan.add(ReconcileAction(user, current=user,
+                                             steps=[DELETE]))
+        logger.info("Reconcile plan: {0}".format(plan))
+        return plan
+
+    def _find_user(self, user, by_netid):
+        """
+        Return the account of a desired user not matching an active one
+        on bridge_id: the deleted account of the bridge_id, the active
+        account of the netid, or the deleted account of the netid.
+        """
+        match = None
+        if user.has_bridge_id():
+            match = self._get_deleted_user(bridge_id=user.bridge_id)
+            if match is None:
+                match = by_netid.get(user.netid)
+        if match is None:
+            match = self._get_deleted_user(netid=user.netid)
+        return match
+
+    def _get_deleted_user(self, bridge_id=None, netid=None):
+        # a desired bridge_id or netid not in the active users
+        try:
+            if bridge_id is not None:
+                user = self.bridge.get_user_by_id(bridge_id,
+                                                  include_deleted=True)
+            else:
+                user = self.bridge.get_user(netid, include_deleted=True)
+        except DataFailureException as ex:
+            if ex.status != 404:
+                raise
+            return None
+        if user is None:
+            return None
+        if bridge_id is not None and user.bridge_id != bridge_id:
+            return None
+        if netid is not None and user.netid != netid:
+            return None
+        return user
+
+    def _diff(self, user, current, by_netid):
+        """
+        Return the ReconcileAction of the desired user matching
+        the current one
+        """
+        steps = []
+        if current.is_deleted():
+            steps.append(RESTORE)
+        if user.netid != current.netid:
+            steps.append(CHANGE_UID)
+
+        user.bridge_id = current.bridge_id
+        for name, custom_field in user.custom_fields.items():
+            current_field = current.custom_fields.get(name)
+            if custom_field.value_id is None and current_field is not None:
+                custom_field.value_id = current_field.value_id
+        if (user.manager_id == 0 and user.manager_netid is not None and
+                user.manager_netid in by_netid):
+            user.manager_id = by_netid[user.manager_netid].bridge_id
+
+        if current.original is None:
+            current.set_original()
+        user.original = current.original
+        user_data = user.to_json_patch(changes_only=True)["user"]
+        changes = [key for key in user_data if key not in user.ID_KEYS]
+        if len(changes):
+            steps.append(UPDATE)
+        return ReconcileAction(user, current=current, steps=steps,
+                               changes=changes)
+
+    def run(self, plan, concurrency=None):
+        """
+        Run the plan actions concurrently, the steps of an action in order.
+        The deletes run first, then the restores, uid changes and updates,
+        then the adds, so that an add does not collide with the uid
+        an earlier action frees.
+        :param concurrency: the number of actions in flight,
+         default to the RESTCLIENTS_BRIDGE_BULK_CONCURRENCY setting.
+        Return a ReconcileReport
+        """
+        start = time.time()
+        phases = ([], [], [])
+        for action in plan.actions:
+            phases[get_phase(action)].append(action)
+        results = []
+        for actions in phases:
+            if len(actions):
+                results.extend(self.bridge.run_bulk(
+                    self._run_action, actions, concurrency))
+        report = ReconcileReport(plan, results, time.time() - start)
+        logger.info("Reconcile report: {0}".format(report.get_summary()))
+        return report
+
+    def _run_action(self, action):
+        bridge = self.bridge
+        bridge_id = action.get_bridge_id()
+        for step in action.steps:
+            if step == ADD:
+                bridge.add_user(action.user)
+            elif step == RESTORE:
+                bridge.restore_user_by_id(bridge_id)
+            elif step == CHANGE_UID:
+                bridge.change_uid(bridge_id, action.user.netid)
+            elif step == UPDATE:
+                bridge.update_user(action.user, changes_only=True)
+            elif step == DELETE:
+                bridge.delete_user_by_id(bridge_id)
+            action.done.append(step)
+        return True
@@ -0,0 +1,185 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+A process-wide LRU cache of the single user GET responses.
+A fresh response is returned without a request, an expired one is
+revalidated with If-None-Match/If-Modified-Since if Bridge gave it
+an ETag or Last-Modified header.
+The cached responses of a user are invalidated by its bridge_id
+or netid whenever the user is changed through BridgeAccounts, and a
+response requested before the invalidation is not cached after it.
+"""
+
+from collections import OrderedDict
+import threading
+import time
+from uw_bridge.util import get_header
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_response_cache(dao):
+    """
+    Return the ResponseCache shared by the process for the given DAO's
+    service or None if RESTCLIENTS_BRIDGE_RESPONSE_CACHE_TTL is not set.
+    """
+    ttl = float(dao.get_service_setting("RESPONSE_CACHE_TTL", 0))
+    if ttl <= 0:
+        return None
+    max_size = int(dao.get_service_setting("RESPONSE_CACHE_SIZE", 1000))
+    key = (dao.service_name(), ttl, max_size)
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = ResponseCache(ttl, max_size=max_size)
+        return _caches[key]
+
+
+class CachedResponse(object):
+    __slots__ = ("data", "etag", "last_modified", "expires", "tags")
+
+    def __init__(self, data, etag, last_modified, expires, tags):
+        self.data = data
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires = expires
+        self.tags = tags
+
+    def is_fresh(self):
+        return time.monotonic() < self.expires
+
+    def can_revalidate(self):
+        return self.etag is not None or self.last_modified is not None
+
+    def get_headers(self, headers):
+        """
+        Return the given request headers with the conditional ones added
+        """
+        headers = dict(headers)
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache(object):
+
+    def __init__(self, ttl, max_size=1000):
+        """
+        :param ttl: the seconds a response is used without revalidation
+        :param max_size: the maximum number of responses kept,
+         the least recently used ones are evicted first
+        """
+        self.ttl = float(ttl)
+        self.max_size = int(max_size)
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self._entries = OrderedDict()   # {url: CachedResponse}
+        self._tags = {}                 # {tag: set of url}
+        # the number of invalidations, the generation of the last one of
+        # each tag, the generation before which all are invalidated
+        self._generation = 0
+        self._invalidated = {}          # {tag: generation}
+        self._floor = 0
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        """
+        Return the CachedResponse of the url (fresh or not) or None
+        """
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None and entry.is_fresh():
+                self.hits += 1
+            else:
+                self.misses += 1
+            if entry is not None:
+                self._entries.move_to_end(url)
+            return entry
+
+    def get_generation(self):
+        """
+        Return the generation to give to put for a request started now
+        """
+        with self._lock:
+            return self._generation
+
+    def put(self, url, response, tags=(), generation=None):
+        """
+        Cache the response of the url
+        :param tags: the keys to invalidate it by, i.e. ("id", bridge_id)
+        :param generation: the get_generation() before the request, the
+         response is not cached if any of the tags was invalidated since
+        """
+        entry = CachedResponse(
+            response.data, get_header(response, "ETag"),
+            get_header(response, "Last-Modified"),
+            time.monotonic() + self.ttl, frozenset(tags))
+        with self._lock:
+            if (generation is not None and
+                    self._is_invalidated(entry.tags, generation)):
+                return
+            self._remove(url)
+            self._entries[url] = entry
+            for tag in entry.tags:
+                self._tags.setdefault(tag, set()).add(url)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def refresh(self, entry):
+        """
+        The entry is revalidated (304 Not Modified), keep it for a new ttl
+        """
+        with self._lock:
+            entry.expires = time.monotonic() + self.ttl
+            self.revalidated += 1
+
+    def invalidate(self, *tags):
+        """
+        Remove the responses having any of the tags, or all if none given
+        """
+        with self._lock:
+            self._generation += 1
+            if not tags:
+                self._entries.clear()
+                self._tags.clear()
+                self._invalidated.clear()
+                self._floor = self._generation
+                return
+            for tag in tags:
+                self._invalidated[tag] = self._generation
+                for url in list(self._tags.get(tag, ())):
+                    self._remove(url)
+            if len(self._invalidated) > self.max_size:
+                # forget the tags, the requests in flight are not cached
+                self._invalidated.clear()
+                self._floor = self._generation
+
+    def get_stats(self):
+        return {"hits": self.hits,
+                "misses": self.misses,
+                "revalidated": self.revalidated,
+                "size": len(self._entries)}
+
+    def _is_invalidated(self, tags, generation):
+        # called with self._lock held
+        if generation < self._floor:
+            return True
+        invalidated = self._invalidated
+        return any(invalidated.get(tag, 0) > generation for tag in tags)
+
+    def _remove(self, url):
+        # called with self._lock held
+        entry = self._entries.pop(url, None)
+        if entry is None:
+            return
+        for tag in entry.tags:
+            urls = self._tags.get(tag)
+            if urls is not None:
+                urls.discard(url)
+                if not urls:
+                    del self._tags[tag]
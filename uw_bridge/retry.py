@@ -0,0 +1,96 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+The retry policy for the idempotent Bridge requests
+(GET, PUT, DELETE and the restore POST) which fail with
+a transient error, i.e. a 502/503/504 response or a timeout.
+"""
+
+import logging
+import random
+import threading
+
+
+logger = logging.getLogger(__name__)
+RETRY_METHODS = ("GET", "PUT", "DELETE")
+RETRY_STATUS = (0, 502, 503, 504)
+# status 0 is set by the LiveDAO on a timeout or a connection error
+
+
+def get_retry_policy(dao):
+    """
+    Return a RetryPolicy configured by the RESTCLIENTS_BRIDGE_RETRY_*
+    settings or None if RESTCLIENTS_BRIDGE_RETRY_MAX_ATTEMPTS is 1,
+    the default.
+    """
+    max_attempts = int(dao.get_service_setting("RETRY_MAX_ATTEMPTS", 1))
+    if max_attempts <= 1:
+        return None
+    status_codes = dao.get_service_setting("RETRY_STATUS", RETRY_STATUS)
+    if isinstance(status_codes, str):
+        status_codes = status_codes.split(",")
+    return RetryPolicy(
+        max_attempts=max_attempts,
+        backoff=float(dao.get_service_setting("RETRY_BACKOFF", 0.5)),
+        max_backoff=float(dao.get_service_setting("RETRY_MAX_BACKOFF", 30)),
+        status_codes=status_codes)
+
+
+class RetryPolicy(object):
+
+    def __init__(self, max_attempts=3, backoff=0.5, max_backoff=30,
+                 status_codes=RETRY_STATUS, methods=RETRY_METHODS):
+        """
+        :param max_attempts: the times to send a request in total
+        :param backoff: the seconds to wait before the first retry,
+         doubled for each of the following ones
+        :param max_backoff: the maximum seconds to wait between retries
+        :param status_codes: the response status to retry
+        :param methods: the HTTP methods to retry
+        """
+        self.max_attempts = int(max_attempts)
+        self.backoff = float(backoff)
+        self.max_backoff = float(max_backoff)
+        self.status_codes = frozenset(int(s) for s in status_codes)
+        self.methods = frozenset(methods)
+        self.retried = 0     # the requests re-sent
+        self.recovered = 0   # the requests succeeded after a retry
+        self.failed = 0      # the requests failed after all the attempts
+        self._lock = threading.Lock()
+
+    def can_retry(self, method, idempotent, status, attempt):
+        """
+        :param idempotent: True if the request can be re-sent safely
+         regardless of its method
+        :param attempt: the number of times the request has been sent
+        """
+        return ((idempotent or method in self.methods) and
+                status in self.status_codes and
+                attempt < self.max_attempts)
+
+    def get_delay(self, attempt):
+        """
+        Return the seconds to wait before the next attempt:
+        exponential backoff with full jitter.
+        """
+        cap = min(self.max_backoff, self.backoff * (2 ** (attempt - 1)))
+        return random.uniform(0, cap)
+
+    def record(self, attempt, success):
+        """
+        Count the outcome of a request that has been sent attempt times
+        """
+        if attempt <= 1:
+            return
+        with self._lock:
+            self.retried += attempt - 1
+            if success:
+                self.recovered += 1
+            else:
+                self.failed += 1
+
+    def get_stats(self):
+        return {"retried": self.retried,
+                "recovered": self.recovered,
+                "failed": self.failed}
@@ -0,0 +1,288 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+A columnar snapshot of the Bridge user accounts for the reports,
+built directly from the paged users responses (requires numpy):
+
+    frame = BridgeAccounts().get_roster_frame(
+        includes=['course_summary', 'custom_fields'])
+    overdue = frame["next_due_date"] < numpy.datetime64("now")
+    frame.group_count("department", mask=overdue)
+
+The is_manager and unsubscribed columns are numpy masked arrays, the rows
+without the value being masked: use .filled(False) to get a plain mask.
+"""
+
+from array import array
+import logging
+from uw_bridge.page_decoder import strip_uw_domain
+from uw_bridge.util import parse_date
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+logger = logging.getLogger(__name__)
+NAT = -2 ** 63  # the int64 value of numpy.datetime64('NaT')
+INT_COLUMNS = {"bridge_id": 0, "manager_id": 0,
+               "completed_courses_count": -1}
+BOOL_COLUMNS = ("is_manager", "unsubscribed")
+DATE_COLUMNS = {"hired_at": "hire_date", "deleted_at": "deleted_at",
+                "logged_in_at": "loggedInAt", "updated_at": "updated_at",
+                "next_due_date": "next_due_date"}
+STR_COLUMNS = {"netid": "uid", "email": "email", "full_name": "full_name",
+               "first_name": "first_name", "last_name": "last_name",
+               "department": "department", "job_title": "job_title",
+               "locale": "locale"}
+
+
+class DictColumn(object):
+    """
+    A dictionary-encoded string column:
+    codes[i] is the index of the row i value in values, -1 for None.
+    """
+
+    def __init__(self, codes, values):
+        self.codes = codes
+        self.values = values
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):
+        code = self.codes[i]
+        return self.values[code] if code >= 0 else None
+
+    def code_of(self, value):
+        try:
+            return self.values.index(value)
+        except ValueError:
+            return -2   # matches no row
+
+    def eq(self, value):
+        """
+        Return the boolean mask of the rows having the value
+        """
+        if value is None:
+            return self.codes == -1
+        return self.codes == self.code_of(value)
+
+    def isin(self, values):
+        return np.isin(self.codes, [self.code_of(v) for v in values])
+
+    def is_null(self):
+        return self.codes == -1
+
+    def take(self, mask):
+        return DictColumn(self.codes[mask], self.values)
+
+    def to_list(self):
+        return [self.values[c] if c >= 0 else None for c in self.codes]
+
+
+class RosterFrame(object):
+
+    def __init__(self, columns):
+        """
+        :param columns: a dict of {name: numpy array or DictColumn},
+         the custom field columns are named by the custom field names.
+        """
+        self.columns = columns
+
+    def __len__(self):
+        for column in self.columns.values():
+            return len(column)
+        return 0
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def filter(self, mask):
+        """
+        Return a new RosterFrame of the rows selected by the boolean mask
+        """
+        return RosterFrame({
+            name: (column.take(mask) if isinstance(column, DictColumn)
+                   else column[mask])
+            for name, column in self.columns.items()})
+
+    def group_count(self, by, mask=None):
+        """
+        Return a dict of {value: the number of rows} of the DictColumn by
+        :param mask: count only the selected rows
+        """
+        column = self.columns[by]
+        codes = column.codes if mask is None else column.codes[mask]
+        counts = np.bincount(codes + 1, minlength=len(column.values) + 1)
+        ret = {column.values[i]: int(c)
+               for i, c in enumerate(counts[1:]) if c > 0}
+        if counts[0] > 0:
+            ret[None] = int(counts[0])
+        return ret
+
+    def group_sum(self, by, name, mask=None):
+        """
+        Return a dict of {value: the sum of the numeric column name}
+        grouped by the values of the DictColumn by
+        """
+        column = self.columns[by]
+        codes = column.codes
+        weights = self.columns[name]
+        if mask is not None:
+            codes = codes[mask]
+            weights = weights[mask]
+        sums = np.bincount(codes + 1, weights=weights,
+                           minlength=len(column.values) + 1)
+        counts = np.bincount(codes + 1, minlength=len(column.values) + 1)
+        ret = {column.values[i]: sums[i + 1].item()
+               for i in range(len(column.values)) if counts[i + 1] > 0}
+        if counts[0] > 0:
+            ret[None] = sums[0].item()
+        return ret
+
+    def row(self, i):
+        """
+        Return a dict of the values in row i
+        """
+        ret = {}
+        for name, column in self.columns.items():
+            value = column[i]
+            if value is np.ma.masked:
+                value = None
+            ret[name] = value.item() if hasattr(value, "item") else value
+        return ret
+
+
+class _Encoder(object):
+
+    def __init__(self):
+        self.codes = array("i")
+        self.values = []
+        self.value_codes = {}
+
+    def append(self, value):
+        if value is None:
+            self.codes.append(-1)
+            return
+        code = self.value_codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.value_codes[value] = code
+            self.values.append(value)
+        self.codes.append(code)
+
+    def build(self):
+        return DictColumn(np.frombuffer(self.codes, dtype=np.int32).copy(),
+                          self.values)
+
+
+class RosterFrameBuilder(object):
+    """
+    Collect the users of the decoded pages into compact arrays
+    """
+
+    def __init__(self, custom_fields):
+        """
+        :param custom_fields: a uw_bridge.custom_fields.CustomFields
+        """
+        if np is None:
+            raise ImportError("RosterFrame requires numpy to be installed")
+        self.custom_fields = custom_fields
+        self.ints = {name: array("q") for name in INT_COLUMNS}
+        self.bools = {name: array("b") for name in BOOL_COLUMNS}
+        self.dates = {name: array("q") for name in DATE_COLUMNS}
+        self.strs = {name: _Encoder() for name in STR_COLUMNS}
+        self.field_names = [f.name for f in custom_fields.get_fields()]
+        self.fields = {name: _Encoder() for name in self.field_names}
+
+    def add_page(self, resp_data):
+        """
+        Add the users in a decoded users response
+        """
+        values = {}
+        linked = resp_data.get("linked") or {}
+        for value in linked.get("custom_field_values") or []:
+            values[value["id"]] = (
+                self.custom_fields.get_field_name(
+                    value["links"]["custom_field"]["id"]),
+                value["value"])
+
+        for user_data in resp_data.get("users") or []:
+            try:
+                self.add_user(user_data, values)
+            except Exception as err:
+                logger.error("{0} in {1}".format(str(err), user_data))
+
+    def add_user(self, user_data, values):
+        """
+        :param values: a dict of {custom_field_value_id: (name, value)}
+        :except: if the user data is invalid, nothing is added
+        """
+        user_values = {}
+        links = user_data.get("links") or {}
+        for value_id in links.get("custom_field_values") or []:
+            if value_id in values:
+                name, value = values[value_id]
+                user_values[name] = value
+
+        # the whole row first, so that a bad value adds nothing
+        ints = []
+        for name, default in INT_COLUMNS.items():
+            value = user_data.get(
+                "id" if name == "bridge_id" else name, default)
+            ints.append(int(value) if value is not None else default)
+        bools = []
+        for name in BOOL_COLUMNS:
+            value = user_data.get(name)
+            bools.append(-1 if value is None else (1 if value else 0))
+        dates = [self._to_millis(user_data.get(key))
+                 for key in DATE_COLUMNS.values()]
+        strs = []
+        for name, key in STR_COLUMNS.items():
+            value = user_data.get(key)
+            if name == "netid":
+                value = strip_uw_domain(user_data["uid"])
+            elif name == "locale" and value is None:
+                value = "en"
+            strs.append(value)
+
+        for name, value in zip(INT_COLUMNS, ints):
+            self.ints[name].append(value)
+        for name, value in zip(BOOL_COLUMNS, bools):
+            self.bools[name].append(value)
+        for name, value in zip(DATE_COLUMNS, dates):
+            self.dates[name].append(value)
+        for name, value in zip(STR_COLUMNS, strs):
+            self.strs[name].append(value)
+        for name in self.field_names:
+            self.fields[name].append(user_values.get(name))
+
+    def _to_millis(self, date_str):
+        # parse_date caches the recent dates
+        if date_str is None:
+            return NAT
+        return round(parse_date(date_str).timestamp() * 1000)
+
+    def build(self):
+        columns = {}
+        for name, values in self.ints.items():
+            columns[name] = np.frombuffer(values, dtype=np.int64).copy()
+        for name, values in self.bools.items():
+            # -1 for None, masked
+            values = np.frombuffer(values, dtype=np.int8)
+            columns[name] = np.ma.MaskedArray(values == 1,
+                                              mask=values == -1)
+        for name, values in self.dates.items():
+            columns[name] = np.frombuffer(
+                values, dtype=np.int64).astype("datetime64[ms]")
+        for name, encoder in self.strs.items():
+            columns[name] = encoder.build()
+        for name, encoder in self.fields.items():
+            columns[name] = encoder.build()
+        return RosterFrame(columns)
@@ -0,0 +1,166 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+An in-memory index of the Bridge user accounts for the lookups
+by netid, bridge_id, custom field value, role and manager:
+
+    index = RosterIndex.load(bridge)
+    user = index.get_user_by_custom_field(BridgeCustomField.REGID_NAME,
+                                          regid)
+    reports = index.get_reports(user.bridge_id)
+"""
+
+from uw_bridge.models import BridgeCustomField
+
+
+DEFAULT_FIELDS = (BridgeCustomField.REGID_NAME,
+                  BridgeCustomField.EMPLOYEE_ID_NAME,
+                  BridgeCustomField.STUDENT_ID_NAME,
+                  BridgeCustomField.POS1_ORG_CODE)
+LOAD_INCLUDES = ['custom_fields']
+
+
+class RosterIndex(object):
+    """
+    Holds BridgeUser or BridgeUserRecord objects. A changed BridgeUser
+    is to be given to update() again to re-index it.
+    Not thread-safe, guard the updates if the index is shared.
+    """
+
+    def __init__(self, users=(), fields=DEFAULT_FIELDS):
+        """
+        :param users: an iterable of the users to index
+        :param fields: the custom field names to index
+        """
+        self.fields = tuple(fields)
+        self.by_id = {}       # {bridge_id: user}
+        self.by_netid = {}    # {netid: user}
+        self.by_field = {name: {} for name in self.fields}
+        # {name: {value: {bridge_id: user}}}
+        self.by_role = {}     # {role_id: {bridge_id: user}}
+        self.by_manager = {}  # {manager_id: {bridge_id: user}}
+        self._keys = {}
+        # {bridge_id: (netid, field values, role_ids, manager_id)} as indexed
+        for user in users:
+            self.update(user)
+
+    @classmethod
+    def load(cls, bridge, fields=DEFAULT_FIELDS, includes=LOAD_INCLUDES,
+             records=True, prefetch=1):
+        """
+        Return a RosterIndex of the active users crawled in one pass
+        :param records: False to index BridgeUser objects
+        """
+        return cls(bridge.iter_all_users(includes=includes, records=records,
+                                         prefetch=prefetch), fields=fields)
+
+    def update(self, user):
+        """
+        Add the user or re-index it if its bridge_id is in the index.
+        A netid held by another bridge_id is taken over.
+        """
+        if user.bridge_id in self._keys:
+            self._remove(user.bridge_id)
+        other = self.by_netid.get(user.netid)
+        if other is not None:
+            self._remove(other.bridge_id)
+
+        bridge_id = user.bridge_id
+        values = tuple(user.get_custom_field_value(name)
+                       for name in self.fields)
+        role_ids = tuple(user.get_role_ids())
+        manager_id = user.manager_id
+        self._keys[bridge_id] = (user.netid, values, role_ids, manager_id)
+
+        self.by_id[bridge_id] = user
+        self.by_netid[user.netid] = user
+        for name, value in zip(self.fields, values):
+            if value is not None:
+                _add(self.by_field[name], value, bridge_id, user)
+        for role_id in role_ids:
+            _add(self.by_role, role_id, bridge_id, user)
+        if manager_id:
+            _add(self.by_manager, manager_id, bridge_id, user)
+
+    def remove(self, bridge_id):
+        """
+        Remove the user of the bridge_id, return it or None
+        """
+        if bridge_id not in self._keys:
+            return None
+        return self._remove(bridge_id)
+
+    def _remove(self, bridge_id):
+        netid, values, role_ids, manager_id = self._keys.pop(bridge_id)
+        user = self.by_id.pop(bridge_id)
+        if self.by_netid.get(netid) is user:
+            del self.by_netid[netid]
+        for name, value in zip(self.fields, values):
+            if value is not None:
+                _discard(self.by_field[name], value, bridge_id)
+        for role_id in role_ids:
+            _discard(self.by_role, role_id, bridge_id)
+        if manager_id:
+            _discard(self.by_manager, manager_id, bridge_id)
+        return user
+
+    def get_user(self, uwnetid):
+        return self.by_netid.get(uwnetid)
+
+    def get_user_by_id(self, bridge_id):
+        return self.by_id.get(bridge_id)
+
+    def get_users_by_custom_field(self, field_name, value):
+        """
+        Return the list of users having the custom field value
+        :except KeyError: if the field_name is not indexed
+        """
+        return list(self.by_field[field_name].get(value, {}).values())
+
+    def get_user_by_custom_field(self, field_name, value):
+        """
+        Return the first user having the custom field value or None
+        """
+        for user in self.by_field[field_name].get(value, {}).values():
+            return user
+        return None
+
+    def get_users_by_role(self, role_id):
+        return list(self.by_role.get(role_id, {}).values())
+
+    def get_reports(self, manager_id):
+        """
+        Return the list of users whose manager_id is the given bridge_id
+        """
+        return list(self.by_manager.get(manager_id, {}).values())
+
+    def get_values(self, field_name):
+        """
+        Return the indexed values of the custom field
+        """
+        return list(self.by_field[field_name])
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def __iter__(self):
+        return iter(list(self.by_id.values()))
+
+    def __contains__(self, bridge_id):
+        return bridge_id in self.by_id
+
+
+def _add(index, key, bridge_id, user):
+    users = index.get(key)
+    if users is None:
+        users = index[key] = {}
+    users[bridge_id] = user
+
+
+def _discard(index, key, bridge_id):
+    users = index.get(key)
+    if users is not None:
+        users.pop(bridge_id, None)
+        if len(users) == 0:
+            del index[key]
@@ -0,0 +1,250 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+A local SQLite store of the Bridge user accounts, their custom field
+values and roles, to serve the reads without crawling Bridge.
+
+    store = RosterStore("/var/lib/app/bridge_roster.db")
+    store.sync()
+    user = store.get_user("javerage")
+"""
+
+import logging
+import sqlite3
+from uw_bridge.models import BridgeUserRecord
+from uw_bridge.users import BridgeAccounts
+from uw_bridge.util import parse_date, date_to_str
+
+
+logger = logging.getLogger(__name__)
+SYNC_INCLUDES = ['custom_fields', 'course_summary']
+DATE_FIELDS = ("hired_at", "deleted_at", "logged_in_at", "updated_at",
+               "next_due_date")
+BOOL_FIELDS = ("is_manager", "unsubscribed")
+WATERMARK = "updated_at_watermark"
+BATCH_SIZE = 500   # the users read at a time, within the SQLite 999 params
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    bridge_id INTEGER PRIMARY KEY,
+    netid TEXT NOT NULL,
+    email TEXT, full_name TEXT, first_name TEXT, last_name TEXT,
+    department TEXT, job_title TEXT, hired_at TEXT, is_manager INTEGER,
+    locale TEXT, manager_id INTEGER, manager_netid TEXT, deleted_at TEXT,
+    logged_in_at TEXT, updated_at TEXT, unsubscribed INTEGER,
+    next_due_date TEXT, completed_courses_count INTEGER);
+CREATE UNIQUE INDEX IF NOT EXISTS users_netid ON users (netid);
+CREATE TABLE IF NOT EXISTS custom_field_values (
+    bridge_id INTEGER NOT NULL, name TEXT NOT NULL, field_id TEXT,
+    value_id TEXT, value TEXT, PRIMARY KEY (bridge_id, name));
+CREATE INDEX IF NOT EXISTS custom_field_values_value
+    ON custom_field_values (name, value);
+CREATE TABLE IF NOT EXISTS user_roles (
+    bridge_id INTEGER NOT NULL, role_id TEXT NOT NULL, name TEXT,
+    PRIMARY KEY (bridge_id, role_id));
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+class RosterStore(object):
+
+    def __init__(self, path=":memory:", bridge=None):
+        """
+        :param path: the SQLite database file
+        :param bridge: the BridgeAccounts to sync from,
+         created on the first sync if not given.
+        """
+        self.bridge = bridge
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def get_watermark(self):
+        """
+        Return the latest updated_at of the stored users or None
+        """
+        row = self.conn.execute(
+            "SELECT value FROM meta WHERE key = ?", (WATERMARK,)).fetchone()
+        return parse_date(row[0]) if row is not None else None
+
+    def sync(self, includes=SYNC_INCLUDES, full=False, prefetch=1):
+        """
+        Crawl the active users and store the ones updated after
+        the watermark (all of them if full is True) or not stored yet.
+        The stored users no longer active in Bridge are removed.
+        If a page or a user of the crawl could not be decoded, nothing is
+        removed and the watermark is kept, the crawl being partial.
+        Return a dict of the sync counts.
+        """
+        if self.bridge is None:
+            self.bridge = BridgeAccounts()
+
+        watermark = None if full else self.get_watermark()
+        latest = watermark
+        counts = {"fetched": 0, "upserted": 0, "deleted": 0, "errors": 0}
+        errors = []
+        with self.conn:
+            stored = set(row[0] for row in self.conn.execute(
+                "SELECT bridge_id FROM users"))
+            self.conn.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS seen "
+                "(bridge_id INTEGER PRIMARY KEY)")
+            self.conn.execute("DELETE FROM seen")
+            for record in self.bridge.iter_all_users(
+                    includes=includes, prefetch=prefetch, records=True,
+                    errors=errors):
+                counts["fetched"] += 1
+                self.conn.execute("INSERT OR IGNORE INTO seen VALUES (?)",
+                                  (record.bridge_id,))
+                if (watermark is None or record.updated_at is None or
+                        record.updated_at > watermark or
+                        record.bridge_id not in stored):
+                    self._upsert(record)
+                    counts["upserted"] += 1
+                if (record.updated_at is not None and
+                        (latest is None or record.updated_at > latest)):
+                    latest = record.updated_at
+
+            counts["errors"] = len(errors)
+            if len(errors):
+                logger.warning(
+                    "Bridge roster sync: {0:d} decode errors, the removal "
+                    "and the watermark are skipped".format(len(errors)))
+            else:
+                for table in ("users", "custom_field_values", "user_roles"):
+                    cursor = self.conn.execute(
+                        "DELETE FROM {0} WHERE bridge_id NOT IN "
+                        "(SELECT bridge_id FROM seen)".format(table))
+                    if table == "users":
+                        counts["deleted"] = cursor.rowcount
+                if latest is not None:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                        (WATERMARK, date_to_str(latest)))
+        logger.info("Bridge roster sync: {0}".format(counts))
+        return counts
+
+    def upsert(self, user):
+        """
+        Store the given BridgeUserRecord (or BridgeUser)
+        """
+        with self.conn:
+            self._upsert(user)
+
+    def _upsert(self, user):
+        if not isinstance(user, BridgeUserRecord):
+            user = BridgeUserRecord.from_bridge_user(user)
+        values = []
+        for field in BridgeUserRecord.FIELDS:
+            value = getattr(user, field)
+            if field in DATE_FIELDS:
+                value = date_to_str(value)
+            values.append(value)
+        # a new bridge_id may take over the netid of a deleted account
+        for row in self.conn.execute(
+                "SELECT bridge_id FROM users WHERE netid = ? AND "
+                "bridge_id != ?", (user.netid, user.bridge_id)).fetchall():
+            self._delete(row[0])
+        self.conn.execute(
+            "INSERT OR REPLACE INTO users ({0}) VALUES ({1})".format(
+                ", ".join(BridgeUserRecord.FIELDS),
+                ", ".join("?" * len(BridgeUserRecord.FIELDS))),
+            values)
+        self.conn.execute(
+            "DELETE FROM custom_field_values WHERE bridge_id = ?",
+            (user.bridge_id,))
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO custom_field_values VALUES (?, ?, ?, ?, ?)",
+            [(user.bridge_id,) + cf for cf in user.custom_fields])
+        self.conn.execute(
+            "DELETE FROM user_roles WHERE bridge_id = ?",
+            (user.bridge_id,))
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO user_roles VALUES (?, ?, ?)",
+            [(user.bridge_id,) + role for role in user.roles])
+
+    def delete(self, bridge_id):
+        with self.conn:
+            self._delete(bridge_id)
+
+    def _delete(self, bridge_id):
+        for table in ("users", "custom_field_values", "user_roles"):
+            self.conn.execute(
+                "DELETE FROM {0} WHERE bridge_id = ?".format(table),
+                (bridge_id,))
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def get_user(self, uwnetid):
+        """
+        Return the BridgeUserRecord of the uwnetid or None
+        """
+        return self._get_one("netid = ?", (uwnetid,))
+
+    def get_user_by_id(self, bridge_id):
+        return self._get_one("bridge_id = ?", (bridge_id,))
+
+    def get_users_by_custom_field(self, field_name, value):
+        """
+        Return a list of BridgeUserRecord having the custom field value
+        """
+        return list(self._select(
+            "bridge_id IN (SELECT bridge_id FROM custom_field_values "
+            "WHERE name = ? AND value = ?)", (field_name, value)))
+
+    def iter_users(self):
+        """
+        Return a generator of all the stored BridgeUserRecord objects
+        """
+        return self._select(None, ())
+
+    def _get_one(self, where, params):
+        for user in self._select(where, params):
+            return user
+        return None
+
+    def _select(self, where, params):
+        sql = "SELECT {0} FROM users".format(
+            ", ".join(BridgeUserRecord.FIELDS))
+        if where is not None:
+            sql = "{0} WHERE {1}".format(sql, where)
+        cursor = self.conn.execute(
+            "{0} ORDER BY bridge_id".format(sql), params)
+        while True:
+            rows = cursor.fetchmany(BATCH_SIZE)
+            if not rows:
+                break
+            # the custom field values and roles of the batch of users
+            bridge_ids = [row[0] for row in rows]
+            custom_fields = self._select_by_user(
+                "SELECT bridge_id, name, field_id, value_id, value "
+                "FROM custom_field_values", bridge_ids)
+            roles = self._select_by_user(
+                "SELECT bridge_id, role_id, name FROM user_roles", bridge_ids)
+            for row in rows:
+                yield self._to_record(row, custom_fields.get(row[0], []),
+                                      roles.get(row[0], []))
+
+    def _select_by_user(self, sql, bridge_ids):
+        """
+        Return a dict of {bridge_id: [row without the bridge_id]}
+        """
+        ret = {}
+        for row in self.conn.execute(
+                "{0} WHERE bridge_id IN ({1}) ORDER BY rowid".format(
+                    sql, ", ".join("?" * len(bridge_ids))), bridge_ids):
+            ret.setdefault(row[0], []).append(row[1:])
+        return ret
+
+    def _to_record(self, row, custom_fields, roles):
+        fields = dict(zip(BridgeUserRecord.FIELDS, row))
+        for field in DATE_FIELDS:
+            fields[field] = parse_date(fields[field])
+        for field in BOOL_FIELDS:
+            if fields[field] is not None:
+                fields[field] = bool(fields[field])
+        return BridgeUserRecord(custom_fields=custom_fields, roles=roles,
+                                **fields)
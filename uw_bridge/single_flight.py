@@ -0,0 +1,88 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Coalesce the concurrent identical GET requests of the process: the first
+caller sends the request, the others arriving while it is in flight wait
+for it and get the same response (or exception). Nothing is kept once the
+request is done, so unlike a cache no response is ever stale.
+"""
+
+import threading
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def get_single_flight(dao):
+    """
+    Return the SingleFlight shared by the process for the given DAO's
+    service or None if RESTCLIENTS_BRIDGE_SINGLE_FLIGHT is not set.
+    """
+    enabled = dao.get_service_setting("SINGLE_FLIGHT", False)
+    if isinstance(enabled, str):
+        enabled = enabled.lower() in ("true", "yes", "1")
+    if not enabled:
+        return None
+    key = dao.service_name()
+    with _flights_lock:
+        if key not in _flights:
+            _flights[key] = SingleFlight()
+        return _flights[key]
+
+
+class _Call(object):
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+
+    def __init__(self):
+        self.requests = 0    # the calls made
+        self.coalesced = 0   # the callers served by another's call
+        self._calls = {}     # {key: _Call in flight}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """
+        Return fn(), or the result of the call in flight for the same key.
+        The exception raised by fn is raised to all its callers.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.requests += 1
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as ex:
+            call.error = ex
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def get_stats(self):
+        with self._lock:
+            return {"requests": self.requests,
+                    "coalesced": self.coalesced,
+                    "in_flight": len(self._calls)}
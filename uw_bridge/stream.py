@@ -0,0 +1,177 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+An incremental parser of a users page: the users are decoded one at a time
+from the response body instead of decoding the whole page into a dict tree.
+"""
+
+import codecs
+import json
+import re
+
+
+class _Syntax(object):
+    """
+    The JSON punctuation and patterns for a str or a bytes body,
+    so that a bytes body is not copied into a str
+    """
+
+    def __init__(self, kind):
+        def c(text):
+            return text if kind is str else text.encode()
+
+        self.whitespace = re.compile(c(r'[ \t\n\r]*'))
+        self.string = re.compile(c(r'"[^"\\]*(?:\\.[^"\\]*)*"'))
+        self.scalar = re.compile(c(r'[^,\]}\s]+'))
+        # a string (skipped), an opening (1) or a closing (2) bracket
+        self.token = re.compile(
+            c(r'"[^"\\]*(?:\\.[^"\\]*)*"|([\[{])|([\]}])'))
+        self.quote = c('"')
+        self.brackets = (c('{'), c('['))
+        self.null = c("null")
+        self.chars = {char: c(char) for char in '{}[]:,'}
+
+
+_SYNTAX = {str: _Syntax(str), bytes: _Syntax(bytes)}
+_decoder = json.JSONDecoder()
+
+
+class UsersPageParser(object):
+    """
+    Iterate over the decoded user objects of a users page:
+
+        parser = UsersPageParser(resp)
+        for user_data in parser:
+            parser.linked ...
+        next_page_url(parser.fields)
+
+    The other top level values (meta, linked) are kept in the fields dict.
+    If "linked" follows "users" in the page, the users are skipped without
+    being decoded, keeping their positions, and decoded once the end of
+    the page is reached, so that "linked" is known when the first user
+    is returned.
+    """
+
+    WINDOW = 4096   # the initial bytes decoded to find a value
+
+    def __init__(self, resp):
+        if isinstance(resp, (bytearray, memoryview)):
+            resp = bytes(resp)
+        self.text = resp
+        self.syntax = _SYNTAX[type(resp)]
+        self.fields = {}
+        self.window = self.WINDOW
+
+    @property
+    def linked(self):
+        return self.fields.get("linked") or {}
+
+    def __iter__(self):
+        text = self.text
+        chars = self.syntax.chars
+        spans = []
+        pos = self._expect("{", 0)
+        if self._char(pos) == chars["}"]:
+            return
+        while True:
+            key, pos = self._decode(pos)
+            pos = self._expect(":", pos)
+            if key == "users":
+                if text.startswith(self.syntax.null, pos):
+                    pos += 4
+                else:
+                    pos = self._expect("[", pos)
+                    # the users need the linked custom field values
+                    defer = "linked" not in self.fields
+                    while self._char(pos) != chars["]"]:
+                        if defer:
+                            end = self._end(pos)
+                            spans.append((pos, end))
+                            pos = end
+                        else:
+                            user_data, pos = self._decode(pos)
+                            yield user_data
+                            user_data = None
+                        pos = self._skip(pos)
+                        if self._char(pos) != chars["]"]:
+                            pos = self._expect(",", pos)
+                    pos += 1
+            else:
+                self.fields[key], pos = self._decode(pos)
+            pos = self._skip(pos)
+            if self._char(pos) == chars["}"]:
+                break
+            pos = self._expect(",", pos)
+
+        for start, end in spans:
+            yield json.loads(text[start:end])
+        self.text = None
+
+    def _decode(self, pos):
+        """
+        Return the value at pos and the position following it.
+        A bytes body is decoded a window at a time, the window growing
+        until it holds the whole value.
+        """
+        pos = self._skip(pos)
+        text = self.text
+        if isinstance(text, str):
+            return _decoder.raw_decode(text, pos)
+        size = self.window
+        while True:
+            last = pos + size >= len(text)
+            # an incomplete UTF-8 sequence at the end is left out
+            chunk, length = codecs.utf_8_decode(
+                text[pos:pos + size], "strict", last)
+            try:
+                value, end = _decoder.raw_decode(chunk)
+                # a value ending the window may be cut short, i.e. a number
+                if end < len(chunk) or last:
+                    break
+            except ValueError:
+                if last:
+                    raise
+            size *= 4
+        self.window = max(self.WINDOW, end * 2)
+        if length != len(chunk):
+            # not ASCII, the byte length of the decoded characters
+            end = len(chunk[:end].encode("utf-8"))
+        return value, pos + end
+
+    def _end(self, pos):
+        """
+        Return the position following the value at pos, without decoding
+        """
+        text = self.text
+        syntax = self.syntax
+        char = self._char(pos)
+        if char == syntax.quote:
+            match = syntax.string.match(text, pos)
+        elif char not in syntax.brackets:
+            match = syntax.scalar.match(text, pos)
+        else:
+            depth = 0
+            for match in syntax.token.finditer(text, pos):
+                if match.lastindex == 1:
+                    depth += 1
+                elif match.lastindex == 2:
+                    depth -= 1
+                    if depth == 0:
+                        return match.end()
+            match = None
+        if match is None:
+            raise ValueError("Unterminated value at {0:d}".format(pos))
+        return match.end()
+
+    def _char(self, pos):
+        return self.text[pos:pos + 1]
+
+    def _skip(self, pos):
+        return self.syntax.whitespace.match(self.text, pos).end()
+
+    def _expect(self, char, pos):
+        pos = self._skip(pos)
+        if self._char(pos) != self.syntax.chars[char]:
+            raise ValueError("Expecting '{0}' at {1:d}".format(char, pos))
+        return self._skip(pos + 1)
@@ -1,4 +1,19 @@
 # Copyright 2024 UW-IT, University of Washington
 # SPDX-License-Identifier: Apache-2.0
 
+from commonconf import override_settings
+from restclients_core.models import MockHTTP
 from uw_bridge.util import fdao_bridge_override
+
+cache_override = override_settings(RESTCLIENTS_BRIDGE_DAO_CLASS='Mock',
+                                   RESTCLIENTS_BRIDGE_RESPONSE_CACHE_TTL=60)
+flight_override = override_settings(RESTCLIENTS_BRIDGE_DAO_CLASS='Mock',
+                                    RESTCLIENTS_BRIDGE_SINGLE_FLIGHT=True)
+
+
+def mock_response(status, headers=None, data='{}'):
+    response = MockHTTP()
+    response.status = status
+    response.headers = headers if headers is not None else {}
+    response.data = data
+    return response
@@ -0,0 +1,168 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+import asyncio
+import os
+import ssl
+from unittest import IsolatedAsyncioTestCase, skipUnless
+from unittest.mock import patch
+from commonconf import override_settings
+from restclients_core.exceptions import DataFailureException
+from uw_bridge.aio import AsyncBridge, AsyncBridgeAccounts
+from uw_bridge.models import BridgeUser, BridgeCustomField
+from uw_bridge.rate_limit import RateLimiter
+from uw_bridge.users import BridgeAccounts, get_user_url, get_user_by_id_url
+from uw_bridge.tests import cache_override, fdao_bridge_override
+
+CA_BUNDLE = ssl.get_default_verify_paths().cafile
+
+
+@fdao_bridge_override
+class TestAsyncBridgeAccounts(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.bridge_accs = AsyncBridgeAccounts()
+
+    async def asyncTearDown(self):
+        await self.bridge_accs.close()
+
+    async def test_get_resource(self):
+        async with AsyncBridge() as bridge:
+            self.assertIsNotNone(
+                await bridge.get_resource("/api/author/roles"))
+            with self.assertRaises(DataFailureException):
+                await bridge.get_resource("/api/author/none")
+
+            bridge.rate_limiter = RateLimiter(1000)
+            self.assertIsNotNone(
+                await bridge.get_resource("/api/author/roles"))
+            self.assertEqual(bridge.rate_limiter.throttled, 0)
+
+    async def test_load_metadata(self):
+        self.assertIsNone(self.bridge_accs.custom_fields)
+        await asyncio.gather(self.bridge_accs.load_metadata(),
+                             self.bridge_accs.load_metadata())
+        self.assertEqual(self.bridge_accs.custom_fields.get_field_id(
+            BridgeCustomField.REGID_NAME), "5")
+        self.assertEqual(len(self.bridge_accs.user_roles.get_roles()), 5)
+
+    async def test_get_user(self):
+        user, bill = await asyncio.gather(
+            self.bridge_accs.get_user('javerage'),
+            self.bridge_accs.get_user_by_id(17637, include_deleted=True))
+        self.assertEqual(user.bridge_id, 195)
+        self.assertEqual(len(user.custom_fields), 8)
+        self.assertEqual(
+            user.get_custom_field(BridgeCustomField.REGID_NAME).value,
+            "9136CCB8F66711D5BE060004AC494FFE")
+        self.assertEqual(len(user.roles), 3)
+        self.assertTrue(user.roles[0].is_account_admin())
+        self.assertEqual(bill.netid, "bill")
+        self.assertTrue(bill.is_deleted())
+
+        self.assertIsNone(await self.bridge_accs.get_user_by_id(17637))
+        bill = await self.bridge_accs.get_user("bill", include_deleted=True)
+        self.assertEqual(bill.bridge_id, 17637)
+        self.assertTrue(bill.is_deleted())
+        with self.assertRaises(DataFailureException):
+            await self.bridge_accs.get_user('unknown')
+
+    async def test_get_all_users(self):
+        users = await self.bridge_accs.get_all_users(
+            includes=['custom_fields'])
+        self.assertEqual([u.bridge_id for u in users], [106, 195, 17])
+
+        bridge_ids = []
+        async for user in self.bridge_accs.iter_all_users(role_id='author'):
+            bridge_ids.append(user.bridge_id)
+        self.assertEqual(bridge_ids, [195])
+
+    async def test_add_user(self):
+        user = BridgeUser(netid="eight",
+                          full_name="Eight Class Student",
+                          first_name="Eight Class",
+                          last_name="Student",
+                          email="eight@uw.edu")
+        added = await self.bridge_accs.add_user(user)
+        self.assertEqual(added.bridge_id, 123)
+
+    async def test_delete_user(self):
+        self.assertTrue(await self.bridge_accs.delete_user("javerage"))
+        self.assertTrue(await self.bridge_accs.delete_user_by_id(195))
+        with self.assertRaises(DataFailureException):
+            await self.bridge_accs.delete_user("staff")
+
+    async def test_change_uid(self):
+        user = await self.bridge_accs.change_uid(17637, "bill")
+        self.assertEqual(user.bridge_id, 17637)
+        user = await self.bridge_accs.replace_uid("oldbill", "bill")
+        self.assertEqual(len(user.custom_fields), 1)
+
+    async def test_restore_user(self):
+        user = await self.bridge_accs.restore_user_by_id(17637)
+        self.assertEqual(user.netid, "bill")
+        user = await self.bridge_accs.restore_user("bill")
+        self.assertTrue(user.has_manager())
+        with self.assertRaises(DataFailureException):
+            await self.bridge_accs.restore_user("javerage")
+
+    async def test_update_user(self):
+        orig_user = await self.bridge_accs.get_user_by_id(
+            17637, include_deleted=True)
+        upded_user = await self.bridge_accs.update_user(orig_user)
+        self.assertFalse(upded_user.is_deleted())
+
+        orig_user.add_role(
+            self.bridge_accs.user_roles.new_campus_admin_role())
+        upded_user = await self.bridge_accs.update_user_roles(orig_user)
+        self.assertEqual(upded_user.bridge_id, 17637)
+
+    async def test_invalidate_user(self):
+        with cache_override:
+            bridge = BridgeAccounts()
+            cache = bridge.response_cache
+            cache.invalidate()
+            async with AsyncBridgeAccounts() as bridge_accs:
+                self.assertIs(bridge_accs.response_cache, cache)
+                bridge.get_user("javerage")
+                bill = bridge.get_user_by_id(17637, include_deleted=True)
+                self.assertEqual(cache.get_stats()["size"], 2)
+
+                await bridge_accs.delete_user("javerage")
+                self.assertIsNone(cache.get(get_user_url("javerage")))
+                await bridge_accs.update_user(bill)
+                self.assertIsNone(cache.get(
+                    get_user_by_id_url(17637, include_deleted=True)))
+
+                bridge.get_user_by_id(17637, include_deleted=True)
+                await bridge_accs.restore_user_by_id(17637)
+                self.assertEqual(cache.get_stats()["size"], 0)
+
+                bridge.get_user("javerage")
+                await bridge_accs.delete_user_by_id(195)
+                self.assertEqual(cache.get_stats()["size"], 0)
+
+    async def test_get_ssl_context(self):
+        context = ssl.create_default_context()
+        with override_settings(RESTCLIENTS_BRIDGE_SSL_CONTEXT=context):
+            self.assertIs(AsyncBridge()._get_ssl_context(), context)
+
+        with override_settings(RESTCLIENTS_BRIDGE_VERIFY_HTTPS=False,
+                               RESTCLIENTS_BRIDGE_CERT_FILE="cert.pem",
+                               RESTCLIENTS_BRIDGE_KEY_FILE="key.pem"):
+            with patch.object(ssl.SSLContext,
+                              "load_cert_chain") as load_cert_chain:
+                context = AsyncBridge()._get_ssl_context()
+                load_cert_chain.assert_called_once_with("cert.pem",
+                                                        "key.pem")
+        self.assertEqual(context.verify_mode, ssl.CERT_NONE)
+        self.assertFalse(context.check_hostname)
+
+    @skipUnless(CA_BUNDLE and os.path.exists(CA_BUNDLE),
+                "no CA bundle")
+    async def test_get_ssl_context_verify(self):
+        with override_settings(RESTCLIENTS_CA_BUNDLE=CA_BUNDLE):
+            context = AsyncBridge()._get_ssl_context()
+        self.assertEqual(context.verify_mode, ssl.CERT_REQUIRED)
+        self.assertTrue(context.check_hostname)
+        self.assertGreater(len(context.get_ca_certs()), 0)
@@ -0,0 +1,57 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+from unittest import TestCase, skipIf
+from uw_bridge import codec
+from uw_bridge.codec import OrjsonCodec, StdlibCodec, orjson
+from uw_bridge.models import BridgeUser
+from uw_bridge.users import BridgeAccounts
+from uw_bridge.tests import fdao_bridge_override
+
+
+@fdao_bridge_override
+class TestCodec(TestCase):
+
+    def get_codecs(self):
+        codecs = [StdlibCodec()]
+        if orjson is not None:
+            codecs.append(OrjsonCodec())
+        return codecs
+
+    def test_default(self):
+        self.assertEqual(codec.get_codec().name,
+                         "json" if orjson is None else "orjson")
+
+    def test_loads(self):
+        data = '{"users": [{"id": "1", "full_name": "Jos\\u00e9"}], "n": 1.5}'
+        for cd in self.get_codecs():
+            self.assertEqual(cd.loads(data), json.loads(data))
+            self.assertEqual(cd.loads(data.encode()), json.loads(data))
+            self.assertRaises(ValueError, cd.loads, "{")
+
+    def test_dumps(self):
+        user = BridgeUser(netid="javerage", full_name="James Student",
+                          first_name="James", last_name="Student",
+                          email="javerage@uw.edu")
+        for cd in self.get_codecs():
+            self.assertEqual(
+                cd.dumps(user.to_json_post()),
+                json.dumps(user.to_json_post(), separators=(',', ':')))
+            self.assertEqual(cd.dumps({"full_name": "José"}),
+                             '{"full_name":"Jos\\u00e9"}')
+
+    @skipIf(orjson is None, "orjson is not installed")
+    def test_same_users(self):
+        bridge = BridgeAccounts()
+        users = {}
+        for cd in self.get_codecs():
+            previous = codec.set_codec(cd)
+            try:
+                users[cd.name] = [str(u) for u in bridge.get_all_users(
+                    includes=['custom_fields'])]
+                users[cd.name].append(str(bridge.get_user("javerage")))
+            finally:
+                codec.set_codec(previous)
+        self.assertEqual(len(users["json"]), 4)
+        self.assertEqual(users["json"], users["orjson"])
@@ -0,0 +1,80 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+from unittest import TestCase
+from uw_bridge.hierarchy import ManagerHierarchy
+from uw_bridge.models import BridgeUser
+from uw_bridge.users import BridgeAccounts
+from uw_bridge.tests import fdao_bridge_override
+
+
+def get_users():
+    # 1 <- 2 <- 3, 1 <- 4 <- 5 (by netid), 6 <-> 7, 8 -> 17637 -> ?
+    return [BridgeUser(bridge_id=1, netid="ceo"),
+            BridgeUser(bridge_id=2, netid="vp", manager_id=1),
+            BridgeUser(bridge_id=3, netid="dev", manager_id=2),
+            BridgeUser(bridge_id=4, netid="cfo", manager_id=1),
+            BridgeUser(bridge_id=5, netid="acct", manager_netid="cfo"),
+            BridgeUser(bridge_id=6, netid="a", manager_id=7),
+            BridgeUser(bridge_id=7, netid="b", manager_id=6),
+            BridgeUser(bridge_id=8, netid="new", manager_id=17637),
+            BridgeUser(bridge_id=9, netid="self", manager_id=9),
+            BridgeUser(bridge_id=10, netid="gone", manager_id=19567)]
+
+
+@fdao_bridge_override
+class TestManagerHierarchy(TestCase):
+
+    def test_traversal(self):
+        hierarchy = ManagerHierarchy(get_users())
+        self.assertEqual(len(hierarchy), 10)
+        self.assertEqual(hierarchy.get_manager(3).netid, "vp")
+        self.assertEqual(hierarchy.get_manager_id(5), 4)
+        self.assertIsNone(hierarchy.get_manager(1))
+        self.assertIsNone(hierarchy.get_manager(8))
+        self.assertIsNone(hierarchy.get_manager_id(100))
+        self.assertEqual([u.netid for u in hierarchy.get_ancestors(3)],
+                         ["vp", "ceo"])
+        self.assertEqual([u.netid for u in hierarchy.get_ancestors(5)],
+                         ["cfo", "ceo"])
+        self.assertEqual([u.netid for u in hierarchy.get_ancestors(6)],
+                         ["b"])
+        self.assertEqual(hierarchy.get_ancestors(9), [])
+        self.assertEqual(hierarchy.get_ancestors(1), [])
+
+        self.assertEqual([u.netid for u in hierarchy.get_reports(1)],
+                         ["vp", "cfo"])
+        self.assertEqual([u.netid for u in hierarchy.get_reports(4)],
+                         ["acct"])
+        self.assertEqual(hierarchy.get_reports(3), [])
+        self.assertEqual(hierarchy.get_subtree_size(1), 4)
+        self.assertEqual(hierarchy.get_subtree_size(2), 1)
+        self.assertEqual(hierarchy.get_subtree_size(6), 1)
+        self.assertEqual(hierarchy.get_subtree_size(9), 0)
+
+        self.assertEqual(hierarchy.find_cycles(), [[6, 7], [9]])
+        self.assertEqual(hierarchy.get_missing_managers(), [17637, 19567])
+
+        # replaced
+        hierarchy.add(BridgeUser(bridge_id=3, netid="dev", manager_id=4))
+        self.assertEqual(hierarchy.get_subtree_size(4), 2)
+        self.assertEqual(hierarchy.get_subtree_size(2), 0)
+        hierarchy.add(BridgeUser(bridge_id=4, netid="cfo2", manager_id=1))
+        self.assertIsNone(hierarchy.get_manager(5))
+
+    def test_resolve_missing(self):
+        bridge = BridgeAccounts()
+        hierarchy = ManagerHierarchy(get_users())
+        self.assertEqual(hierarchy.resolve_missing(bridge), 1)
+        self.assertEqual(hierarchy.get_manager(8).netid, "bill")
+        # then the manager of bill, 195, not found with_deleted
+        self.assertEqual(hierarchy.get_missing_managers(), [195, 19567])
+        self.assertEqual(hierarchy.unresolved, {195, 19567})
+        self.assertEqual([u.netid for u in hierarchy.get_ancestors(8)],
+                         ["bill"])
+        self.assertEqual(hierarchy.resolve_missing(bridge), 0)
+
+        hierarchy = ManagerHierarchy.load(bridge)
+        self.assertEqual(len(hierarchy), 3)
+        self.assertEqual(hierarchy.find_cycles(), [])
+        self.assertEqual(hierarchy.resolve_missing(bridge), 0)
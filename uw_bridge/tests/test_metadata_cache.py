@@ -0,0 +1,110 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+import threading
+import time
+from unittest import TestCase
+from unittest.mock import patch
+from commonconf import override_settings
+from uw_bridge import Bridge
+from uw_bridge.custom_fields import CustomFields, URL as CF_URL
+from uw_bridge.metadata_cache import MetadataCache, get_metadata_cache
+from uw_bridge.user_roles import UserRoles, URL as ROLES_URL
+from uw_bridge.users import BridgeAccounts
+from uw_bridge.tests import fdao_bridge_override
+
+
+@fdao_bridge_override
+class TestMetadataCache(TestCase):
+
+    def test_get_metadata_cache(self):
+        self.assertIsNone(get_metadata_cache(Bridge().dao))
+        with override_settings(RESTCLIENTS_BRIDGE_DAO_CLASS='Mock',
+                               RESTCLIENTS_BRIDGE_METADATA_CACHE_TTL=60,
+                               RESTCLIENTS_BRIDGE_METADATA_CACHE_REFRESH="0"):
+            bridge = Bridge()
+            self.assertEqual(bridge.metadata_cache.ttl, 60.0)
+            self.assertFalse(bridge.metadata_cache.refresh)
+            self.assertTrue(bridge.metadata_cache is Bridge().metadata_cache)
+
+    def test_shared(self):
+        with override_settings(RESTCLIENTS_BRIDGE_DAO_CLASS='Mock',
+                               RESTCLIENTS_BRIDGE_METADATA_CACHE_TTL=3600):
+            bridge = BridgeAccounts()
+            cache = bridge.metadata_cache
+            cache.invalidate()
+            before = cache.get_stats()
+            with patch.object(Bridge, "get_resource",
+                              wraps=bridge.get_resource) as get_resource:
+                for i in range(3):
+                    accounts = BridgeAccounts()
+                    self.assertEqual(
+                        len(accounts.custom_fields.get_fields()), 17)
+                    self.assertEqual(
+                        len(accounts.user_roles.get_roles()), 5)
+                self.assertEqual(get_resource.call_count, 2)
+                stats = cache.get_stats()
+                self.assertEqual(stats["size"], 2)
+                self.assertEqual(stats["misses"] - before["misses"], 2)
+                self.assertEqual(stats["hits"] - before["hits"], 4)
+
+                cache.invalidate(CF_URL)
+                CustomFields(bridge)
+                UserRoles(bridge)
+                self.assertEqual(get_resource.call_count, 3)
+                get_resource.assert_called_with(CF_URL)
+            cache.invalidate()
+
+    def test_ttl(self):
+        cache = MetadataCache(0.05)
+        loads = []
+
+        def loader():
+            loads.append(1)
+            return "v{0}".format(len(loads))
+
+        self.assertIsNone(cache.get(ROLES_URL))
+        self.assertEqual(cache.get(ROLES_URL, loader), "v1")
+        self.assertEqual(cache.get(ROLES_URL, loader), "v1")
+        self.assertEqual(cache.get(ROLES_URL), "v1")
+        time.sleep(0.06)
+        self.assertIsNone(cache.get(ROLES_URL))
+        self.assertEqual(cache.get(ROLES_URL, loader), "v2")
+        self.assertEqual(cache.get_stats(),
+                         {"hits": 2, "misses": 4, "refreshes": 0,
+                          "size": 1})
+        cache.invalidate()
+        self.assertEqual(cache.get_stats()["size"], 0)
+
+    def test_refresh(self):
+        cache = MetadataCache(0, refresh=True)
+        loaded = threading.Event()
+
+        def loader():
+            loaded.set()
+            return "new"
+
+        cache.put(CF_URL, "old")
+        cache.ttl = 60
+        # the expired data is returned while being reloaded
+        self.assertEqual(cache.get(CF_URL, loader), "old")
+        self.assertTrue(loaded.wait(1))
+        for i in range(100):
+            if cache.refreshes:
+                break
+            time.sleep(0.01)
+        self.assertEqual(cache.get(CF_URL), "new")
+        self.assertEqual(cache.get_stats()["refreshes"], 1)
+
+        def failed():
+            raise ValueError("down")
+
+        cache.ttl = 0
+        cache.put(CF_URL, "new")
+        self.assertEqual(cache.get(CF_URL, failed), "new")
+        for i in range(100):
+            if not cache._refreshing:
+                break
+            time.sleep(0.01)
+        self.assertEqual(cache.get_stats()["refreshes"], 1)
+        self.assertEqual(cache.get(CF_URL, loader), "new")
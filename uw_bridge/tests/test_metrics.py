@@ -0,0 +1,87 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+from unittest import TestCase
+from commonconf import override_settings
+from restclients_core.exceptions import DataFailureException
+from uw_bridge import Bridge
+from uw_bridge.metrics import BridgeMetrics, Histogram, get_endpoint
+from uw_bridge.users import BridgeAccounts
+from uw_bridge.tests import fdao_bridge_override
+
+
+@fdao_bridge_override
+class TestMetrics(TestCase):
+
+    def test_get_endpoint(self):
+        self.assertEqual(get_endpoint(
+            "/api/author/users/195?includes%5B%5D=manager"),
+            "/api/author/users/{id}")
+        self.assertEqual(get_endpoint(
+            "/api/admin/users/uid%3Abill%40uw%2Eedu/roles/batch"),
+            "/api/admin/users/{uid}/roles/batch")
+        self.assertEqual(get_endpoint("/api/author/roles"),
+                         "/api/author/roles")
+
+    def test_histogram(self):
+        histogram = Histogram(buckets=(0.1, 1.0))
+        self.assertIsNone(histogram.quantile(0.5))
+        for value in (0.05, 0.5, 0.7, 5.0):
+            histogram.observe(value)
+        self.assertEqual(list(histogram.cumulative_counts()), [1, 3])
+        self.assertEqual(histogram.quantile(0.5), 1.0)
+        self.assertEqual(histogram.quantile(1), float("inf"))
+        self.assertEqual(histogram.sum, 6.25)
+
+    def test_disabled(self):
+        self.assertIsNone(Bridge().metrics)
+
+    def test_bridge_accounts(self):
+        with override_settings(RESTCLIENTS_BRIDGE_DAO_CLASS='Mock',
+                               RESTCLIENTS_BRIDGE_METRICS=True):
+            bridge = BridgeAccounts()
+            self.assertTrue(bridge.metrics is Bridge().metrics)
+            bridge.metrics.reset()
+            users = bridge.get_all_users(includes=['custom_fields'])
+            self.assertEqual(len(users), 3)
+            self.assertRaises(DataFailureException,
+                              bridge.get_user, "unknown")
+
+            stats = bridge.metrics.get_stats()
+            self.assertEqual(stats["GET /api/author/users"]["count"], 2)
+            self.assertTrue(stats["GET /api/author/users"]["bytes_in"] > 0)
+            self.assertEqual(stats["GET /api/author/users"]["errors"], 0)
+            self.assertEqual(
+                stats["GET /api/author/users/{uid}"]["errors"], 1)
+            self.assertEqual(stats["GET /api/author/roles"]["count"], 1)
+            self.assertEqual(stats["decode"]["count"], 2)
+            self.assertEqual(stats["build"]["users"], 3)
+
+            text = bridge.metrics.to_prometheus()
+            self.assertIn("# TYPE bridge_request_seconds histogram\n", text)
+            self.assertIn(
+                'bridge_request_seconds_bucket{method="GET",'
+                'endpoint="/api/author/users",le="+Inf"} 2\n', text)
+            self.assertIn(
+                'bridge_requests_total{method="GET",'
+                'endpoint="/api/author/users/{uid}",status="404"} 1\n', text)
+            self.assertIn('bridge_users_total{phase="build"} 3\n', text)
+            self.assertIn('bridge_phase_seconds_count{phase="decode"} 2\n',
+                          text)
+
+    def test_sink(self):
+        metrics = BridgeMetrics()
+        metrics.record_request("PATCH", "/api/author/users/1", 200, 0.02,
+                               100, 20)
+        metrics.record_request("PATCH", "/api/author/users/2", 502, 0.3,
+                               0, 20)
+        self.assertEqual(metrics.get_stats(), {
+            "PATCH /api/author/users/{id}": {
+                "count": 2, "errors": 1, "seconds": 0.32, "p50": 0.025,
+                "p99": 0.5, "bytes_in": 100, "bytes_out": 40}})
+        self.assertIn(
+            'bridge_bytes_sent_total{method="PATCH",'
+            'endpoint="/api/author/users/{id}"} 40\n',
+            metrics.to_prometheus())
+        metrics.reset()
+        self.assertEqual(metrics.get_stats(), {})
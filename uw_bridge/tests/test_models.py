@@ -4,7 +4,8 @@
 from datetime import datetime
 from unittest import TestCase
 from dateutil.parser import parse
-from uw_bridge.models import BridgeUser, BridgeCustomField, BridgeUserRole
+from uw_bridge.models import (
+    BridgeUser, BridgeCustomField, BridgeUserRole, BridgeUserRecord)
 
 
 class TestBridgeModel(TestCase):
@@ -162,6 +163,64 @@ class TestBridgeModel(TestCase):
         self.assertIsNone(
             user.get_custom_field(BridgeCustomField.REGID_NAME).value)
 
+    def test_bridge_user_changes(self):
+        user = BridgeUser(bridge_id=123, netid="iamstudent",
+                          email="iamstudent@uw.edu",
+                          full_name="Iam Student",
+                          first_name="Iam", last_name="Student")
+        user.custom_fields["regid"] = BridgeCustomField(
+            field_id="5", name="regid", value_id="1", value="123")
+        user.custom_fields["employee_id"] = BridgeCustomField(
+            field_id="6", name="employee_id", value_id="2", value="456")
+        # the original state is unknown
+        self.assertIsNone(user.original)
+        self.assertTrue(user.has_changes())
+        self.assertEqual(user.to_json_patch(changes_only=True),
+                         user.to_json_patch())
+
+        user.set_original()
+        self.assertFalse(user.has_changes())
+        self.assertEqual(user.to_json_patch(changes_only=True),
+                         {"user": {"uid": "iamstudent@uw.edu", "id": 123}})
+
+        user.update_custom_field("employee_id", "789")
+        user.job_title = "Student Assistant"
+        user.last_name = "Student2"
+        self.assertTrue(user.has_changes())
+        self.assertEqual(
+            user.to_json_patch(changes_only=True),
+            {"user": {"uid": "iamstudent@uw.edu", "id": 123,
+                      "last_name": "Student2",
+                      "sortable_name": "Student2, Iam",
+                      "job_title": "Student Assistant",
+                      "custom_field_values": [
+                          {"custom_field_id": "6", "id": "2",
+                           "value": "789"}]}})
+        self.assertEqual(len(user.to_json_patch()["user"]), 9)
+
+        user.set_original()
+        user.netid = "iamstudent2"
+        self.assertTrue(user.has_changes())
+        self.assertEqual(user.to_json_patch(changes_only=True),
+                         {"user": {"uid": "iamstudent2@uw.edu", "id": 123}})
+        user.netid = "iamstudent"
+        self.assertFalse(user.has_changes())
+
+        user.set_original()
+        user.custom_fields["student_id"] = BridgeCustomField(
+            field_id="7", name="student_id", value="1234567")
+        self.assertEqual(
+            user.to_json_patch(changes_only=True),
+            {"user": {"uid": "iamstudent@uw.edu", "id": 123,
+                      "custom_field_values": [
+                          {"custom_field_id": "7", "value": "1234567"}]}})
+
+        user = BridgeUser(netid="iamstudent", full_name="Iam Student")
+        user.set_original({"netid": "iamstudent", "full_name": "I S"}, [])
+        self.assertEqual(user.to_json_patch(changes_only=True),
+                         {"user": {"uid": "iamstudent@uw.edu",
+                                   "full_name": "Iam Student"}})
+
     def test_bridge_user_role(self):
         user = BridgeUser(netid="iamstudent",
                           email="iamstudent@uw.edu",
@@ -207,3 +266,61 @@ class TestBridgeModel(TestCase):
             ['author', 'account_admin', 'it_admin', 'admin'])
         user.delete_role(role1)
         self.assertEqual(len(user.roles), 4)
+
+    def test_bridge_user_record(self):
+        record = BridgeUserRecord(
+            netid="iamstudent",
+            email="iamstudent@uw.edu",
+            full_name="Iam Student",
+            bridge_id=1,
+            manager_id=2,
+            updated_at=parse("2016-08-08T13:58:20.635-07:00"),
+            custom_fields=[("regid", "5", "1", "1234"),
+                           ("employee_id", "6", "2", "123456789")],
+            roles=[("author", "Author")])
+        self.assertEqual(record.locale, "en")
+        self.assertEqual(record.completed_courses_count, -1)
+        self.assertIsNone(record.department)
+        self.assertEqual(record.get_uid(), "iamstudent@uw.edu")
+        self.assertTrue(record.has_bridge_id())
+        self.assertTrue(record.has_manager())
+        self.assertFalse(record.is_deleted())
+        self.assertFalse(record.has_course_summary())
+        self.assertTrue(record.has_custom_field())
+        self.assertEqual(record.get_custom_field_value("employee_id"),
+                         "123456789")
+        self.assertIsNone(record.get_custom_field_value("student_id"))
+        self.assertEqual(record.get_custom_field("regid").to_json(),
+                         {"custom_field_id": "5", "id": "1",
+                          "value": "1234"})
+        self.assertIsNone(record.get_custom_field("student_id"))
+        self.assertEqual(record.get_role_ids(), ["author"])
+        self.assertFalse(hasattr(record, "__dict__"))
+
+        with self.assertRaises(AttributeError):
+            record.netid = "other"
+        with self.assertRaises(AttributeError):
+            del record.netid
+        self.assertRaises(TypeError, BridgeUserRecord, uid="iamstudent")
+
+        user = record.to_bridge_user()
+        self.assertEqual(user.netid, "iamstudent")
+        self.assertEqual(user.manager_id, 2)
+        self.assertEqual(user.updated_at, record.updated_at)
+        self.assertTrue(user.roles[0].is_author())
+        self.assertEqual(user.get_custom_field("regid").value_id, "1")
+        self.assertEqual(record.to_json(), user.to_json())
+        self.assertEqual(str(record), str(user))
+        # unchanged since converted
+        self.assertFalse(user.has_changes())
+        self.assertEqual(user.to_json_patch(changes_only=True),
+                         {"user": {"id": user.bridge_id,
+                                   "uid": "iamstudent@uw.edu"}})
+
+        user.update_custom_field("regid", "4321")
+        self.assertEqual(record.get_custom_field_value("regid"), "1234")
+
+        record1 = BridgeUserRecord.from_bridge_user(user)
+        self.assertEqual(record1.get_custom_field_value("regid"), "4321")
+        self.assertEqual(record1.roles, (("author", "Author"),))
+        self.assertEqual(str(record1.to_bridge_user()), str(user))
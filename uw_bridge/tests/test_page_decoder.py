@@ -0,0 +1,272 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+import re
+from unittest import TestCase
+from restclients_core.models.fields import BaseField
+from uw_bridge import codec
+from uw_bridge.models import BridgeCustomField, BridgeUser, BridgeUserRole
+from uw_bridge.page_decoder import (
+    Interner, ModelFactory, PageDecoder, get_factory, strip_uw_domain)
+from uw_bridge.users import BridgeAccounts, get_all_users_url
+from uw_bridge.tests import fdao_bridge_override
+
+
+PAGE = {"meta": {},
+        "linked": {"custom_field_values": [
+            {"id": "1", "value": "v1",
+             "links": {"custom_field": {"id": "5"}}},
+            {"id": "2", "value": "v2",
+             "links": {"custom_field": {"id": "11"}}},
+            {"id": "3", "value": "unknown",
+             "links": {"custom_field": {"id": "999"}}}]},
+        "users": [
+            {"id": "1", "uid": "a@uw.edu", "first_name": "A",
+             "hire_date": "2016-08-12T00:00:00.000-07:00",
+             "manager_id": "10", "roles": ["author", "unknown"],
+             "links": {"custom_field_values": ["1", "2", "4"]}},
+            {"id": "2", "uid": "b@uw.edu@uw.edu", "locale": "fr",
+             "completed_courses_count": 3, "deleted_at": None,
+             "links": {"custom_field_values": ["2", "3"]}},
+            {"id": "3", "uid": "c", "links": {}, "roles": None},
+            {"id": "x", "uid": "d@uw.edu"},
+            {"id": "5"}]}
+# str() of the users of PAGE
+PAGE_USERS = [
+    '{"uid": "a@uw.edu", "full_name": "", "email": "", "id": 1, '
+    '"first_name": "A", "hire_date": "2016-08-12T00:00:00-07:00", '
+    '"manager_id": 10, "deleted_at": null, "logged_in_at": null, '
+    '"updated_at": null, "completed_courses_count": -1, '
+    '"custom_fields": [{"name": "regid", "value": "v1"}, '
+    '{"name": "pos1_budget_code", "value": "v2"}], '
+    '"roles": ["author", "unknown"]}',
+    '{"uid": "b@uw.edu", "full_name": "", "email": "", "id": 2, '
+    '"deleted_at": null, "logged_in_at": null, "updated_at": null, '
+    '"completed_courses_count": 3, '
+    '"custom_fields": [{"name": "pos1_budget_code", "value": "v2"}, '
+    '{"name": null, "value": "unknown"}]}',
+    '{"uid": "c@uw.edu", "full_name": "", "email": "", "id": 3, '
+    '"deleted_at": null, "logged_in_at": null, "updated_at": null, '
+    '"completed_courses_count": -1}']
+
+
+def state(obj):
+    # the field descriptors add "__rcm_timestamp" when a field is read
+    return {key: value for key, value in vars(obj).items()
+            if key != "__rcm_timestamp"}
+
+
+@fdao_bridge_override
+class TestPageDecoder(TestCase):
+
+    def setUp(self):
+        self.bridge = BridgeAccounts()
+
+    def test_compiled(self):
+        # the restclients_core Model internals are the expected ones:
+        # the fast path is used and the field keys are pinned at import
+        decoder = PageDecoder(self.bridge.custom_fields,
+                              self.bridge.user_roles, PAGE["linked"])
+        for factory in (decoder.user_factory, decoder.manager_user_factory,
+                        decoder.field_factory, decoder.role_factory):
+            self.assertTrue(factory.compiled, "{0} {1} not compiled".format(
+                factory.model.__name__, factory.names))
+        for model in (BridgeCustomField, BridgeUser, BridgeUserRole):
+            for name, field in vars(model).items():
+                if isinstance(field, BaseField):
+                    self.assertTrue(hasattr(field, "__rcm_timestamp"),
+                                    "{0}.{1}".format(model.__name__, name))
+
+    def decode(self, resp_data, records=False, interner=None):
+        decoder = PageDecoder(self.bridge.custom_fields,
+                              self.bridge.user_roles,
+                              resp_data["linked"], records=records,
+                              interner=interner)
+        return decoder.decode(resp_data["users"], [])
+
+    def assert_same_users(self, users, expected):
+        self.assertEqual([str(u) for u in users],
+                         [str(u) for u in expected])
+        for user, other in zip(users, expected):
+            if isinstance(user, BridgeUser):
+                self.assertEqual(user.to_json_patch(), other.to_json_patch())
+                self.assertEqual(list(user.custom_fields),
+                                 list(other.custom_fields))
+                self.assertEqual(
+                    [state(r) for r in user.roles],
+                    [state(r) for r in other.roles])
+                self.assertEqual(state(user).keys(), state(other).keys())
+
+    def test_strip_uw_domain(self):
+        for uid in ("javerage@uw.edu", "javerage", "", "@uw.edu",
+                    "a@uw.edu@uw.edu", "a@uwXedu", "a@uw.edu.b",
+                    "a@uw.edux", "a@washington.edu"):
+            self.assertEqual(strip_uw_domain(uid),
+                             re.sub('@uw.edu', '', uid))
+
+    def test_model_factory(self):
+        factory = get_factory(BridgeUserRole, ("role_id", "name"))
+        self.assertTrue(factory.compiled)
+        self.assertIs(get_factory(BridgeUserRole, ["role_id", "name"]),
+                      factory)
+        role = factory.new(("author", "Author"))
+        self.assertEqual(state(role),
+                         state(BridgeUserRole(role_id="author",
+                                              name="Author")))
+        self.assertTrue(role.is_author())
+        role.name = "Admin"
+        self.assertTrue(role.is_admin())
+        self.assertEqual(factory.new(("x", None)).name, None)
+
+        factory = ModelFactory(BridgeCustomField, ("field_id", "value"))
+        self.assertTrue(factory.compiled)
+        field = factory.new(("5", "v"))
+        self.assertIsNone(field.value_id)
+        self.assertEqual(field.to_json(),
+                         {"custom_field_id": "5", "value": "v"})
+        factory.compiled = False
+        self.assertEqual(state(factory.new(("5", "v"))), state(field))
+        self.assertRaises(AttributeError, ModelFactory,
+                          BridgeCustomField, ("field_id", "to_json"))
+
+        factory = ModelFactory(BridgeUser, ("netid",))
+        self.assertFalse(factory.compiled)  # custom_fields and roles
+        self.assertEqual(factory.new(("bill",)).custom_fields, {})
+
+    def test_decode(self):
+        for records in (False, True):
+            users = self.decode(PAGE, records=records)
+            self.assertEqual([str(u) for u in users], PAGE_USERS)
+
+        users = self.decode(PAGE)
+        self.assertEqual(users[0].to_json_patch(), {"user": {
+            "uid": "a@uw.edu", "full_name": "", "email": "", "id": 1,
+            "first_name": "A", "hire_date": "2016-08-12T00:00:00-07:00",
+            "manager_id": 10, "custom_field_values": [
+                {"custom_field_id": "5", "value": "v1", "id": "1"},
+                {"custom_field_id": "11", "value": "v2", "id": "2"}]}})
+        self.assertEqual(users[2].to_json_patch(), {"user": {
+            "uid": "c@uw.edu", "full_name": "", "email": "", "id": 3,
+            "custom_field_values": []}})
+        self.assertIsNotNone(users[0].original)
+        self.assertFalse(users[0].has_changes())
+        self.assertEqual(users[1].locale, "fr")
+        self.assertIsNone(users[0].updated_at)
+        self.assertEqual(users[0].netid, "a")
+        self.assertEqual(users[0].manager_id, 10)
+        self.assertEqual(users[0].get_custom_field("regid").value, "v1")
+        self.assertEqual([r.name for r in users[0].roles],
+                         ["Author", None])
+        self.assertEqual(users[1].netid, "b")
+        self.assertEqual(list(users[1].custom_fields), ["pos1_budget_code",
+                                                        None])
+        self.assertEqual(users[2].roles, [])
+        # the users of a page share the BridgeCustomField of a value
+        self.assertIs(users[0].custom_fields["pos1_budget_code"],
+                      users[1].custom_fields["pos1_budget_code"])
+
+        resp_data = codec.loads(self.bridge.get_resource(
+            get_all_users_url(['custom_fields'], None)))
+        users = self.decode(resp_data)
+        self.assertEqual([u.netid for u in users], ["eight", "javerage"])
+        self.assertEqual(list(users[1].custom_fields), ["regid"])
+        self.assertEqual(
+            users[1].get_custom_field_value(BridgeCustomField.REGID_NAME),
+            "9136CCB8F66711D5BE060004AC494FFE")
+        self.assertEqual(users[1].get_role_ids(),
+                         ["account_admin", "author", "fb412e52"])
+        self.assertTrue(users[1].roles[0].is_account_admin())
+
+    def test_decode_user(self):
+        decoder = PageDecoder(self.bridge.custom_fields,
+                              self.bridge.user_roles, PAGE["linked"])
+        self.assertEqual(str(decoder.decode_user(PAGE["users"][1])),
+                         PAGE_USERS[1])
+        self.assertIsNone(decoder.decode_user(PAGE["users"][3]))
+        decoder.records = True
+        decoder.errors = []
+        self.assertIsNone(decoder.decode_user(PAGE["users"][3]))
+        self.assertEqual(decoder.errors[0][1], PAGE["users"][3])
+        self.assertEqual(str(decoder.decode_user(PAGE["users"][2])),
+                         PAGE_USERS[2])
+
+    def test_update_shared_custom_field(self):
+        users = self.decode(PAGE)
+        field = users[1].custom_fields["pos1_budget_code"]
+        users[0].update_custom_field("pos1_budget_code", "new")
+        self.assertEqual(
+            users[0].get_custom_field_value("pos1_budget_code"), "new")
+        self.assertEqual(users[0].get_custom_field(
+            "pos1_budget_code").value_id, "2")
+        self.assertIs(users[1].custom_fields["pos1_budget_code"], field)
+        self.assertEqual(field.value, "v2")
+
+    def test_interner(self):
+        page = codec.loads(codec.dumps({
+            "meta": {},
+            "linked": {"custom_field_values": [
+                {"id": str(i), "value": "ORG1",
+                 "links": {"custom_field": {"id": "14"}}}
+                for i in range(1, 4)]},
+            "users": [
+                {"id": str(i), "uid": "user{0:d}@uw.edu".format(i),
+                 "department": "IT", "job_title": "Staff", "locale": "en",
+                 "roles": ["author"],
+                 "links": {"custom_field_values": [str(i)]}}
+                for i in range(1, 4)]}))
+        # the decoded page holds distinct but equal strings
+        self.assertIsNot(page["users"][0]["department"],
+                         page["users"][1]["department"])
+
+        for records in (False, True):
+            interner = Interner()
+            users = self.decode(page, records=records, interner=interner)
+            self.assert_same_users(users, self.decode(page, records))
+            self.assertIs(users[0].department, users[2].department)
+            self.assertIs(users[0].job_title, users[1].job_title)
+            self.assertIs(users[0].get_custom_field_value("pos1_org_code"),
+                          users[1].get_custom_field_value("pos1_org_code"))
+            self.assertIs(users[0].roles[0], users[1].roles[0])
+            self.assertEqual(interner.get_stats()["roles"], 1)
+
+            # shared across the pages of a bulk read
+            more = self.decode(page, records=records, interner=interner)
+            self.assertIs(more[0].department, users[0].department)
+            self.assertEqual(interner.get_stats()["roles"], 1)
+
+        # the values of a field unique per user are not kept
+        interner = Interner(max_field_values=2)
+        self.assertEqual(interner.intern_value("14", "ORG1"), "ORG1")
+        self.assertIs(interner.intern_value("14", "ORG1"[:3] + "1"),
+                      interner.intern_value("14", "ORG1"))
+        interner.intern_value("14", "ORG2")
+        self.assertEqual(interner.get_stats()["strings"], 2)
+        value = "ORG" + "3"
+        self.assertIs(interner.intern_value("14", value), value)
+        self.assertEqual(interner.get_stats(),
+                         {"strings": 0, "roles": 0, "uninterned_fields": 1})
+        value = "ORG" + "1"
+        self.assertIs(interner.intern_value("14", value), value)
+        self.assertIs(interner.intern("IT"), interner.intern("I" + "T"))
+
+        # copy-on-write
+        users = self.decode(page, interner=Interner())
+        users[0].add_role(BridgeUserRole(role_id="admin"))
+        users[1].delete_role(BridgeUserRole(role_id="author"))
+        users[0].update_custom_field("pos1_org_code", "ORG2")
+        self.assertEqual(users[0].get_role_ids(), ["author", "admin"])
+        self.assertEqual(users[2].get_role_ids(), ["author"])
+        self.assertEqual(users[0].roles[0].name, "Author")
+        self.assertEqual(
+            users[2].get_custom_field_value("pos1_org_code"), "ORG1")
+        self.assertEqual(users[0].to_json_patch(changes_only=True)["user"][
+            "custom_field_values"], [
+                {"custom_field_id": "14", "id": "1", "value": "ORG2"}])
+
+    def test_invalid_linked(self):
+        self.assertRaises(KeyError, PageDecoder, self.bridge.custom_fields,
+                          self.bridge.user_roles,
+                          {"custom_field_values": [{"id": "1"}]})
+        self.assertRaises(TypeError, PageDecoder, self.bridge.custom_fields,
+                          self.bridge.user_roles, None)
+        self.assertEqual(self.decode({"linked": {}, "users": []}), [])
@@ -0,0 +1,90 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from unittest import TestCase
+from unittest.mock import patch
+from commonconf import override_settings
+from restclients_core.exceptions import DataFailureException
+from uw_bridge import Bridge
+from uw_bridge.rate_limit import (
+    RateLimiter, get_rate_limiter, get_retry_after)
+from uw_bridge.tests import fdao_bridge_override, mock_response
+
+
+@fdao_bridge_override
+class TestRateLimiter(TestCase):
+
+    def test_get_retry_after(self):
+        self.assertIsNone(get_retry_after(mock_response(429)))
+        self.assertEqual(get_retry_after(
+            mock_response(429, {"Retry-After": "2"})), 2.0)
+        self.assertEqual(get_retry_after(
+            mock_response(429, {"retry-after": "-2"})), 0.0)
+        self.assertEqual(get_retry_after(
+            mock_response(429, {"Retry-After": "36000"})), 300)
+        self.assertIsNone(get_retry_after(
+            mock_response(429, {"Retry-After": "soon"})))
+        later = datetime.now(timezone.utc) + timedelta(seconds=60)
+        seconds = get_retry_after(mock_response(
+            503, {"Retry-After": format_datetime(later, usegmt=True)}))
+        self.assertTrue(55 < seconds <= 60)
+
+    def test_get_rate_limiter(self):
+        self.assertIsNone(get_rate_limiter(Bridge().dao))
+        with override_settings(RESTCLIENTS_BRIDGE_DAO_CLASS='Mock',
+                               RESTCLIENTS_BRIDGE_RATE_LIMIT=5):
+            bridge = Bridge()
+            self.assertEqual(bridge.rate_limiter.max_rate, 5.0)
+            self.assertEqual(bridge.rate_limiter.max_retries, 3)
+            self.assertTrue(bridge.rate_limiter is Bridge().rate_limiter)
+
+    def test_reserve(self):
+        limiter = RateLimiter(10, burst=2)
+        self.assertEqual(limiter.reserve(), 0)
+        self.assertEqual(limiter.reserve(), 0)
+        self.assertTrue(0.05 < limiter.reserve() <= 0.1)
+        self.assertTrue(0.15 < limiter.reserve() <= 0.2)
+
+    def test_update(self):
+        limiter = RateLimiter(10, increase=1)
+        self.assertFalse(limiter.update(mock_response(200)))
+        self.assertEqual(limiter.rate, 10)
+
+        self.assertTrue(limiter.update(
+            mock_response(429, {"Retry-After": "1"})))
+        self.assertEqual(limiter.rate, 5)
+        self.assertTrue(0.5 < limiter.reserve() <= 1)
+
+        self.assertFalse(limiter.update(mock_response(503)))
+        self.assertEqual(limiter.rate, 2.5)
+        self.assertTrue(limiter.update(
+            mock_response(503, {"Retry-After": "0"})))
+        self.assertEqual(limiter.get_stats(),
+                         {"rate": 1.25, "max_rate": 10.0, "throttled": 3})
+
+        limiter.update(mock_response(200))
+        self.assertEqual(limiter.rate, 2.25)
+
+        limiter = RateLimiter(1, min_rate=0.5)
+        limiter.update(mock_response(429))
+        limiter.update(mock_response(429))
+        self.assertEqual(limiter.rate, 0.5)
+
+    def test_throttled_request(self):
+        bridge = Bridge()
+        bridge.rate_limiter = RateLimiter(1000, max_retries=2)
+        throttled = mock_response(429, {"Retry-After": "0"})
+        with patch.object(bridge, "_get_response", side_effect=[
+                throttled, mock_response(200, data="ok")]) as get_response:
+            self.assertEqual(bridge.get_resource("/api/author/roles"), "ok")
+            self.assertEqual(get_response.call_count, 2)
+
+        with patch.object(bridge, "_get_response",
+                          return_value=throttled) as get_response:
+            with self.assertRaises(DataFailureException) as cm:
+                bridge.get_resource("/api/author/roles")
+            self.assertEqual(cm.exception.status, 429)
+            self.assertEqual(get_response.call_count, 3)
+        self.assertEqual(bridge.rate_limiter.throttled, 4)
@@ -0,0 +1,174 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+from unittest import TestCase
+from unittest.mock import patch
+from dateutil.parser import parse
+from uw_bridge.models import BridgeCustomField, BridgeUser
+from uw_bridge.reconcile import (
+    Reconciler, ReconcileAction, get_phase, ADD, RESTORE, CHANGE_UID,
+    UPDATE, DELETE)
+from uw_bridge.users import BridgeAccounts
+from uw_bridge.tests import fdao_bridge_override
+
+
+def new_user(**kwargs):
+    return BridgeUser(email="{0}@uw.edu".format(kwargs["netid"]),
+                      full_name="{0} Average".format(kwargs["netid"]),
+                      **kwargs)
+
+
+def get_current():
+    staff = new_user(bridge_id=106, netid="staff", department="IT")
+    staff.custom_fields["regid"] = BridgeCustomField(
+        field_id="5", name="regid", value_id="11", value="AB")
+    staff.set_original()
+    return [
+        new_user(bridge_id=195, netid="javerage"),
+        BridgeUser(bridge_id=17637, netid="oldbill", first_name="Bill",
+                   email="bill@uw.edu", full_name="bill Average",
+                   deleted_at=parse("2018-01-01T00:00:00-08:00")),
+        staff,
+        new_user(bridge_id=12, netid="boss"),
+    ]
+
+
+@fdao_bridge_override
+class TestReconciler(TestCase):
+
+    def test_plan(self):
+        reconciler = Reconciler(BridgeAccounts())
+        staff = new_user(netid="staff", department="IT")
+        staff.custom_fields["regid"] = BridgeCustomField(
+            field_id="5", name="regid", value="AB")
+        bill = new_user(netid="bill", bridge_id=17637, first_name="Bill",
+                        job_title="Teacher")
+        eight = new_user(netid="eight", manager_netid="boss")
+        boss = new_user(netid="boss", department="HR", manager_netid="none")
+        plan = reconciler.plan([staff, bill, eight, boss, new_user(
+            netid="staff")], current=get_current(), delete_missing=True)
+
+        self.assertEqual(plan.get_counts(), {
+            ADD: 1, RESTORE: 1, CHANGE_UID: 1, UPDATE: 2, DELETE: 1,
+            "unchanged": 1, "duplicate": 1})
+        self.assertEqual(len(plan), 4)
+        self.assertEqual(staff.bridge_id, 106)
+        self.assertEqual(staff.get_custom_field("regid").value_id, "11")
+        self.assertEqual(eight.manager_id, 0)   # added, not matched
+
+        action = plan.get_actions(RESTORE)[0]
+        self.assertIs(action.user, bill)
+        self.assertEqual(action.steps, [RESTORE, CHANGE_UID, UPDATE])
+        self.assertEqual(action.changes, ["job_title"])
+        self.assertEqual(action.get_bridge_id(), 17637)
+        self.assertIsNotNone(str(action))
+        # an unresolved manager_netid is sent as is
+        self.assertEqual(plan.get_actions(UPDATE)[1].changes,
+                         ["department", "manager_id"])
+        self.assertEqual(plan.get_actions(ADD)[0].user, eight)
+        self.assertEqual(plan.get_actions(DELETE)[0].get_bridge_id(), 195)
+
+        plan = reconciler.plan([staff], current=get_current())
+        self.assertEqual(len(plan), 0)
+        self.assertEqual(plan.unchanged, 1)
+
+        # a manager matched by netid
+        javerage = new_user(netid="javerage", manager_netid="boss")
+        plan = reconciler.plan([javerage], current=get_current())
+        self.assertEqual(javerage.manager_id, 12)
+        self.assertEqual(plan.actions[0].changes, ["manager_id"])
+
+    def test_plan_active_users(self):
+        reconciler = Reconciler(BridgeAccounts())
+        current = reconciler.bridge.get_all_users(includes=['custom_fields'])
+        desired = []
+        for user in current:
+            user = BridgeUser(bridge_id=user.bridge_id, netid=user.netid,
+                              email=user.email, full_name=user.full_name,
+                              first_name=user.first_name,
+                              last_name=user.last_name)
+            desired.append(user)
+        plan = reconciler.plan(desired, delete_missing=True)
+        self.assertEqual(plan.get_counts()[DELETE], 0)
+        self.assertEqual(plan.get_counts()[ADD], 0)
+        self.assertEqual(len(plan), 0)
+        self.assertEqual(plan.unchanged, len(current))
+
+        # the deleted user is looked up
+        bill = new_user(netid="bill", bridge_id=17637)
+        plan = reconciler.plan([bill])
+        self.assertEqual(plan.actions[0].steps, [RESTORE, UPDATE])
+
+    def test_plan_deleted_netid(self):
+        reconciler = Reconciler(BridgeAccounts())
+        # the deleted account without a bridge_id is matched on uid
+        bill = new_user(netid="bill")
+        plan = reconciler.plan([bill], current=get_current())
+        self.assertEqual(plan.get_counts()[ADD], 0)
+        self.assertEqual(plan.actions[0].steps, [RESTORE, UPDATE])
+        self.assertEqual(bill.bridge_id, 17637)
+
+        # not in Bridge
+        plan = reconciler.plan([new_user(netid="newbie")],
+                               current=get_current())
+        self.assertEqual(plan.actions[0].steps, [ADD])
+
+        # the unmatched users are looked up in one bulk run
+        bridge = reconciler.bridge
+        with patch.object(bridge, "run_bulk",
+                          wraps=bridge.run_bulk) as run_bulk:
+            plan = reconciler.plan(
+                [new_user(netid="newbie"), new_user(netid="javerage"),
+                 new_user(netid="bill")],
+                current=get_current(), concurrency=3)
+            run_bulk.assert_called_once()
+            self.assertEqual([u.netid for u in run_bulk.call_args[0][1]],
+                             ["newbie", "bill"])
+            self.assertEqual(run_bulk.call_args[0][2], 3)
+        self.assertEqual([a.steps for a in plan.actions],
+                         [[ADD], [RESTORE, UPDATE]])
+
+    def test_run(self):
+        reconciler = Reconciler(BridgeAccounts())
+        bill = new_user(netid="bill", bridge_id=17637, first_name="Bill",
+                        job_title="Teacher")
+        eight = new_user(netid="eight", first_name="Eight Class",
+                         last_name="Student")
+        staff = new_user(netid="staff", department="IT")
+        boss = new_user(netid="boss", job_title="Director")
+        report = reconciler.reconcile(
+            [bill, eight, staff, boss], current=get_current(),
+            delete_missing=True, concurrency=2)
+
+        summary = report.get_summary()
+        self.assertEqual(summary[RESTORE], {
+            "planned": 1, "succeeded": 1, "failed": 0})
+        self.assertEqual(summary[CHANGE_UID]["succeeded"], 1)
+        self.assertEqual(summary[ADD]["succeeded"], 1)
+        self.assertEqual(summary[DELETE]["succeeded"], 1)
+        self.assertEqual(summary["unchanged"], 1)
+        # no PATCH response for 12
+        self.assertEqual(summary[UPDATE], {
+            "planned": 2, "succeeded": 1, "failed": 1})
+        self.assertFalse(report.is_success())
+        errors = report.get_errors()
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0][0].user, boss)
+        self.assertEqual(errors[0][1].status, 404)
+        self.assertIn("update: 2 planned, 1 succeeded, 1 failed",
+                      str(report))
+
+        # the deletes first, the adds last
+        run_steps = []
+        with patch.object(reconciler, "_run_action",
+                          side_effect=lambda a: run_steps.append(a.steps)):
+            plan = reconciler.plan(
+                [new_user(netid="newbie"), staff, bill],
+                current=get_current(), delete_missing=True)
+            reconciler.run(plan, concurrency=4)
+        self.assertEqual([get_phase(ReconcileAction(None, steps=steps))
+                          for steps in run_steps], [0, 0, 1, 2])
+
+        action = ReconcileAction(eight, steps=[ADD])
+        self.assertTrue(reconciler._run_action(action))
+        self.assertEqual(action.done, [ADD])
@@ -0,0 +1,141 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+from unittest import TestCase
+from unittest.mock import patch
+from uw_bridge.response_cache import ResponseCache, get_response_cache
+from uw_bridge.users import BridgeAccounts, get_user_url
+from uw_bridge.tests import (
+    cache_override, fdao_bridge_override, mock_response)
+
+
+@fdao_bridge_override
+class TestResponseCache(TestCase):
+
+    def test_get_response_cache(self):
+        self.assertIsNone(BridgeAccounts().response_cache)
+        with cache_override:
+            bridge = BridgeAccounts()
+            self.assertEqual(bridge.response_cache.ttl, 60)
+            self.assertEqual(bridge.response_cache.max_size, 1000)
+            self.assertTrue(
+                bridge.response_cache is get_response_cache(bridge.dao))
+
+    def test_lru(self):
+        cache = ResponseCache(60, max_size=2)
+        cache.put("/a", mock_response(200, data="a"), tags=[("id", 1)])
+        cache.put("/b", mock_response(200, data="b"), tags=[("id", 2)])
+        self.assertEqual(cache.get("/a").data, "a")
+        cache.put("/c", mock_response(200, data="c"), tags=[("id", 1)])
+        self.assertIsNone(cache.get("/b"))
+        self.assertEqual(cache.get_stats(),
+                         {"hits": 1, "misses": 1, "revalidated": 0,
+                          "size": 2})
+        cache.invalidate(("id", 1))
+        self.assertEqual(cache.get_stats()["size"], 0)
+        self.assertEqual(cache._tags, {})
+
+    def test_generation(self):
+        cache = ResponseCache(60, max_size=2)
+        generation = cache.get_generation()
+        cache.invalidate(("id", 1))
+        # requested before the invalidation of one of its tags
+        cache.put("/a", mock_response(200), tags=[("id", 1), ("uid", "a")],
+                  generation=generation)
+        self.assertIsNone(cache.get("/a"))
+        cache.put("/b", mock_response(200), tags=[("id", 2)],
+                  generation=generation)
+        self.assertIsNotNone(cache.get("/b"))
+        cache.put("/a", mock_response(200), tags=[("id", 1)],
+                  generation=cache.get_generation())
+        self.assertIsNotNone(cache.get("/a"))
+
+        # the invalidated tags are forgotten past max_size
+        generation = cache.get_generation()
+        cache.invalidate(("id", 3), ("id", 4), ("id", 5))
+        self.assertEqual(cache._invalidated, {})
+        cache.put("/c", mock_response(200), tags=[("id", 6)],
+                  generation=generation)
+        self.assertIsNone(cache.get("/c"))
+
+    def test_get_user_in_flight(self):
+        with cache_override:
+            bridge = BridgeAccounts()
+            cache = bridge.response_cache
+            cache.invalidate()
+            load_resource = bridge._load_resource
+
+            def updated_meanwhile(*args, **kwargs):
+                response = load_resource(*args, **kwargs)
+                bridge._invalidate_user(bridge_id=195)
+                return response
+
+            with patch.object(bridge, "_load_resource",
+                              side_effect=updated_meanwhile):
+                self.assertEqual(bridge.get_user("javerage").bridge_id, 195)
+            self.assertEqual(cache.get_stats()["size"], 0)
+            bridge.get_user("javerage")
+            self.assertEqual(cache.get_stats()["size"], 1)
+
+    def test_get_user(self):
+        with cache_override:
+            bridge = BridgeAccounts()
+            cache = bridge.response_cache
+            cache.invalidate()
+            with patch.object(bridge, "_get_response",
+                              wraps=bridge._get_response) as get_response:
+                user = bridge.get_user("javerage")
+                self.assertEqual(str(bridge.get_user("javerage")), str(user))
+                bill = bridge.get_user_by_id(17637, include_deleted=True)
+                self.assertEqual(bridge.get_user("bill").netid, bill.netid)
+                self.assertIsNone(bridge.get_user_by_id(17637))
+                self.assertIsNone(bridge.get_user_by_id(17637))
+                # the metadata and four user requests
+                self.assertEqual(get_response.call_count, 6)
+                self.assertEqual(cache.get_stats()["size"], 4)
+
+                self.assertTrue(bridge.delete_user_by_id(195))
+                self.assertEqual(cache.get_stats()["size"], 3)
+                bridge.change_uid(17637, "bill")
+                self.assertEqual(cache.get_stats()["size"], 0)
+
+                bridge.get_user("javerage")
+                self.assertTrue(bridge.delete_user("javerage"))
+                bridge.get_user_by_id(17637, include_deleted=True)
+                bridge.restore_user_by_id(17637)
+                self.assertEqual(cache.get_stats()["size"], 0)
+
+                bridge.get_user("bill")
+                bridge.replace_uid("bill", "bill")
+                self.assertEqual(cache.get_stats()["size"], 0)
+
+    def test_revalidate(self):
+        with cache_override:
+            bridge = BridgeAccounts()
+            cache = bridge.response_cache
+            cache.invalidate()
+            url = get_user_url("javerage")
+            data = bridge.dao.getURL(url, {}).data
+            bridge.load_metadata()
+            with patch.object(bridge, "_get_response") as get_response:
+                get_response.return_value = mock_response(
+                    200, {"ETag": '"v1"'}, data)
+                user = bridge.get_user("javerage")
+                cache.get(url).expires = 0
+
+                get_response.return_value = mock_response(304, {}, "")
+                self.assertEqual(str(bridge.get_user("javerage")), str(user))
+                headers = get_response.call_args[0][2]
+                self.assertEqual(headers["If-None-Match"], '"v1"')
+                self.assertEqual(cache.get_stats()["revalidated"], 1)
+                self.assertTrue(cache.get(url).is_fresh())
+
+                cache.get(url).expires = 0
+                get_response.return_value = mock_response(
+                    200, {"Last-Modified": "Mon, 25 Jul 2016 23:24:42 GMT"},
+                    data)
+                bridge.get_user("javerage")
+                self.assertEqual(cache.get(url).etag, None)
+                self.assertEqual(cache.get(url).last_modified,
+                                 "Mon, 25 Jul 2016 23:24:42 GMT")
+                self.assertEqual(get_response.call_count, 3)
@@ -0,0 +1,88 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+from unittest import TestCase
+from unittest.mock import patch
+from commonconf import override_settings
+from restclients_core.exceptions import DataFailureException
+from uw_bridge import Bridge
+from uw_bridge.retry import RetryPolicy, get_retry_policy
+from uw_bridge.tests import fdao_bridge_override, mock_response
+
+
+@fdao_bridge_override
+class TestRetryPolicy(TestCase):
+
+    def test_get_retry_policy(self):
+        self.assertIsNone(Bridge().retry_policy)
+        with override_settings(RESTCLIENTS_BRIDGE_DAO_CLASS='Mock',
+                               RESTCLIENTS_BRIDGE_RETRY_MAX_ATTEMPTS=3):
+            policy = Bridge().retry_policy
+            self.assertEqual(policy.max_attempts, 3)
+            self.assertEqual(policy.status_codes, {0, 502, 503, 504})
+        with override_settings(RESTCLIENTS_BRIDGE_DAO_CLASS='Mock',
+                               RESTCLIENTS_BRIDGE_RETRY_MAX_ATTEMPTS=5,
+                               RESTCLIENTS_BRIDGE_RETRY_STATUS="500,503"):
+            policy = Bridge().retry_policy
+            self.assertEqual(policy.max_attempts, 5)
+            self.assertEqual(policy.status_codes, {500, 503})
+        with override_settings(RESTCLIENTS_BRIDGE_DAO_CLASS='Mock',
+                               RESTCLIENTS_BRIDGE_RETRY_MAX_ATTEMPTS=1):
+            self.assertIsNone(Bridge().retry_policy)
+
+    def test_can_retry(self):
+        policy = RetryPolicy()
+        self.assertTrue(policy.can_retry("GET", False, 503, 1))
+        self.assertTrue(policy.can_retry("DELETE", False, 0, 2))
+        self.assertFalse(policy.can_retry("GET", False, 503, 3))
+        self.assertFalse(policy.can_retry("GET", False, 404, 1))
+        self.assertFalse(policy.can_retry("POST", False, 503, 1))
+        self.assertFalse(policy.can_retry("PATCH", False, 503, 1))
+        self.assertTrue(policy.can_retry("POST", True, 502, 1))
+
+    def test_get_delay(self):
+        policy = RetryPolicy(backoff=1, max_backoff=3)
+        for i in range(20):
+            self.assertTrue(0 <= policy.get_delay(1) <= 1)
+            self.assertTrue(0 <= policy.get_delay(2) <= 2)
+            self.assertTrue(0 <= policy.get_delay(5) <= 3)
+
+    def test_retry_request(self):
+        bridge = Bridge()
+        bridge.retry_policy = RetryPolicy(backoff=0.001)
+        with patch.object(bridge, "_get_response", side_effect=[
+                mock_response(503),
+                DataFailureException("/api/author/roles", 0, "timeout"),
+                mock_response(200, data="ok")]) as get_response:
+            self.assertEqual(bridge.get_resource("/api/author/roles"), "ok")
+            self.assertEqual(get_response.call_count, 3)
+
+        with patch.object(bridge, "_get_response",
+                          return_value=mock_response(502)) as get_response:
+            with self.assertRaises(DataFailureException) as cm:
+                bridge.put_resource("/api/admin/users/1/roles/batch", "{}")
+            self.assertEqual(cm.exception.status, 502)
+            self.assertEqual(cm.exception.attempts, 3)
+            self.assertEqual(get_response.call_count, 3)
+
+        with patch.object(bridge, "_get_response",
+                          return_value=mock_response(502)) as get_response:
+            self.assertRaises(DataFailureException, bridge.post_resource,
+                              "/api/admin/users", "{}")
+            self.assertEqual(get_response.call_count, 1)
+
+        with patch.object(bridge, "_get_response", side_effect=[
+                mock_response(502), mock_response(201, data="ok")]):
+            self.assertEqual(bridge.post_resource(
+                "/api/author/users/1/restore", "{}", idempotent=True), "ok")
+
+        self.assertEqual(bridge.retry_policy.get_stats(),
+                         {"retried": 5, "recovered": 2, "failed": 1})
+
+    def test_no_retry_on_not_found(self):
+        bridge = Bridge()
+        bridge.retry_policy = RetryPolicy()
+        with self.assertRaises(DataFailureException) as cm:
+            bridge.get_resource("/api/author/none")
+        self.assertEqual(cm.exception.attempts, 1)
+        self.assertEqual(bridge.retry_policy.get_stats()["retried"], 0)
@@ -0,0 +1,150 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import subprocess
+import sys
+from unittest import TestCase, skipIf
+from uw_bridge.roster_frame import RosterFrameBuilder, np
+from uw_bridge.users import BridgeAccounts
+from uw_bridge.tests import fdao_bridge_override
+
+
+def user_data(bridge_id, department, due_date=None, courses=0,
+              value_ids=[]):
+    return {"id": str(bridge_id),
+            "uid": "user{0}@uw.edu".format(bridge_id),
+            "email": "user{0}@uw.edu".format(bridge_id),
+            "department": department,
+            "is_manager": bridge_id == 1,
+            "manager_id": None if bridge_id == 1 else "1",
+            "next_due_date": due_date,
+            "completed_courses_count": courses,
+            "links": {"custom_field_values": value_ids}}
+
+
+PAGE = {
+    "linked": {"custom_field_values": [
+        {"id": "11", "value": "ORG1",
+         "links": {"custom_field": {"id": "14"}}},
+        {"id": "12", "value": "ORG2",
+         "links": {"custom_field": {"id": "14"}}},
+        {"id": "13", "value": "ORG1",
+         "links": {"custom_field": {"id": "14"}}}]},
+    "users": [
+        user_data(1, "IT", "2016-08-02T14:36:17.082-07:00", 3, ["11"]),
+        user_data(2, "IT", "2099-01-01T00:00:00.000-08:00", 1, ["12"]),
+        user_data(3, "HR", "2016-01-01T00:00:00.000-08:00", 2, ["13"]),
+        user_data(4, None)]}
+
+
+@skipIf(np is None, "numpy is not installed")
+@fdao_bridge_override
+class TestRosterFrame(TestCase):
+
+    def setUp(self):
+        self.bridge_accs = BridgeAccounts()
+
+    def get_frame(self):
+        builder = RosterFrameBuilder(self.bridge_accs.custom_fields)
+        builder.add_page(PAGE)
+        builder.add_page({"users": []})
+        return builder.build()
+
+    def test_get_roster_frame(self):
+        frame = self.bridge_accs.get_roster_frame(includes=['custom_fields'])
+        self.assertEqual(len(frame), 3)
+        self.assertEqual(frame["bridge_id"].tolist(), [106, 195, 17])
+        self.assertEqual(frame["netid"].to_list(),
+                         ["eight", "javerage", "none"])
+        self.assertEqual(frame["regid"][1],
+                         "9136CCB8F66711D5BE060004AC494FFE")
+        self.assertEqual(frame["completed_courses_count"].tolist(),
+                         [-1, -1, 0])
+        self.assertEqual(str(frame["updated_at"][0]),
+                         "2016-08-02T21:36:17.082")
+        self.assertTrue(np.isnat(frame["next_due_date"]).all())
+
+        frame = self.bridge_accs.get_roster_frame(role_id='author',
+                                                  prefetch=1)
+        self.assertEqual(frame["bridge_id"].tolist(), [195])
+
+    def test_columns(self):
+        frame = self.get_frame()
+        self.assertEqual(len(frame), 4)
+        self.assertTrue("pos1_org_code" in frame)
+        self.assertEqual(frame["is_manager"].tolist(),
+                         [True, False, False, False])
+        self.assertEqual(frame["manager_id"].tolist(), [0, 1, 1, 1])
+        self.assertEqual(frame["department"].values, ["IT", "HR"])
+        self.assertEqual(frame["department"].codes.tolist(), [0, 0, 1, -1])
+        self.assertEqual(frame["pos1_org_code"].to_list(),
+                         ["ORG1", "ORG2", "ORG1", None])
+        self.assertEqual(frame.row(3)["department"], None)
+        self.assertEqual(frame.row(3)["next_due_date"], None)
+        self.assertEqual(frame.row(0)["bridge_id"], 1)
+
+    def test_filters(self):
+        frame = self.get_frame()
+        overdue = frame["next_due_date"] < np.datetime64("2024-01-01")
+        self.assertEqual(overdue.tolist(), [True, False, True, False])
+        self.assertEqual(frame.group_count("department", mask=overdue),
+                         {"IT": 1, "HR": 1})
+        self.assertEqual(frame.group_count("department"),
+                         {"IT": 2, "HR": 1, None: 1})
+        self.assertEqual(
+            frame.group_sum("department", "completed_courses_count"),
+            {"IT": 4, "HR": 2, None: 0})
+        self.assertEqual(
+            frame.group_sum("pos1_org_code", "completed_courses_count",
+                            mask=frame["department"].eq("IT")),
+            {"ORG1": 3, "ORG2": 1})
+
+        self.assertEqual(frame["pos1_org_code"].eq("ORG1").tolist(),
+                         [True, False, True, False])
+        self.assertEqual(frame["pos1_org_code"].eq(None).tolist(),
+                         [False, False, False, True])
+        self.assertFalse(frame["pos1_org_code"].eq("ORG3").any())
+        self.assertEqual(frame["department"].isin(["HR", "XX"]).tolist(),
+                         [False, False, True, False])
+        self.assertEqual(frame["department"].is_null().tolist(),
+                         [False, False, False, True])
+
+        it_frame = frame.filter(frame["department"].eq("IT"))
+        self.assertEqual(len(it_frame), 2)
+        self.assertEqual(it_frame["bridge_id"].tolist(), [1, 2])
+        self.assertEqual(it_frame["pos1_org_code"].to_list(),
+                         ["ORG1", "ORG2"])
+
+    def test_invalid_user(self):
+        bad_id = user_data(5, "IT")
+        bad_id["manager_id"] = "x"
+        no_uid = user_data(6, "IT")
+        del no_uid["uid"]
+        builder = RosterFrameBuilder(self.bridge_accs.custom_fields)
+        with self.assertLogs("uw_bridge.roster_frame", level="ERROR"):
+            builder.add_page({"users": [bad_id, no_uid, user_data(7, "HR")]})
+        frame = builder.build()
+        self.assertEqual(len(frame), 1)
+        self.assertEqual(frame["bridge_id"].tolist(), [7])
+        self.assertEqual(frame["netid"].to_list(), ["user7"])
+        self.assertEqual(frame["department"].to_list(), ["HR"])
+
+    def test_null_bools(self):
+        frame = self.get_frame()
+        # unsubscribed is not in the user data
+        self.assertEqual(frame["unsubscribed"].tolist(), [None] * 4)
+        self.assertEqual(frame["unsubscribed"].filled(False).tolist(),
+                         [False] * 4)
+        self.assertEqual(frame.row(0)["unsubscribed"], None)
+        self.assertEqual(frame.row(0)["is_manager"], True)
+        managers = frame.filter(frame["is_manager"].filled(False))
+        self.assertEqual(managers["bridge_id"].tolist(), [1])
+
+    def test_numpy_import(self):
+        # numpy is not imported along with uw_bridge.users
+        code = ("import sys, uw_bridge.users; "
+                "sys.exit('numpy' in sys.modules)")
+        root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+        self.assertEqual(
+            subprocess.call([sys.executable, "-c", code], cwd=root), 0)
@@ -0,0 +1,101 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+from unittest import TestCase
+from uw_bridge.models import BridgeCustomField, BridgeUser, BridgeUserRole
+from uw_bridge.roster_index import RosterIndex
+from uw_bridge.users import BridgeAccounts
+from uw_bridge.tests import fdao_bridge_override
+
+REGID = BridgeCustomField.REGID_NAME
+ORG_CODE = BridgeCustomField.POS1_ORG_CODE
+
+
+def new_user(bridge_id, netid, regid=None, org_code=None, manager_id=0,
+             roles=()):
+    user = BridgeUser(bridge_id=bridge_id, netid=netid,
+                      manager_id=manager_id)
+    for name, value in ((REGID, regid), (ORG_CODE, org_code)):
+        if value is not None:
+            user.custom_fields[name] = BridgeCustomField(
+                field_id="5", name=name, value=value)
+    for role_id in roles:
+        user.add_role(BridgeUserRole(role_id=role_id))
+    return user
+
+
+@fdao_bridge_override
+class TestRosterIndex(TestCase):
+
+    def test_load(self):
+        bridge = BridgeAccounts()
+        for records in (True, False):
+            index = RosterIndex.load(bridge, records=records)
+            self.assertEqual(len(index), 3)
+            self.assertEqual(index.get_user("javerage").bridge_id, 195)
+            self.assertEqual(index.get_user_by_id(106).netid, "eight")
+            self.assertIsNone(index.get_user("bill"))
+            self.assertTrue(17 in index)
+            self.assertEqual(
+                index.get_user_by_custom_field(
+                    REGID, "9136CCB8F66711D5BE060004AC494FFE").netid,
+                "javerage")
+            self.assertEqual(
+                [u.netid for u in index.get_users_by_role("author")],
+                ["javerage"])
+            self.assertEqual(len(index.get_values(REGID)), 3)
+            self.assertEqual(index.get_values(ORG_CODE), [])
+            self.assertEqual(sorted(u.bridge_id for u in index),
+                             [17, 106, 195])
+
+    def test_update(self):
+        index = RosterIndex([
+            new_user(1, "boss", regid="R1", org_code="IT", roles=["admin"]),
+            new_user(2, "staff", regid="R2", org_code="IT", manager_id=1),
+            new_user(3, "temp", org_code="HR", manager_id=1,
+                     roles=["author", "admin"])],
+            fields=[REGID, ORG_CODE])
+        self.assertEqual(
+            [u.netid for u in index.get_users_by_custom_field(
+                ORG_CODE, "IT")], ["boss", "staff"])
+        self.assertEqual([u.netid for u in index.get_reports(1)],
+                         ["staff", "temp"])
+        self.assertEqual(index.get_reports(2), [])
+        self.assertEqual(
+            [u.netid for u in index.get_users_by_role("admin")],
+            ["boss", "temp"])
+        self.assertIsNone(index.get_user_by_custom_field(REGID, "R3"))
+        self.assertRaises(KeyError, index.get_users_by_custom_field,
+                          BridgeCustomField.STUDENT_ID_NAME, "1")
+
+        # changed
+        staff = index.get_user("staff")
+        staff.update_custom_field(ORG_CODE, "HR")
+        staff.manager_id = 3
+        staff.add_role(BridgeUserRole(role_id="author"))
+        index.update(staff)
+        self.assertEqual(
+            [u.netid for u in index.get_users_by_custom_field(
+                ORG_CODE, "HR")], ["temp", "staff"])
+        self.assertEqual([u.netid for u in index.get_reports(1)], ["temp"])
+        self.assertEqual([u.netid for u in index.get_reports(3)], ["staff"])
+        self.assertEqual(len(index.get_users_by_role("author")), 2)
+        self.assertEqual(len(index), 3)
+
+        # deleted
+        temp = index.get_user_by_id(3)
+        self.assertIs(index.remove(3), temp)
+        self.assertIsNone(index.remove(3))
+        self.assertIsNone(index.get_user("temp"))
+        self.assertEqual(index.get_reports(1), [])
+        self.assertEqual(index.get_users_by_role("author"), [staff])
+        self.assertEqual(index.get_values(ORG_CODE), ["IT", "HR"])
+
+        # a new account taking over a netid
+        index.update(new_user(4, "staff", regid="R4"))
+        self.assertEqual(len(index), 2)
+        self.assertIsNone(index.get_user_by_id(2))
+        self.assertEqual(index.get_user("staff").bridge_id, 4)
+        self.assertIsNone(index.get_user_by_custom_field(REGID, "R2"))
+        self.assertEqual(index.get_user_by_custom_field(REGID, "R4"),
+                         index.get_user("staff"))
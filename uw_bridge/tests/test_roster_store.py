@@ -0,0 +1,135 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+from unittest import TestCase
+from unittest.mock import patch
+from uw_bridge.models import (
+    BridgeUser, BridgeUserRecord, BridgeCustomField)
+from uw_bridge.roster_store import RosterStore
+from uw_bridge import roster_store
+from uw_bridge.users import BridgeAccounts
+from uw_bridge.util import parse_date
+from uw_bridge.tests import fdao_bridge_override
+
+
+@fdao_bridge_override
+class TestRosterStore(TestCase):
+
+    def setUp(self):
+        self.bridge_accs = BridgeAccounts()
+        self.store = RosterStore(bridge=self.bridge_accs)
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_sync(self):
+        self.assertIsNone(self.store.get_watermark())
+        self.assertEqual(self.store.sync(includes=['custom_fields']),
+                         {"fetched": 3, "upserted": 3, "deleted": 0,
+                          "errors": 0})
+        self.assertEqual(self.store.count(), 3)
+        self.assertEqual(str(self.store.get_watermark()),
+                         "2016-08-08 13:58:20.635000-07:00")
+
+        self.assertEqual(self.store.sync(includes=['custom_fields']),
+                         {"fetched": 3, "upserted": 0, "deleted": 0,
+                          "errors": 0})
+        self.assertEqual(self.store.sync(includes=['custom_fields'], full=True,
+                                         prefetch=0),
+                         {"fetched": 3, "upserted": 3, "deleted": 0,
+                          "errors": 0})
+
+        self.store.upsert(BridgeUser(bridge_id=1, netid="gone"))
+        self.assertEqual(self.store.count(), 4)
+        counts = self.store.sync(includes=['custom_fields'])
+        self.assertEqual(counts["deleted"], 1)
+        self.assertIsNone(self.store.get_user("gone"))
+
+    def test_sync_partial(self):
+        users = [BridgeUserRecord(bridge_id=i, netid=netid,
+                                  updated_at=parse_date(updated_at))
+                 for i, netid, updated_at in (
+                     (1, "a", "2024-01-01T00:00:00-08:00"),
+                     (2, "b", "2024-02-01T00:00:00-08:00"))]
+
+        def crawl(skipped=None, error=False):
+            def iter_all_users(includes=None, prefetch=0, records=False,
+                               errors=None):
+                if error:
+                    errors.append((ValueError("invalid"), {"id": "1"}))
+                return iter([u for u in users if u.netid != skipped])
+            return patch.object(self.bridge_accs, "iter_all_users",
+                                side_effect=iter_all_users)
+
+        with crawl():
+            self.store.sync()
+        # "a" failed to decode: nothing is removed
+        with crawl(skipped="a", error=True):
+            counts = self.store.sync()
+        self.assertEqual(counts["errors"], 1)
+        self.assertEqual(counts["deleted"], 0)
+        self.assertIsNotNone(self.store.get_user("a"))
+
+        # "a" missing from the crawl: removed, then stored again
+        with crawl(skipped="a"):
+            self.assertEqual(self.store.sync()["deleted"], 1)
+        self.assertIsNone(self.store.get_user("a"))
+        with crawl():
+            counts = self.store.sync()
+        self.assertEqual(counts["upserted"], 1)
+        self.assertEqual(self.store.get_user("a").bridge_id, 1)
+
+    def test_read(self):
+        self.store.sync(includes=['custom_fields'])
+        users = self.bridge_accs.get_all_users(includes=['custom_fields'])
+        stored = list(self.store.iter_users())
+        self.assertEqual([u.bridge_id for u in stored], [17, 106, 195])
+        user = self.store.get_user("javerage")
+        self.assertEqual(str(user), str(users[1]))
+        self.assertEqual(str(self.store.get_user_by_id(106)), str(users[0]))
+        self.assertIsNone(self.store.get_user_by_id(1))
+
+        self.assertEqual(
+            [u.netid for u in self.store.get_users_by_custom_field(
+                BridgeCustomField.REGID_NAME,
+                "9136CCB8F66711D5BE060004AC494FFE")], ["javerage"])
+
+    def test_select_batch(self):
+        self.store.sync(includes=['custom_fields'])
+        users = [str(u) for u in self.store.iter_users()]
+        statements = []
+        self.store.conn.set_trace_callback(statements.append)
+        with patch.object(roster_store, "BATCH_SIZE", 2):
+            self.assertEqual([str(u) for u in self.store.iter_users()],
+                             users)
+        self.store.conn.set_trace_callback(None)
+        # the users, then the values and roles of each batch of users
+        self.assertEqual(len(statements), 1 + 2 * 2)
+        self.assertEqual(len(self.store.get_user("javerage").roles), 3)
+
+    def test_upsert(self):
+        user = self.bridge_accs.get_user("javerage")
+        self.store.upsert(user)
+        record = self.store.get_user("javerage")
+        self.assertEqual(str(record), str(user))
+        self.assertEqual(len(record.custom_fields), 8)
+        self.assertEqual(record.get_role_ids(),
+                         ["account_admin", "author", "fb412e52"])
+        self.assertEqual(record.updated_at,
+                         parse_date("2016-07-25T16:24:42.131-07:00"))
+        self.assertFalse(record.is_manager)
+
+        user.bridge_id = 196
+        user.update_custom_field(BridgeCustomField.REGID_NAME, "1")
+        user.roles = user.roles[:1]
+        self.store.upsert(user)
+        self.assertEqual(self.store.count(), 1)
+        record = self.store.get_user("javerage")
+        self.assertEqual(record.bridge_id, 196)
+        self.assertEqual(record.get_custom_field_value("regid"), "1")
+        self.assertEqual(record.get_role_ids(), ["account_admin"])
+
+        self.store.delete(196)
+        self.assertEqual(self.store.count(), 0)
+        self.assertEqual(self.store.conn.execute(
+            "SELECT COUNT(*) FROM custom_field_values").fetchone()[0], 0)
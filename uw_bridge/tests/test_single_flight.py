@@ -0,0 +1,115 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+import threading
+import time
+from unittest import TestCase
+from unittest.mock import patch
+from restclients_core.exceptions import DataFailureException
+from uw_bridge.single_flight import SingleFlight, get_single_flight
+from uw_bridge.users import BridgeAccounts
+from uw_bridge.tests import fdao_bridge_override, flight_override
+
+
+def wait_for(condition, timeout=5):
+    # poll until the callers have joined the call in flight
+    end = time.monotonic() + timeout
+    while not condition() and time.monotonic() < end:
+        time.sleep(0.001)
+
+
+def run_threads(count, target):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(target()))
+               for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+@fdao_bridge_override
+class TestSingleFlight(TestCase):
+
+    def test_get_single_flight(self):
+        self.assertIsNone(BridgeAccounts().single_flight)
+        with flight_override:
+            bridge = BridgeAccounts()
+            self.assertTrue(
+                bridge.single_flight is get_single_flight(bridge.dao))
+
+    def test_do(self):
+        flight = SingleFlight()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            wait_for(lambda: flight.coalesced == 7)
+            return "data"
+
+        results = run_threads(8, lambda: flight.do("/a", fn))
+        self.assertEqual(results, ["data"] * 8)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight.get_stats(),
+                         {"requests": 1, "coalesced": 7, "in_flight": 0})
+
+        # done calls are not reused
+        self.assertEqual(flight.do("/a", lambda: "new"), "new")
+        self.assertEqual(flight.get_stats()["requests"], 2)
+
+    def test_do_error(self):
+        flight = SingleFlight()
+
+        def fn():
+            wait_for(lambda: flight.coalesced == 3)
+            raise DataFailureException("/a", 503, "")
+
+        def call():
+            try:
+                return flight.do("/a", fn)
+            except DataFailureException as ex:
+                return ex.status
+
+        self.assertEqual(run_threads(4, call), [503] * 4)
+        self.assertEqual(flight.get_stats()["in_flight"], 0)
+
+    def test_get_user(self):
+        with flight_override:
+            bridge = BridgeAccounts()
+            bridge.load_metadata()
+            flight = bridge.single_flight
+            requests = flight.requests
+            coalesced = flight.coalesced
+            get_response = bridge._get_response
+
+            def slow_response(method, url, headers, body):
+                wait_for(lambda: flight.coalesced - coalesced == 5)
+                return get_response(method, url, headers, body)
+
+            with patch.object(bridge, "_get_response",
+                              side_effect=slow_response) as mock:
+                users = run_threads(6, lambda: bridge.get_user("javerage"))
+                self.assertEqual(mock.call_count, 1)
+            self.assertEqual(flight.requests - requests, 1)
+            self.assertEqual(flight.coalesced - coalesced, 5)
+            self.assertEqual([u.bridge_id for u in users], [195] * 6)
+            # each caller gets its own BridgeUser
+            self.assertEqual(len(set(id(u) for u in users)), 6)
+
+            # keyed on the request, not on the shared header dicts
+            with patch.object(flight, "do", wraps=flight.do) as do:
+                bridge.get_user("javerage")
+                self.assertEqual(do.call_args[0][0][:2], (
+                    "GET", "/api/author/users/uid%3Ajaverage%40uw%2Eedu"
+                    "?includes%5B%5D=custom_fields&includes%5B%5D="
+                    "course_summary&includes%5B%5D=manager"))
+            self.assertEqual(bridge.GHEADER, {'Accept': 'application/json'})
+            requests += 1
+
+            # the other requests are not coalesced
+            with patch.object(bridge, "_get_response",
+                              wraps=bridge._get_response) as mock:
+                self.assertTrue(bridge.delete_user_by_id(195))
+                self.assertEqual(mock.call_count, 1)
+            self.assertEqual(flight.requests - requests, 1)
@@ -0,0 +1,113 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+from unittest import TestCase
+from unittest.mock import patch
+from restclients_core.exceptions import DataFailureException
+from uw_bridge.stream import UsersPageParser
+from uw_bridge.users import BridgeAccounts
+from uw_bridge.tests import fdao_bridge_override
+
+
+PAGE = {"meta": {"next": "/api/author/users?after=1"},
+        "linked": {"custom_field_values": [
+            {"id": "1", "value": "v",
+             "links": {"custom_field": {"id": "5"}}}]},
+        "users": [{"id": "1", "uid": "a@uw.edu", "links": {
+                       "custom_field_values": ["1"]}},
+                  {"id": "2", "uid": "b@uw.edu", "roles": ["author"]}]}
+
+
+@fdao_bridge_override
+class TestUsersPageParser(TestCase):
+
+    def parse(self, text):
+        parser = UsersPageParser(text)
+        users = []
+        for user_data in parser:
+            # linked is known before the first user
+            self.assertEqual(parser.linked, PAGE["linked"])
+            users.append(user_data)
+        return parser, users
+
+    def test_orders(self):
+        for keys in (["meta", "linked", "users"], ["users", "linked", "meta"],
+                     ["linked", "users", "meta"]):
+            page = {key: PAGE[key] for key in keys}
+            for text in (json.dumps(page), json.dumps(page, indent=2),
+                         json.dumps(page).encode()):
+                parser, users = self.parse(text)
+                self.assertEqual(users, PAGE["users"])
+                self.assertEqual(parser.fields["meta"], PAGE["meta"])
+
+    def test_deferred(self):
+        page = {"users": PAGE["users"] + [
+                    {"id": "3", "uid": "c@uw.edu", "is_manager": True,
+                     "full_name": "C \\\"[{D}]\" ", "manager_id": None,
+                     "completed_courses_count": -1.5e3}],
+                "linked": PAGE["linked"]}
+        for text in (json.dumps(page), json.dumps(page).encode()):
+            parser = UsersPageParser(text)
+            self.assertIs(parser.text, text)
+            with patch("uw_bridge.stream.json.loads",
+                       wraps=json.loads) as loads:
+                users = list(parser)
+            self.assertEqual(users, page["users"])
+            # each user decoded once
+            self.assertEqual(loads.call_count, len(users))
+
+    def test_window(self):
+        page = {"count": 123456789,
+                "linked": PAGE["linked"],
+                "users": [{"id": "1", "uid": "a@uw.edu",
+                           "full_name": "\u00c9lodie \u6771\u4eac " * 20},
+                          {"id": "2", "uid": "b@uw.edu"}]}
+        for text in (json.dumps(page).encode(),
+                     json.dumps(page, ensure_ascii=False).encode("utf-8")):
+            for window in (1, 5, 8, 4096):
+                parser = UsersPageParser(text)
+                parser.window = window
+                self.assertEqual(list(parser), page["users"])
+                self.assertEqual(parser.fields["count"], 123456789)
+
+    def test_empty(self):
+        for text in ('{}', ' { } ', '{"users": []}', '{"users":null}',
+                     '{"meta": {}, "users": [ ]}'):
+            self.assertEqual(list(UsersPageParser(text)), [])
+        parser = UsersPageParser('{"users":[{"id":"1"}]}')
+        self.assertEqual(list(parser), [{"id": "1"}])
+        self.assertEqual(parser.linked, {})
+
+    def test_invalid(self):
+        for text in ('[]', '{"users": [{"id": "1"} {"id": "2"}]}',
+                     '{"users" [] }', '{"users": [{"id": "1"}',
+                     '{"users": [{"id": "1"', b'{"users": [{"id": "1}]}',
+                     b'{"users": ]}'):
+            self.assertRaises((ValueError, IndexError), list,
+                              UsersPageParser(text))
+
+    def test_stream_users(self):
+        bridge = BridgeAccounts()
+        for records in (False, True):
+            users = bridge.get_all_users(includes=['custom_fields'],
+                                         records=records)
+            streamed = bridge.get_all_users(includes=['custom_fields'],
+                                            records=records, stream=True)
+            self.assertEqual([str(u) for u in streamed],
+                             [str(u) for u in users])
+        self.assertEqual(
+            [u.bridge_id for u in bridge.iter_all_users(
+                role_id='author', stream=True)],
+            [u.bridge_id for u in bridge.get_all_users(role_id='author')])
+
+        # an invalid user is skipped
+        users = list(bridge._iter_stream_resp_data(
+            b'{"users": [{"id": "1", "uid": "a@uw.edu"}, {"id": "x"}], '
+            b'"linked": {}}', "/api/author/users"))
+        self.assertEqual([u.netid for u in users], ["a"])
+        # a malformed page is not
+        with self.assertRaises(DataFailureException) as cm:
+            list(bridge._iter_stream_resp_data(
+                '{"users": [', "/api/author/users"))
+        self.assertEqual(cm.exception.url, "/api/author/users")
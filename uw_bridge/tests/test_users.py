@@ -1,13 +1,16 @@
 # Copyright 2024 UW-IT, University of Washington
 # SPDX-License-Identifier: Apache-2.0
 
+import threading
+from types import GeneratorType
 from unittest import TestCase
 from restclients_core.exceptions import DataFailureException
-from uw_bridge.models import BridgeUser, BridgeCustomField
+from uw_bridge.models import BridgeUser, BridgeCustomField, BridgeUserRecord
 from uw_bridge.users import (
     BridgeAccounts, ADMIN_URL_PREFIX, AUTHOR_URL_PREFIX, admin_id_url,
     author_id_url, admin_uid_url, author_uid_url,
-    includes_to_query_params, get_all_users_url, restore_user_url)
+    includes_to_query_params, get_all_users_url, restore_user_url,
+    next_page_url, PagePrefetcher)
 from uw_bridge.tests import fdao_bridge_override
 
 
@@ -55,6 +58,11 @@ class TestBridgeAccounts(TestCase):
             "/api/author/users?includes%5B%5D=custom_fields&" +
             "includes%5B%5D=course_summary&role=author&limit=1000")
 
+    def test_next_page_url(self):
+        self.assertIsNone(next_page_url({}))
+        self.assertIsNone(next_page_url({"meta": {}}))
+        self.assertEqual(next_page_url({"meta": {"next": "/api"}}), "/api")
+
     def test_restore_user_url(self):
         self.assertEqual(
             restore_user_url(""),
@@ -267,6 +275,76 @@ class TestBridgeAccounts(TestCase):
         self.assertTrue(user_list[0].roles[1].is_author())
         self.assertTrue(user_list[0].roles[2].is_campus_admin())
 
+    def test_iter_all_users(self):
+        users = self.bridge_accs.iter_all_users(includes=['custom_fields'])
+        self.assertTrue(isinstance(users, GeneratorType))
+        user = next(users)
+        self.assertEqual(user.bridge_id, 106)
+        self.assertEqual([u.bridge_id for u in users], [195, 17])
+
+        self.assertEqual(
+            [u.bridge_id for u in self.bridge_accs.iter_all_users(
+                role_id='author')],
+            [u.bridge_id for u in self.bridge_accs.get_all_users(
+                role_id='author')])
+
+    def test_get_all_user_records(self):
+        records = self.bridge_accs.get_all_users(
+            includes=['custom_fields'], records=True)
+        users = self.bridge_accs.get_all_users(includes=['custom_fields'])
+        self.assertEqual(len(records), 3)
+        for record, user in zip(records, users):
+            self.assertTrue(isinstance(record, BridgeUserRecord))
+            self.assertEqual(str(record), str(user))
+            self.assertEqual(str(record.to_bridge_user()), str(user))
+
+        records = self.bridge_accs.get_all_users(role_id='author',
+                                                 records=True)
+        self.assertEqual(records[0].roles,
+                         (("account_admin", "Account Admin"),
+                          ("author", "Author"),
+                          ("fb412e52", "Campus Admin")))
+
+    def test_get_all_users_intern(self):
+        for records in (False, True):
+            users = self.bridge_accs.get_all_users(
+                includes=['custom_fields'], records=records)
+            interned = self.bridge_accs.get_all_users(
+                includes=['custom_fields'], records=records, intern=True)
+            self.assertEqual([str(u) for u in interned],
+                             [str(u) for u in users])
+            self.assertIs(interned[0].locale, interned[1].locale)
+
+    def test_iter_all_users_prefetch(self):
+        for depth in [1, 2]:
+            users = self.bridge_accs.get_all_users(
+                includes=['custom_fields'], prefetch=depth)
+            self.assertEqual([u.bridge_id for u in users], [106, 195, 17])
+            self.assertEqual(
+                users[1].get_custom_field(BridgeCustomField.REGID_NAME).value,
+                "9136CCB8F66711D5BE060004AC494FFE")
+
+        users = self.bridge_accs.iter_all_users(prefetch=1)
+        self.assertEqual(next(users).bridge_id, 106)
+        users.close()
+
+        users = self.bridge_accs._iter_json_resp_data(
+            b'{"meta":{"next":"/api/author/users/none"},"users":[]}',
+            prefetch=1)
+        self.assertRaises(DataFailureException, list, users)
+
+    def test_page_prefetcher(self):
+        pages = PagePrefetcher(
+            self.bridge_accs,
+            b'{"meta":{"next":"/api/author/users?after=xxx&' +
+            b'includes%5B%5D="},"users":[]}', 1)
+        self.assertEqual(pages.next_page()["users"], [])
+        self.assertEqual(len(pages.next_page()["users"]), 1)
+        self.assertIsNone(pages.next_page())
+        self.assertIsNone(pages.next_page())
+        pages.thread.join(1)
+        self.assertFalse(pages.thread.is_alive())
+
     def test_add_user(self):
         regid = "12345678901234567890123456789012"
         cus_fie = self.bridge_accs.custom_fields.new_custom_field(
@@ -292,6 +370,54 @@ class TestBridgeAccounts(TestCase):
         self.assertEqual(
             str(added.updated_at), '2016-09-06 21:42:48.821000-07:00')
 
+    def test_bulk_upsert(self):
+        bill = self.bridge_accs.get_user_by_id(17637, include_deleted=True)
+        javerage = self.bridge_accs.get_user('javerage')
+        eight = BridgeUser(netid="eight",
+                           full_name="Eight Class Student",
+                           first_name="Eight Class",
+                           last_name="Student",
+                           email="eight@uw.edu")
+        results = self.bridge_accs.bulk_upsert([bill, javerage, eight],
+                                               concurrency=2)
+        self.assertEqual(len(results), 3)
+        self.assertTrue(results[0].is_success())
+        self.verify_bill(results[0].user)
+        self.assertFalse(results[1].is_success())
+        self.assertEqual(results[1].item, javerage)
+        self.assertEqual(results[1].error.status, 404)
+        self.assertIsNone(results[1].user)
+        self.assertIsNotNone(str(results[1]))
+        self.assertTrue(results[2].is_success())
+        self.assertEqual(results[2].user.bridge_id, 123)
+
+    def test_bulk_delete(self):
+        results = self.bridge_accs.bulk_delete(["javerage", "staff"])
+        self.assertTrue(results[0].is_success())
+        self.assertEqual(results[0].item, "javerage")
+        self.assertFalse(results[1].is_success())
+        self.assertEqual(results[1].error.status, 404)
+
+    def test_run_bulk(self):
+        def action(netid):
+            if netid == "none":
+                raise ValueError(netid)
+            return netid.upper()
+        results = self.bridge_accs.run_bulk(action, ["a", "none", "b"],
+                                            concurrency=2)
+        self.assertEqual([r.user for r in results], ["A", None, "B"])
+        self.assertIsInstance(results[1].error, ValueError)
+
+    def test_bulk_update_roles(self):
+        buser = self.bridge_accs.get_user_by_id(17637,
+                                                include_deleted=True)
+        buser.add_role(self.bridge_accs.user_roles.new_author_role())
+        other = BridgeUser(bridge_id=1, netid="none")
+        results = self.bridge_accs.bulk_update_roles([buser, other])
+        self.assertTrue(results[0].is_success())
+        self.verify_bill(results[0].user)
+        self.assertFalse(results[1].is_success())
+
     def test_delete_user(self):
         self.assertTrue(self.bridge_accs.delete_user("javerage"))
         self.assertTrue(self.bridge_accs.delete_user_by_id(195))
@@ -300,6 +426,83 @@ class TestBridgeAccounts(TestCase):
         except Exception as ex:
             self.assertEqual(ex.status, 404)
 
+    def test_lazy_metadata(self):
+        bridge = BridgeAccounts()
+        self.assertIsNone(bridge._custom_fields)
+        self.assertIsNone(bridge._user_roles)
+        self.assertTrue(bridge.delete_user("javerage"))
+        self.assertIsNone(bridge._custom_fields)
+
+        users = []
+        threads = [threading.Thread(
+            target=lambda: users.append(bridge.get_user("javerage")))
+            for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(users), 4)
+        cfs = bridge.custom_fields
+        self.assertEqual(cfs.get_field_id(BridgeCustomField.REGID_NAME), "5")
+        self.assertTrue(bridge.load_metadata()[0] is cfs)
+
+        bridge = BridgeAccounts(prefetch_metadata=True)
+        self.assertEqual(len(bridge.user_roles.get_roles()), 5)
+        self.assertEqual(len(bridge.custom_fields.get_fields()), 17)
+
+    def test_refresh_metadata(self):
+        bridge = BridgeAccounts()
+        cfs, roles = bridge.load_metadata()
+        new_cfs, new_roles = bridge.refresh_metadata()
+        self.assertIsNot(new_cfs, cfs)
+        self.assertIsNot(new_roles, roles)
+        self.assertIs(bridge.custom_fields, new_cfs)
+        self.assertIs(bridge.user_roles, new_roles)
+        # the replaced ones are left as they were
+        self.assertEqual(len(cfs.get_fields()), 17)
+        self.assertEqual(len(new_cfs.get_fields()), 17)
+        self.assertEqual(len(roles.get_roles()), 5)
+
+    def test_shared_client(self):
+        bridge = BridgeAccounts()
+        expected = [u.to_json() for u in bridge.get_all_users(
+            includes=['custom_fields'])]
+        errors = []
+
+        def work(index):
+            try:
+                for i in range(5):
+                    if index % 4 == 0:
+                        bridge.refresh_metadata()
+                    elif index % 4 == 1:
+                        user = bridge.get_user("javerage")
+                        if (user.bridge_id != 195 or
+                                user.get_custom_field_value(
+                                    BridgeCustomField.REGID_NAME) !=
+                                "9136CCB8F66711D5BE060004AC494FFE"):
+                            errors.append(user.to_json())
+                    elif index % 4 == 2:
+                        user = bridge.get_user_by_id(17637,
+                                                     include_deleted=True)
+                        if user.netid != "bill":
+                            errors.append(user.to_json())
+                    else:
+                        users = [u.to_json() for u in bridge.get_all_users(
+                            includes=['custom_fields'])]
+                        if users != expected:
+                            errors.append(users)
+            except Exception as ex:
+                errors.append(ex)
+
+        threads = [threading.Thread(target=work, args=(i,))
+                   for i in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertFalse(hasattr(bridge, "req_url"))
+
     def test_upd_uid_req_body(self):
         self.assertEqual(self.bridge_accs._upd_uid_req_body("netid"),
                          '{"user":{"uid":"netid@uw.edu"}}')
@@ -373,6 +576,51 @@ class TestBridgeAccounts(TestCase):
         self.assertRaises(DataFailureException,
                           self.bridge_accs.update_user, orig_user)
 
+    def test_update_user_changes_only(self):
+        bridge = BridgeAccounts()
+        bridge.patch_resource = None   # no request is sent
+        orig_user = bridge.get_user_by_id(17637, include_deleted=True)
+        self.assertIsNotNone(orig_user.original)
+        self.assertFalse(orig_user.has_changes())
+        self.assertIs(bridge.update_user(orig_user, changes_only=True),
+                      orig_user)
+        self.assertIs(bridge.upsert_user(orig_user, changes_only=True),
+                      orig_user)
+        results = bridge.bulk_upsert([orig_user], changes_only=True)
+        self.assertIs(results[0].user, orig_user)
+
+        bodies = []
+
+        def patch_resource(url, body):
+            bodies.append(body)
+            return self.bridge_accs.patch_resource(url, body)
+        bridge.patch_resource = patch_resource
+        orig_user.job_title = "Teacher"
+        upded_user = bridge.update_user(orig_user, changes_only=True)
+        self.verify_bill(upded_user)
+        self.assertEqual(
+            bodies, ['{"user":{"uid":"bill@uw.edu","id":17637,'
+                     '"job_title":"Teacher"}}'])
+
+        # a renamed netid only
+        orig_user = bridge.get_user_by_id(17637, include_deleted=True)
+        orig_user.netid = "billy"
+        bridge.update_user(orig_user, changes_only=True)
+        self.assertEqual(bodies[1],
+                         '{"user":{"uid":"billy@uw.edu","id":17637}}')
+
+        users = bridge.get_all_users(includes=['custom_fields'])
+        users += bridge.get_all_users(includes=['custom_fields'],
+                                      stream=True)
+        for user in users:
+            self.assertFalse(user.has_changes())
+        users[0].update_custom_field("regid", "0")
+        self.assertEqual(
+            users[0].to_json_patch(changes_only=True)["user"][
+                "custom_field_values"],
+            [{"custom_field_id": "5", "id": users[0].get_custom_field(
+                "regid").value_id, "value": "0"}])
+
     def verify_uid(self, user):
         self.assertEqual(user.bridge_id, 17637)
         self.assertEqual(user.get_uid(), "bill@uw.edu")
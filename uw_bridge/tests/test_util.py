@@ -2,7 +2,8 @@
 # SPDX-License-Identifier: Apache-2.0
 
 from unittest import TestCase
-from uw_bridge.util import parse_date
+from dateutil.parser import parse
+from uw_bridge.util import parse_date, date_to_str
 
 
 class TestUtil(TestCase):
@@ -11,3 +12,24 @@ class TestUtil(TestCase):
         self.assertIsNone(parse_date(None))
         self.assertEqual(str(parse_date("2019-07-23T14:06:01.250-07:00")),
                          "2019-07-23 14:06:01.250000-07:00")
+
+        for date_str in ["2016-08-02T14:36:17.082-07:00",
+                         "2016-08-12T00:00:00.000-07:00",
+                         "2016-08-12T00:00:00-07:00",
+                         "2016-08-12T00:00:00+00:00",
+                         "2016-08-12T00:00:00",
+                         "2016-08-12",
+                         "2016-08-02T14:36:17Z",
+                         "Aug 2 2016 14:36:17"]:
+            self.assertEqual(parse_date(date_str), parse(date_str))
+            self.assertEqual(date_to_str(parse_date(date_str)),
+                             date_to_str(parse(date_str)))
+        self.assertTrue(parse_date("2016-08-12T00:00:00.000-07:00") is
+                        parse_date("2016-08-12T00:00:00.000-07:00"))
+        self.assertRaises(ValueError, parse_date, "none")
+
+    def test_date_to_str(self):
+        self.assertIsNone(date_to_str(None))
+        self.assertEqual(
+            date_to_str(parse_date("2016-08-12T00:00:00.000-07:00")),
+            "2016-08-12T00:00:00-07:00")
@@ -4,10 +4,12 @@
 """
 Interacte with Bridge user roles API.
 You only need a single UserRoles object in your app.
+A UserRoles object is not changed once loaded, so it can be shared
+across threads; reload by creating a new one.
 """
 
 import logging
-import json
+from uw_bridge import codec
 from uw_bridge.models import BridgeUserRole
 
 
@@ -17,25 +19,40 @@ URL = "/api/author/roles"
 
 class UserRoles:
 
-    def __init__(self, bridge):
+    def __init__(self, bridge, resp=None):
+        """
+        :param resp: the roles response data if it has been requested already
+        """
         self.bridge = bridge
         self.roles = []
         self.id_name_map = {}
         self.name_ip_map = {}
-        self.get_user_roles()
+        if resp is None:
+            self.get_user_roles()
+        else:
+            self._load_user_roles(resp)
 
     def get_user_roles(self):
-        resp = self.bridge.get_resource(URL)
-        resp_data = json.loads(resp)
+        self._load_user_roles(self.bridge.get_metadata_resource(URL))
+
+    def _load_user_roles(self, resp):
+        # build the maps aside, then replace the loaded ones
+        resp_data = codec.loads(resp)
+        roles = []
+        id_name_map = {}
+        name_ip_map = {}
         if resp_data.get("roles") is not None:
             for role in resp_data["roles"]:
                 if (role.get("is_deprecated") is False or
                         role.get("is_deprecated") is None):
                     cf = BridgeUserRole(role_id=role.get("id"),
                                         name=role.get("name"))
-                    self.roles.append(cf)
-                    self.id_name_map[cf.role_id] = cf.name
-                    self.name_ip_map[cf.name] = cf.role_id
+                    roles.append(cf)
+                    id_name_map[cf.role_id] = cf.name
+                    name_ip_map[cf.name] = cf.role_id
+        self.roles = roles
+        self.id_name_map = id_name_map
+        self.name_ip_map = name_ip_map
 
     def get_roles(self):
         """
@@ -6,13 +6,20 @@ Interacte with Bridge Users API.
 You only need a single Users object in your app.
 """
 
-import json
 import logging
 import re
-from uw_bridge.custom_fields import CustomFields
-from uw_bridge.models import BridgeUser
-from uw_bridge.user_roles import UserRoles
-from uw_bridge.util import parse_date
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from queue import Queue, Empty, Full
+from restclients_core.exceptions import DataFailureException
+from uw_bridge import codec
+from uw_bridge.custom_fields import CustomFields, URL as CUSTOM_FIELDS_URL
+from uw_bridge.page_decoder import Interner, PageDecoder
+from uw_bridge.response_cache import get_response_cache
+from uw_bridge.stream import UsersPageParser
+from uw_bridge.user_roles import UserRoles, URL as USER_ROLES_URL
 from uw_bridge import Bridge
 
 
@@ -69,17 +76,330 @@ def get_all_users_url(includes, role_id):
     return "{0}&limit={1}".format(url, PAGE_MAX_ENTRY)
 
 
+def get_user_url(uwnetid, include_deleted=False):
+    url = "{0}?{1}".format(author_uid_url(uwnetid),
+                           includes_to_query_params(GET_USER_INCLUDES))
+    if include_deleted:
+        url = "{0}&{1}".format(url, "with_deleted=true")
+    return url
+
+
+def get_user_by_id_url(bridge_id, include_deleted=False):
+    url = "{0}?{1}".format(author_id_url(bridge_id),
+                           includes_to_query_params(GET_USER_INCLUDES))
+    if include_deleted:
+        url = "{0}&{1}".format(url, "with_deleted=true")
+    return url
+
+
+def update_user_url(bridge_user):
+    if bridge_user.has_bridge_id():
+        return author_id_url(bridge_user.bridge_id)
+    return author_uid_url(bridge_user.netid)
+
+
+def update_user_roles_url(bridge_user):
+    if bridge_user.has_bridge_id():
+        url = admin_id_url(bridge_user.bridge_id)
+    else:
+        url = admin_uid_url(bridge_user.netid)
+    return "{0}/roles/batch".format(url)
+
+
 def restore_user_url(base_url):
     return "{0}/{1}?{2}".format(base_url, RESTORE_SUFFIX,
                                 includes_to_query_params(RESTORE_INCLUDES))
 
 
-class BridgeAccounts(Bridge):
+def next_page_url(resp_data):
+    """
+    Return the meta.next link of a decoded page or None
+    """
+    if (resp_data.get("meta") is not None and
+            resp_data["meta"].get("next") is not None):
+        return resp_data["meta"]["next"]
+    return None
+
+
+class PageReader(object):
+    """
+    Decode the pages of a paged response one at a time,
+    requesting the next page only when it is asked for.
+    """
+
+    def __init__(self, bridge, resp):
+        self.bridge = bridge
+        self.resp = resp
+        self.link_url = None
+
+    def next_page(self):
+        """
+        Return the next decoded page or None if there are no more pages
+        """
+        if self.resp is None:
+            if self.link_url is None:
+                return None
+            self.resp = self.bridge.get_resource(self.link_url)
+        resp_data = self.bridge._decode_page(self.resp)
+        self.resp = None
+        self.link_url = next_page_url(resp_data)
+        return resp_data
+
+    def close(self):
+        self.resp = self.link_url = None
+
+
+class PagePrefetcher(PageReader):
+    """
+    Request and decode the following pages on a background thread
+    while the caller is processing the current one.
+    At most `depth` decoded pages are queued ahead of the caller.
+    """
+    _END = object()
+    PUT_WAIT = 0.5
+
+    def __init__(self, bridge, resp, depth):
+        super(PagePrefetcher, self).__init__(bridge, resp)
+        self.queue = Queue(maxsize=max(int(depth), 1))
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True,
+                                       name="bridge-page-prefetch")
+        self.thread.start()
+
+    def _run(self):
+        try:
+            while not self.stopped.is_set():
+                resp_data = super(PagePrefetcher, self).next_page()
+                if resp_data is None:
+                    break
+                self._put(resp_data)
+        except Exception as ex:
+            self._put(ex)
+        self._put(self._END)
+
+    def _put(self, item):
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=self.PUT_WAIT)
+                return
+            except Full:
+                pass
+
+    def next_page(self):
+        if self.stopped.is_set():
+            return None
+        item = self.queue.get()
+        if item is self._END:
+            self.stopped.set()
+            return None
+        if isinstance(item, Exception):
+            self.close()
+            raise item
+        return item
+
+    def close(self):
+        self.stopped.set()
+        try:
+            while True:
+                self.queue.get_nowait()
+        except Empty:
+            pass
+
+
+class BulkResult(object):
+    """
+    The outcome of one item of a bulk request
+    """
 
-    def __init__(self):
+    def __init__(self, item, user=None, error=None):
+        self.item = item    # the given BridgeUser or uwnetid
+        self.user = user    # the BridgeUser returned by Bridge
+        self.error = error  # the exception raised, i.e. DataFailureException
+
+    def is_success(self):
+        return self.error is None
+
+    def __str__(self):
+        return "{0}: {1}".format(
+            self.item, "OK" if self.is_success() else self.error)
+
+
+class BridgeUsersMixin(object):
+    """
+    The user data processing shared by BridgeAccounts and
+    uw_bridge.aio.AsyncBridgeAccounts.
+    Expects the custom_fields, user_roles and response_cache attributes.
+    """
+
+    def _upd_uid_req_body(self, new_uwnetid):
+        return "{0}{1}@uw.edu{2}".format(
+            '{"user":{"uid":"', new_uwnetid, '"}}')
+
+    def _invalidate_user(self, bridge_id=None, uwnetid=None):
+        if self.response_cache is not None:
+            tags = self._user_tags(bridge_id, uwnetid)
+            if tags:
+                self.response_cache.invalidate(*tags)
+
+    def _user_tags(self, bridge_id, uwnetid):
+        # the keys of the cached responses of a user
+        tags = []
+        if bridge_id is not None:
+            tags.append(("id", int(bridge_id)))
+        if uwnetid is not None:
+            tags.append(("uid", re.sub('@uw.edu', '', uwnetid)))
+        return tags
+
+    def _decode_page(self, resp):
+        if self.metrics is None:
+            return codec.loads(resp)
+        start = time.perf_counter()
+        resp_data = codec.loads(resp)
+        self.metrics.record_phase("decode", time.perf_counter() - start)
+        return resp_data
+
+    def _process_page(self, resp_data, records=False, interner=None,
+                      errors=None):
+        """
+        Return the list of BridgeUser in a decoded page
+        :param errors: a list to append the (exception, data) of the
+         invalid page or users to, or None
+        """
+        if self.metrics is not None:
+            start = time.perf_counter()
+        page_users = []
+        try:
+            page_users = self._process_apage(
+                resp_data, page_users, records=records, interner=interner,
+                errors=errors)
+        except Exception as err:
+            logger.error("{0} in {1}".format(str(err), resp_data))
+            if errors is not None:
+                errors.append((err, resp_data))
+        if self.metrics is not None:
+            self.metrics.record_phase(
+                "build", time.perf_counter() - start, len(page_users))
+        return page_users
+
+    def _process_apage(self, resp_data, bridge_users, records=False,
+                       interner=None, errors=None):
+        """
+        :param records: True to get BridgeUserRecord objects
+        :param interner: the page_decoder.Interner of the bulk read or None
+        """
+        decoder = PageDecoder(self.custom_fields, self.user_roles,
+                              resp_data.get("linked"), records=records,
+                              interner=interner, errors=errors)
+        return decoder.decode(resp_data.get("users"), bridge_users)
+
+    def _process_page_stream(self, parser, url, records=False,
+                             interner=None, errors=None):
+        """
+        Yield the BridgeUser objects of a users page
+        as they are decoded by the stream.UsersPageParser.
+        The invalid users are skipped.
+        :except DataFailureException: if the page of the url is malformed
+        """
+        decoder = None
+        try:
+            for user_data in parser:
+                if decoder is None:
+                    decoder = PageDecoder(
+                        self.custom_fields, self.user_roles, parser.linked,
+                        records=records, interner=interner, errors=errors)
+                user = decoder.decode_user(user_data)
+                user_data = None
+                if user is not None:
+                    yield user
+        except (ValueError, IndexError, KeyError, TypeError) as err:
+            raise DataFailureException(
+                url, 200, "{0} in the users page".format(str(err)))
+
+    def _get_obj_from_list(self, action, rlist):
+        if len(rlist) == 0:
+            return None
+
+        if len(rlist) > 1:
+            logger.error(
+                "{0} returns multiple Bridge user accounts: {1}".format(
+                    action, [u.to_json() for u in rlist]))
+        return rlist[0]
+
+
+class BridgeAccounts(BridgeUsersMixin, Bridge):
+    """
+    The custom fields and user roles are loaded on the first use,
+    so the requests that don't need them never wait for them.
+    A BridgeAccounts object holds no per-request state and can be shared
+    by the threads of a process.
+    """
+
+    def __init__(self, prefetch_metadata=False):
+        """
+        :param prefetch_metadata: if True, load the custom fields and
+         user roles on a background thread right away
+        """
         super(BridgeAccounts, self).__init__()
-        self.custom_fields = CustomFields(self)
-        self.user_roles = UserRoles(self)
+        self._custom_fields = None
+        self._user_roles = None
+        self._metadata_lock = threading.Lock()
+        self.response_cache = get_response_cache(self.dao)
+        if prefetch_metadata:
+            threading.Thread(target=self._prefetch_metadata,
+                             daemon=True).start()
+
+    @property
+    def custom_fields(self):
+        if self._custom_fields is None:
+            with self._metadata_lock:
+                if self._custom_fields is None:
+                    self._custom_fields = CustomFields(self)
+        return self._custom_fields
+
+    @custom_fields.setter
+    def custom_fields(self, custom_fields):
+        self._custom_fields = custom_fields
+
+    @property
+    def user_roles(self):
+        if self._user_roles is None:
+            with self._metadata_lock:
+                if self._user_roles is None:
+                    self._user_roles = UserRoles(self)
+        return self._user_roles
+
+    @user_roles.setter
+    def user_roles(self, user_roles):
+        self._user_roles = user_roles
+
+    def load_metadata(self):
+        """
+        Load the custom fields and the user roles if not loaded yet
+        """
+        return self.custom_fields, self.user_roles
+
+    def refresh_metadata(self):
+        """
+        Re-request the custom fields and the user roles, then swap them
+        in. A request in progress keeps using the ones it has started with.
+        Return the new (CustomFields, UserRoles)
+        """
+        if self.metadata_cache is not None:
+            self.metadata_cache.invalidate(CUSTOM_FIELDS_URL)
+            self.metadata_cache.invalidate(USER_ROLES_URL)
+        custom_fields = CustomFields(self)
+        user_roles = UserRoles(self)
+        with self._metadata_lock:
+            self._custom_fields = custom_fields
+            self._user_roles = user_roles
+        return custom_fields, user_roles
+
+    def _prefetch_metadata(self):
+        try:
+            self.load_metadata()
+        except DataFailureException as ex:
+            # will be requested again on the first use
+            logger.warning("Prefetch metadata: {0}".format(ex))
 
     def add_user(self, bridge_user):
         """
@@ -88,14 +408,66 @@ class BridgeAccounts(Bridge):
         Return the BridgeUser object created
         """
         url = admin_uid_url(None)
-        body = json.dumps(bridge_user.to_json_post(), separators=(',', ':'))
+        body = codec.dumps(bridge_user.to_json_post())
         resp = self.post_resource(url, body)
         return self._get_obj_from_list("add_user ({0})".format(bridge_user),
                                        self._process_json_resp_data(resp))
 
-    def _upd_uid_req_body(self, new_uwnetid):
-        return "{0}{1}@uw.edu{2}".format(
-            '{"user":{"uid":"', new_uwnetid, '"}}')
+    def bulk_delete(self, uwnetids, concurrency=None):
+        """
+        Delete the users of the given uwnetids concurrently
+        :param concurrency: the number of requests in flight,
+         default to the RESTCLIENTS_BRIDGE_BULK_CONCURRENCY setting.
+        Return a list of BulkResult in the order of the uwnetids
+        """
+        return self.run_bulk(self.delete_user, uwnetids, concurrency)
+
+    def bulk_update_roles(self, bridge_users, concurrency=None):
+        """
+        Update the roles of the given BridgeUser objects concurrently
+        Return a list of BulkResult in the order of the bridge_users
+        """
+        return self.run_bulk(self.update_user_roles, bridge_users,
+                             concurrency)
+
+    def bulk_upsert(self, bridge_users, concurrency=None,
+                    changes_only=False):
+        """
+        Update the given BridgeUser objects concurrently,
+        add the ones which do not exist in Bridge.
+        :param changes_only: see update_user
+        Return a list of BulkResult in the order of the bridge_users
+        """
+        return self.run_bulk(
+            partial(self.upsert_user, changes_only=changes_only),
+            bridge_users, concurrency)
+
+    def run_bulk(self, action, items, concurrency=None):
+        """
+        Call action(item) for each of the items concurrently, the way the
+        bulk_* methods do, i.e. to run a custom sequence of requests
+        per item.
+        :param concurrency: the number of actions in flight,
+         default to the RESTCLIENTS_BRIDGE_BULK_CONCURRENCY setting.
+        Return a list of BulkResult in the order of the items, the user
+        being the value returned by the action (unless a bool) and the
+        error the exception it raised.
+        """
+        if concurrency is None:
+            concurrency = self.dao.get_service_setting(
+                "BULK_CONCURRENCY", 10)
+
+        def run(item):
+            try:
+                ret = action(item)
+            except Exception as ex:
+                return BulkResult(item, error=ex)
+            if isinstance(ret, bool):
+                return BulkResult(item)
+            return BulkResult(item, user=ret)
+
+        with ThreadPoolExecutor(max_workers=int(concurrency)) as executor:
+            return list(executor.map(run, items))
 
     def change_uid(self, bridge_id, new_uwnetid):
         """
@@ -106,6 +478,7 @@ class BridgeAccounts(Bridge):
         """
         url = author_id_url(bridge_id)
         resp = self.patch_resource(url, self._upd_uid_req_body(new_uwnetid))
+        self._invalidate_user(bridge_id=bridge_id, uwnetid=new_uwnetid)
         return self._get_obj_from_list("change_uid({0})".format(new_uwnetid),
                                        self._process_json_resp_data(resp))
 
@@ -118,6 +491,8 @@ class BridgeAccounts(Bridge):
         """
         url = author_uid_url(old_uwnetid)
         resp = self.patch_resource(url, self._upd_uid_req_body(new_uwnetid))
+        self._invalidate_user(uwnetid=old_uwnetid)
+        self._invalidate_user(uwnetid=new_uwnetid)
         return self._get_obj_from_list(
             "replace_uid({0}->{1})".format(old_uwnetid, new_uwnetid),
             self._process_json_resp_data(resp))
@@ -128,6 +503,7 @@ class BridgeAccounts(Bridge):
         the user is deleted successfully
         """
         resp = self.delete_resource(admin_uid_url(uwnetid))
+        self._invalidate_user(uwnetid=uwnetid)
         return resp.status == 204
 
     def delete_user_by_id(self, bridge_id):
@@ -137,18 +513,18 @@ class BridgeAccounts(Bridge):
         the user is deleted successfully
         """
         resp = self.delete_resource(admin_id_url(bridge_id))
+        self._invalidate_user(bridge_id=bridge_id)
         return resp.status == 204
 
-    def get_user(self, uwnetid):
+    def get_user(self, uwnetid, include_deleted=False):
         """
+        :param include_deleted: specify if you want to include
+                                terminated user record in the response.
         Return a BridgeUser object
         """
-        url = "{0}?{1}".format(author_uid_url(uwnetid),
-                               includes_to_query_params(GET_USER_INCLUDES))
-        resp = self.get_resource(url)
-        return self._get_obj_from_list(
-            "get_user by netid('{0}')".format(uwnetid),
-            self._process_json_resp_data(resp))
+        return self._get_user_by_url(
+            get_user_url(uwnetid, include_deleted),
+            "get_user by netid('{0}')".format(uwnetid), uwnetid=uwnetid)
 
     def get_user_by_id(self, bridge_id,
                        include_deleted=False):
@@ -158,25 +534,88 @@ class BridgeAccounts(Bridge):
                                 terminated user record in the response.
         Return a BridgeUser object
         """
-        url = "{0}?{1}".format(author_id_url(bridge_id),
-                               includes_to_query_params(GET_USER_INCLUDES))
-        if include_deleted:
-            url = "{0}&{1}".format(url, "with_deleted=true")
-
-        resp = self.get_resource(url)
-        return self._get_obj_from_list(
+        return self._get_user_by_url(
+            get_user_by_id_url(bridge_id, include_deleted),
             "get_user by bridge_id('{0}')".format(bridge_id),
-            self._process_json_resp_data(resp))
+            bridge_id=bridge_id)
 
-    def get_all_users(self, includes=None, role_id=None):
+    def get_all_users(self, includes=None, role_id=None, prefetch=0,
+                      records=False, stream=False, intern=False):
         """
         :param includes: specify the additioanl data you want in the response.
         :param role_id: filter users by role_id
          Valid value is one of 'account_admin', 'admin', 'author', etc
+        :param prefetch: the number of pages to fetch ahead in background
+        :param records: True to get the compact read-only BridgeUserRecord
+         objects instead of BridgeUser.
+        :param stream: True to decode the users of each page one at a time
+        :param intern: True to share the repeated strings and roles
         Return a list of BridgeUser objects of the active user records.
         """
-        resp = self.get_resource(get_all_users_url(includes, role_id))
-        return self._process_json_resp_data(resp)
+        return list(self.iter_all_users(
+            includes=includes, role_id=role_id, prefetch=prefetch,
+            records=records, stream=stream, intern=intern))
+
+    def get_roster_frame(self, includes=None, role_id=None, prefetch=0):
+        """
+        :param includes: specify the additioanl data you want in the response.
+        :param role_id: filter users by role_id
+        :param prefetch: the number of pages to fetch ahead in background
+        Return a uw_bridge.roster_frame.RosterFrame of the active user
+        records, built from the pages without creating BridgeUser objects.
+        Requires numpy.
+        """
+        # numpy is only imported when a frame is built
+        from uw_bridge.roster_frame import RosterFrameBuilder
+        builder = RosterFrameBuilder(self.custom_fields)
+        pages = self._open_pages(
+            self.get_resource(get_all_users_url(includes, role_id)),
+            prefetch)
+        try:
+            while True:
+                resp_data = pages.next_page()
+                if resp_data is None:
+                    break
+                builder.add_page(resp_data)
+        finally:
+            pages.close()
+        return builder.build()
+
+    def iter_all_users(self, includes=None, role_id=None, prefetch=0,
+                       records=False, stream=False, intern=False,
+                       errors=None):
+        """
+        :param includes: specify the additioanl data you want in the response.
+        :param role_id: filter users by role_id
+        :param prefetch: the number of pages to fetch ahead in background.
+         With the default 0 the pages are requested one after another.
+        :param records: True to get BridgeUserRecord objects
+        :param stream: True to decode the users of each page one at a time
+         (uw_bridge.stream) rather than the whole page, the pages are then
+         requested one after another (prefetch is not used). A malformed
+         page raises DataFailureException rather than ending the users.
+        :param intern: True to have the users share one object per distinct
+         department, job_title, locale, custom field value (of the fields
+         with few distinct values) and role (page_decoder.Interner), for
+         the large reads to be kept in memory.
+        :param errors: a list to append the (exception, data) of the pages
+         and users skipped as invalid to, i.e. to tell a partial crawl.
+        Return a generator of BridgeUser objects of the active user records.
+        The pages are requested and parsed as the generator is consumed,
+        so at most one page (PAGE_MAX_ENTRY users) is held in memory
+        (plus the prefetched pages).
+        """
+        url = get_all_users_url(includes, role_id)
+        resp = self.get_resource(url)
+        interner = Interner() if intern else None
+        if stream:
+            yield from self._iter_stream_resp_data(
+                resp, url, records=records, interner=interner,
+                errors=errors)
+        else:
+            yield from self._iter_json_resp_data(
+                resp, prefetch=prefetch, records=records, interner=interner,
+                errors=errors)
 
     def restore_user(self, uwnetid):
         """
@@ -185,7 +624,8 @@ class BridgeAccounts(Bridge):
         Return a BridgeUser object
         """
         url = restore_user_url(author_uid_url(uwnetid))
-        resp = self.post_resource(url, '{}')
+        resp = self.post_resource(url, '{}', idempotent=True)
+        self._invalidate_user(uwnetid=uwnetid)
         return self._get_obj_from_list(
             "restore_user by netid({0})".format(uwnetid),
             self._process_json_resp_data(resp))
@@ -198,22 +638,27 @@ class BridgeAccounts(Bridge):
         return a BridgeUser object
         """
         url = restore_user_url(author_id_url(bridge_id))
-        resp = self.post_resource(url, '{}')
+        resp = self.post_resource(url, '{}', idempotent=True)
+        self._invalidate_user(bridge_id=bridge_id)
         return self._get_obj_from_list(
             "restore_user by bridge_id({0})".format(bridge_id),
             self._process_json_resp_data(resp))
 
-    def update_user(self, bridge_user):
+    def update_user(self, bridge_user, changes_only=False):
         """
         Update only the user attributes provided.
-        Return a BridgeUser object
+        :param changes_only: True to only send the attributes and custom
+         field values changed since the bridge_user was loaded, and not to
+         send the request if nothing has changed.
+        Return a BridgeUser object, the given bridge_user if unchanged
         """
-        if bridge_user.has_bridge_id():
-            url = author_id_url(bridge_user.bridge_id)
-        else:
-            url = author_uid_url(bridge_user.netid)
-        body = json.dumps(bridge_user.to_json_patch(), separators=(',', ':'))
-        resp = self.patch_resource(url, body)
+        if changes_only and not bridge_user.has_changes():
+            return bridge_user
+        body = codec.dumps(bridge_user.to_json_patch(
+            changes_only=changes_only))
+        resp = self.patch_resource(update_user_url(bridge_user), body)
+        self._invalidate_user(bridge_id=bridge_user.bridge_id,
+                              uwnetid=bridge_user.netid)
         return self._get_obj_from_list(
             "update_user ({0})".format(bridge_user.to_json()),
             self._process_json_resp_data(resp))
@@ -223,113 +668,121 @@ class BridgeAccounts(Bridge):
         Update the all the permission roles for the bridge_user.
         Return a BridgeUser object
         """
-        if bridge_user.has_bridge_id():
-            url = admin_id_url(bridge_user.bridge_id)
-        else:
-            url = admin_uid_url(bridge_user.netid)
-        url = "{0}/roles/batch".format(url)
-        body = json.dumps({"roles": bridge_user.roles_to_json()})
-        resp = self.put_resource(url, body)
+        body = codec.dumps({"roles": bridge_user.roles_to_json()})
+        resp = self.put_resource(update_user_roles_url(bridge_user), body)
+        self._invalidate_user(bridge_id=bridge_user.bridge_id,
+                              uwnetid=bridge_user.netid)
         return self._get_obj_from_list(
             "update_user_roles {0}, {1}".format(bridge_user.netid, body),
             self._process_json_resp_data(resp))
 
+    def upsert_user(self, bridge_user, changes_only=False):
+        """
+        Update the bridge_user, or add it if the netid is not found.
+        :param changes_only: see update_user
+        Return the BridgeUser object updated or created
+        """
+        try:
+            return self.update_user(bridge_user, changes_only=changes_only)
+        except DataFailureException as ex:
+            if ex.status != 404 or bridge_user.has_bridge_id():
+                raise
+        return self.add_user(bridge_user)
+
+    def _get_user_by_url(self, url, action, bridge_id=None, uwnetid=None):
+        """
+        GET a single user, through the response cache if it is enabled
+        """
+        cache = self.response_cache
+        if cache is None:
+            return self._get_obj_from_list(
+                action, self._process_json_resp_data(self.get_resource(url)))
+
+        # not to cache a response older than an invalidation of the user
+        generation = cache.get_generation()
+        entry = cache.get(url)
+        response = None
+        if entry is not None and entry.is_fresh():
+            resp = entry.data
+        elif entry is not None and entry.can_revalidate():
+            response = self._load_resource(
+                "GET", url, entry.get_headers(self.GHEADER), None,
+                (200, 304))
+            if response.status == 304:
+                cache.refresh(entry)
+                resp = entry.data
+                response = None
+            else:
+                resp = response.data
+        else:
+            response = self._load_resource(
+                "GET", url, self.GHEADER, None, (200,))
+            resp = response.data
+
+        user = self._get_obj_from_list(
+            action, self._process_json_resp_data(resp))
+        if response is not None:
+            tags = self._user_tags(bridge_id, uwnetid)
+            if user is not None:
+                tags += self._user_tags(user.bridge_id, user.netid)
+            cache.put(url, response, tags=tags, generation=generation)
+        return user
+
+    def _open_pages(self, resp, prefetch):
+        if prefetch > 0:
+            return PagePrefetcher(self, resp, prefetch)
+        return PageReader(self, resp)
+
     def _process_json_resp_data(self, resp):
         """
         process the response and return a list of BridgeUser
         """
-        bridge_users = []
-        while True:
-            resp_data = json.loads(resp)
-            link_url = None
-            if (resp_data.get("meta") is not None and
-                    resp_data["meta"].get("next") is not None):
-                link_url = resp_data["meta"]["next"]
-
-            try:
-                bridge_users = self._process_apage(resp_data, bridge_users)
-            except Exception as err:
-                logger.error("{0} in {1}".format(str(err), resp_data))
-
-            if link_url is None:
-                break
-            resp = self.get_resource(link_url)
-        return bridge_users
-
-    def _process_apage(self, resp_data, bridge_users):
-        custom_fields_value_dict = self._get_custom_fields_dict(
-            resp_data.get("linked"))
-        # a dict of {custom_field_value_id: BridgeCustomField}
+        return list(self._iter_json_resp_data(resp))
 
-        for user_data in resp_data.get("users"):
-            try:
-                user = BridgeUser(
-                    bridge_id=int(user_data["id"]),
-                    netid=re.sub('@uw.edu', '', user_data["uid"]),
-                    email=user_data.get("email", ""),
-                    full_name=user_data.get("full_name", ""),
-                    first_name=user_data.get("first_name"),
-                    last_name=user_data.get("last_name"),
-                    department=user_data.get("department"),
-                    job_title=user_data.get("job_title"),
-                    locale=user_data.get("locale", "en"),
-                    hired_at=parse_date(user_data.get("hire_date")),
-                    is_manager=user_data.get("is_manager"),
-                    unsubscribed=user_data.get("unsubscribed"),
-                    deleted_at=parse_date(user_data.get("deleted_at")),
-                    logged_in_at=parse_date(user_data.get("loggedInAt")),
-                    updated_at=parse_date(user_data.get("updated_at")),
-                    next_due_date=parse_date(user_data.get("next_due_date")),
-                    completed_courses_count=user_data.get(
-                        "completed_courses_count", -1))
-
-                if user_data.get("manager_id") is not None:
-                    user.manager_id = int(user_data["manager_id"])
-
-                if (user_data.get("links") is not None and
-                        len(user_data["links"]) > 0 and
-                        "custom_field_values" in user_data["links"]):
-                    values = user_data["links"]["custom_field_values"]
-                    for custom_field_value in values:
-                        if custom_field_value in custom_fields_value_dict:
-                            custom_field = custom_fields_value_dict[
-                                custom_field_value]
-                            user.custom_fields[custom_field.name] =\
-                                custom_field
-
-                if user_data.get("roles") is not None:
-                    for role_data in user_data["roles"]:
-                        user.roles.append(
-                            self.user_roles.new_user_role_by_id(role_data))
-                bridge_users.append(user)
-            except Exception as err:
-                logger.error("{0} in {1}".format(str(err), user_data))
-        return bridge_users
-
-    def _get_custom_fields_dict(self, linked_data):
-        """
-        :except KeyError:
-        """
-        custom_fields_value_dict = {}
-        # a dict of {value_id: BridgeCustomField}
-
-        if (len(linked_data) == 0 or
-                linked_data.get("custom_field_values") is None):
-            return custom_fields_value_dict
-
-        for value in linked_data["custom_field_values"]:
-            custom_field = self.custom_fields.get_custom_field(
-                value["links"]["custom_field"]["id"],
-                value["id"], value["value"])
-            custom_fields_value_dict[custom_field.value_id] = custom_field
-        return custom_fields_value_dict
-
-    def _get_obj_from_list(self, action, rlist):
-        if len(rlist) == 0:
-            return None
-
-        if len(rlist) > 1:
-            logger.error(
-                "{0} returns multiple Bridge user accounts: {1}".format(
-                    action, [u.to_json() for u in rlist]))
-        return rlist[0]
+    def _iter_json_resp_data(self, resp, prefetch=0, records=False,
+                             interner=None, errors=None):
+        """
+        process the response page by page and yield the BridgeUser objects
+        :param prefetch: the number of pages to fetch ahead in background
+        :param records: True to yield BridgeUserRecord objects
+        :param interner: the page_decoder.Interner shared by the pages
+        :param errors: see _process_page
+        """
+        pages = self._open_pages(resp, prefetch)
+        resp = None
+        try:
+            while True:
+                resp_data = pages.next_page()
+                if resp_data is None:
+                    break
+
+                page_users = self._process_page(
+                    resp_data, records=records, interner=interner,
+                    errors=errors)
+                # release the raw page before handing out its users
+                resp_data = None
+
+                # pop the users so that the consumed ones can be reclaimed
+                page_users.reverse()
+                while len(page_users):
+                    yield page_users.pop()
+        finally:
+            pages.close()
+
+    def _iter_stream_resp_data(self, resp, url, records=False,
+                               interner=None, errors=None):
+        """
+        Yield the BridgeUser objects of the response pages
+        as they are decoded from the text of each page
+        :param url: the url of the first page (resp)
+        """
+        while resp is not None:
+            parser = UsersPageParser(resp)
+            resp = None
+            yield from self._process_page_stream(
+                parser, url, records=records, interner=interner,
+                errors=errors)
+            url = next_page_url(parser.fields)
+            parser = None
+            if url is not None:
+                resp = self.get_resource(url)
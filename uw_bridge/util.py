@@ -1,6 +1,8 @@
 # Copyright 2024 UW-IT, University of Washington
 # SPDX-License-Identifier: Apache-2.0
 
+from datetime import datetime
+from functools import lru_cache
 from commonconf import override_settings
 from dateutil.parser import parse
 
@@ -11,10 +13,33 @@ ldao_bridge_override = override_settings(RESTCLIENTS_BRIDGE_DAO_CLASS='Live')
 
 def parse_date(date_str):
     if date_str is not None:
-        return parse(date_str)
+        return _parse_date_str(date_str)
     return None
 
 
+@lru_cache(maxsize=4096)
+def _parse_date_str(date_str):
+    # Bridge uses the ISO 8601 format, i.e. 2016-08-02T14:36:17.082-07:00,
+    # dateutil is only needed for the others.
+    # The datetime objects are immutable, so the parsed values are cached.
+    try:
+        return datetime.fromisoformat(date_str)
+    except ValueError:
+        return parse(date_str)
+
+
 def date_to_str(dt):
     # datetime.datetime.isoformat
     return dt.isoformat() if dt is not None else None
+
+
+def get_header(response, name):
+    """
+    Return the value of the (case insensitive) response header or None
+    """
+    headers = getattr(response, "headers", None) or {}
+    name = name.lower()
+    for key in headers:
+        if key.lower() == name:
+            return headers[key]
+    return None